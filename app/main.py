@@ -2,9 +2,11 @@ import argparse
 import sys
 import os
 from core.splitter.processor import Splitter
-from core.splitter.saver import save_chapters
+from core.splitter.index import ChapterIndex
+from core.splitter.saver import iter_save_chapters
 from core.summarizer.llm_client import ClientFactory
 from core.summarizer.generator import SummaryGenerator
+from core.summarizer.usage import UsageTracker, track_usage
 from core.utils import calculate_file_hash
 from data_protocol.models import Chapter
 import json
@@ -98,11 +100,10 @@ def get_user_input():
                 if input("\n确认执行? (Y/n): ").strip().lower() != 'n':
                     # 执行预扫描以获取章节总数 (用于解析范围)
                     print("\n正在扫描文件结构...")
-                    splitter = Splitter(encoding=encoding)
-                    content = splitter.read_file(input_file)
+                    index = ChapterIndex.load_or_build(input_file, encoding=encoding)
                     # 更新为实际检测到的编码
-                    encoding = splitter.encoding
-                    total_chapters, _, _ = splitter.scan_chapters(content)
+                    encoding = index.encoding
+                    total_chapters = index.total
                     
                     chapter_range = parse_range(range_str, total_chapters)
                     
@@ -112,6 +113,12 @@ def get_user_input():
                         extra_args['range'] = batch_size
                     if chapter_range:
                         extra_args['chapter_range'] = chapter_range
+                    if config.get('workers'):
+                        extra_args['workers'] = int(config['workers'])
+                    if config.get('pack'):
+                        extra_args['pack'] = True
+                    if config.get('save_workers'):
+                        extra_args['save_workers'] = int(config['save_workers'])
                         
                     return {
                         'input_file': input_file,
@@ -170,12 +177,12 @@ def get_user_input():
     # 3. 预扫描章节
     print("\n正在扫描文件结构...")
     try:
-        splitter = Splitter(encoding=encoding)
-        content = splitter.read_file(input_file)
+        # 章节偏移索引按文件哈希持久化，同一文件再次扫描时直接命中
+        index = ChapterIndex.load_or_build(input_file, encoding=encoding)
         # 更新为实际检测到的编码
-        encoding = splitter.encoding
+        encoding = index.encoding
         
-        total_chapters, titles, is_continuous = splitter.scan_chapters(content)
+        total_chapters, titles, is_continuous = index.total, index.headings, True
         
         if total_chapters > 0:
             print(f"✅ 检测到共 {total_chapters} 章。")
@@ -298,9 +305,6 @@ def main():
             print("=== StoryTrace Visualization Server ===")
             print("正在启动 API 服务...")
             
-            # Re-read settings to ensure port is correct
-            from core.config import settings
-            
             print(f"访问地址: http://{settings.API_HOST}:{settings.API_PORT}/docs")
             # Use string import for reload support
             uvicorn.run("backend.server:app", host=settings.API_HOST, port=int(settings.API_PORT), reload=True)
@@ -318,6 +322,10 @@ def main():
     parser.add_argument('-e', '--encoding', default='utf-8', help='文件编码')
     parser.add_argument('-r', '--range', type=int, default=10, help='批量分割时的章节数量 (仅batch模式有效)')
     parser.add_argument('--pattern', default=r'^[第卷\d一二三四五六七八九十百千万]+卷', help='分卷匹配模式 (仅volume模式有效)')
+    parser.add_argument('--workers', type=int, default=0, help='并行扫描分卷的进程数 (仅volume模式有效，适用于数百卷的合集)')
+    parser.add_argument('--pack', action='store_true', help='章节打包保存为单个 chapters.pack (附偏移表)，不生成逐章 .txt 文件')
+    parser.add_argument('--save-workers', type=int, default=None,
+                        help='逐章 .txt 的写入线程数 (默认 SAVE_WORKERS=1 顺序写入，网络文件系统上可调大)')
     
     # LLM 相关参数
     parser.add_argument('--summarize', action='store_true', help='开启智能总结 (实验性功能)')
@@ -326,6 +334,9 @@ def main():
     parser.add_argument('--model', help='模型名称')
     parser.add_argument('--base-url', help='Local LLM Base URL')
     parser.add_argument('--repair', help='指定需强制重生成的章节编号，逗号分隔 (e.g. 77,78)')
+    parser.add_argument('--llm-replay', nargs='?', const='auto', metavar='URL',
+                        help='离线回放模式：LLM 请求发往 Mock 服务 (不带 URL 时在进程内启动 scripts/mock_llm_server.py)，'
+                             '使用临时缓存目录且不同步数据库，用于压测并发与重试策略')
 
     # 如果没有提供任何参数，且不是被导入调用，则进入交互模式
     if len(sys.argv) == 1:
@@ -345,7 +356,12 @@ def main():
         chapter_range_filter = extra_args.get('chapter_range')
         
         pattern = r'^[第卷\d一二三四五六七八九十百千万]+卷' # 交互模式使用默认pattern
+        split_workers = extra_args.get('workers', 0)
+        pack_output = extra_args.get('pack', False)
+        save_workers = extra_args.get('save_workers')
         
+        llm_replay = None
+
         # 读取交互模式下的 LLM 配置
         summarize_config = args_dict.get('summarize_config', {'enabled': False})
         summarize = summarize_config['enabled']
@@ -385,10 +401,14 @@ def main():
         encoding = args.encoding
         batch_size = args.range
         pattern = args.pattern
+        split_workers = args.workers
+        pack_output = args.pack
+        save_workers = args.save_workers
         chapter_range_filter = None # CLI模式暂不支持 range filter，后续可添加
         
         summarize = args.summarize
         provider = args.provider
+        llm_replay = args.llm_replay
         
         # 优先从命令行参数获取，如果没有，则尝试从环境变量获取
         api_key = args.api_key or settings.OPENROUTER_API_KEY or os.getenv("OPENROUTER_API_KEY")
@@ -451,6 +471,35 @@ def main():
     if len(file_hash) > 8:
         file_hash = file_hash[:8]
     print(f"DEBUG: 文件哈希: {file_hash}", flush=True)
+
+    # --- 连载追加更新检测 (仅按章模式) ---
+    # 如果新文件是同名小说某个已知版本的前缀扩展，只处理新增的尾部章节，
+    # 并写入旧版本的目录，使新章节归属到同一个 NovelVersion (Best Effort Merge)。
+    version_hash = file_hash
+    chapter_index = None
+    append_info = None
+    if mode_name == 'chapter':
+        chapter_index = ChapterIndex.load_or_build(input_file, file_hash=file_hash, encoding=encoding, novel_name=novel_name)
+        append_base = chapter_index.find_append_base(input_file)
+        if append_base:
+            base_index, first_new = append_base
+            version_hash = base_index.version_hash
+            if chapter_index.version_hash != version_hash:
+                chapter_index.version_hash = version_hash
+                chapter_index.save()
+
+            r_start, r_end = chapter_range_filter or (1, chapter_index.total)
+            print(f"[Append] 检测到追加更新: 基于版本 {base_index.file_hash} ({base_index.total} 章)，"
+                  f"新增/变更章节: 第{first_new}-{chapter_index.total}章，归属版本 {version_hash}")
+            r_start = max(r_start, first_new)
+            if r_start > r_end:
+                print("所选范围内没有新增章节，无需处理。")
+                return
+            chapter_range_filter = (r_start, r_end)
+            append_info = {
+                "base_file_hash": base_index.file_hash,
+                "first_new_chapter": first_new
+            }
     
     # --- 缓存检查逻辑 (v3.0) ---
     print(f"DEBUG: Summarize={summarize}, Provider={provider}", flush=True)
@@ -475,11 +524,12 @@ def main():
     print("DEBUG: 指纹计算完成，正在检查缓存...")
     
     # 2. 扫描历史记录
-    novel_output_root = PathManager.get_novel_root(novel_name, file_hash)
+    novel_output_root = PathManager.get_novel_root(novel_name, version_hash)
     cache_hit_path = None
     cache_hit_timestamp = None
     
-    if os.path.exists(novel_output_root) and summarize: # 只有开启总结时才值得缓存
+    # 回放模式用于压测，总是完整执行
+    if os.path.exists(novel_output_root) and summarize and not llm_replay: # 只有开启总结时才值得缓存
         for ts in os.listdir(novel_output_root):
             ts_path = os.path.join(novel_output_root, ts)
             meta_path = os.path.join(ts_path, "run_metadata.json")
@@ -503,7 +553,7 @@ def main():
         
         # 生成新的时间戳目录
         timestamp = time.strftime("%Y%m%d_%H%M%S")
-        final_output_dir = PathManager.get_run_dir(novel_name, file_hash, timestamp)
+        final_output_dir = PathManager.get_run_dir(novel_name, version_hash, timestamp)
         os.makedirs(final_output_dir, exist_ok=True)
         
         # 创建 ref_link.json
@@ -525,8 +575,11 @@ def main():
     # 3. 获取当前时间戳
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     
-    # 最终路径：output_dir/novel_name/file_hash/timestamp
-    final_output_dir = PathManager.get_run_dir(novel_name, file_hash, timestamp)
+    # 最终路径：output_dir/novel_name/version_hash/timestamp (非追加更新时 version_hash 即 file_hash)
+    final_output_dir = PathManager.get_run_dir(novel_name, version_hash, timestamp)
+    if llm_replay:
+        # 回放运行的结果是占位 / 回放数据，与正式运行隔离 (数据库同步会跳过 output/.replay)
+        final_output_dir = PathManager.get_replay_run_dir(novel_name, version_hash, timestamp)
     abs_final_output_dir = os.path.abspath(final_output_dir)
     
     # 执行分割逻辑
@@ -537,30 +590,36 @@ def main():
     try:
         print(f"正在读取文件 (编码: {encoding})...")
         splitter = Splitter(encoding=encoding)
-        content = splitter.read_file(input_file)
+        # 按章模式直接使用章节偏移索引 seek 读取，不需要把整本书读入内存
+        content = splitter.read_file(input_file) if mode_name != 'chapter' else None
         
         print("正在分割章节...")
         if mode_name == 'volume':
             # 暂时不支持卷模式的范围过滤
-            chapters = splitter.split_by_volume(content, volume_pattern=pattern)
+            chapters = splitter.split_by_volume(content, volume_pattern=pattern, workers=split_workers)
+            total_chapters = len(chapters)
         elif mode_name == 'chapter':
-            chapters = splitter.split_by_chapter(content, chapter_range=chapter_range_filter)
+            # 流式读取：逐章 seek 读取后立即保存并交给总结，全书正文不会同时驻留内存
+            total_chapters = chapter_index.count(chapter_range_filter)
+            chapters = chapter_index.iter_chapters(input_file, chapter_range=chapter_range_filter)
         elif mode_name == 'batch':
             chapters = splitter.split_by_batch(content, batch_size=batch_size, chapter_range=chapter_range_filter)
+            total_chapters = len(chapters)
         else:
             print(f"不支持的模式: {mode_name}")
             return
             
-        if chapters:
-            print(f"成功分割出 {len(chapters)} 章。正在保存...")
+        if total_chapters:
+            print(f"成功分割出 {total_chapters} 章。正在保存...")
             # 使用新的 final_output_dir 保存章节
             # 强制使用 UTF-8 保存，确保 Web UI 能正确读取
-            save_chapters(chapters, final_output_dir, encoding='utf-8')
-            print("\n分割处理完成！")
+            # 保存是惰性的：开启总结时边保存边总结，否则在下方一次性写完
+            saved_chapters = iter_save_chapters(chapters, final_output_dir, encoding='utf-8',
+                                                workers=save_workers, pack=pack_output)
             
             # 如果开启了总结功能
             if summarize:
-                print("\n=== 开始智能总结 ===")
+                print("\n=== 开始智能总结 (边保存边总结) ===")
                 try:
                     # 确保参数不为空
                     client_kwargs = {
@@ -572,12 +631,34 @@ def main():
                     # 过滤掉 None 值和空字符串
                     client_kwargs = {k: v for k, v in client_kwargs.items() if v}
                     
-                    llm_client = ClientFactory.create_client(**client_kwargs)
-                    generator = SummaryGenerator(llm_client)
+                    replay_server = None
+                    if llm_replay:
+                        if llm_replay == 'auto':
+                            from scripts.mock_llm_server import ReplayResponder, start_server
+                            replay_server, llm_replay = start_server(ReplayResponder(
+                                provider=provider, base_url=base_url))
+                        settings.LLM_REPLAY_URL = llm_replay
+                        print(f"[Replay] 离线回放模式，LLM 请求发往 {llm_replay}")
+
+                    # 配置了 LLM_FAILOVER_PROVIDERS 时包装为故障转移客户端 (熔断 + 可选对冲请求)
+                    llm_client = ClientFactory.create_with_failover(**client_kwargs)
+
+                    # 自适应并发 (AIMD)：成功时逐步增加并发，429 / 超时时减半并遵守 Retry-After
+                    from core.summarizer.limiter import AdaptiveLimiter
+                    if provider == 'local':
+                        limiter = AdaptiveLimiter(initial=1, max_limit=settings.LOCAL_LLM_MAX_CONCURRENCY)
+                    else:
+                        limiter = AdaptiveLimiter(initial=settings.LLM_INITIAL_CONCURRENCY, max_limit=settings.LLM_MAX_CONCURRENCY)
+                    if hasattr(llm_client, 'attach_limiter'):
+                        llm_client.attach_limiter(limiter)
                     
                     # --- v4.0 Chapter-Level Caching ---
                     # Initialize CacheManager
                     cache_dir = PathManager.get_cache_dir()
+                    if llm_replay:
+                        # 回放模式使用临时缓存，保证每章都走完整的 LLM 调用路径
+                        import tempfile
+                        cache_dir = tempfile.mkdtemp(prefix="storytrace_replay_")
                     cache_manager = CacheManager(str(cache_dir))
                     
                     prompt_hash = Prompts.get_prompt_hash()
@@ -586,23 +667,63 @@ def main():
                         "model": model,
                         "base_url": base_url
                     }
+                    # 长章节分块总结，块级结果单独缓存
+                    generator = SummaryGenerator(llm_client, cache_manager=cache_manager,
+                                                 prompt_hash=prompt_hash, model_config=model_config)
                     
                     import asyncio
                     
-                    # Initialize total_chapters before defining async functions
-                    total_chapters = len(chapters)
+                    import itertools
+
+                    # 复用其他章节生成结果的次数 (list 以便在协程中修改)
+                    deduplicated = [0]
+                    generated = [0] # 实际调用 LLM 总结的章节数 (用于每章 Token / 吞吐统计)
+                    packed = [0, 0] # 打包的章节数 / 请求数
+
+                    # 章节按窗口从流式读取中取出：每个窗口批量预取缓存 (一次查询) 并规划打包，
+                    # 处理中的章节达到一个窗口时先等待完成再读取下一个窗口，内存中的正文不超过约两个窗口
+                    # 全书章节号 = 范围起点 + 序号 (追加更新或 --range 只处理尾部时，--repair 与进度仍按全书章节号)
+                    chapter_offset = max(0, chapter_range_filter[0] - 1) if mode_name == 'chapter' and chapter_range_filter else 0
+                    last_chapter_num = chapter_offset + total_chapters
+
+                    pack_width = generator.pack_max_chapters if generator.pack_tokens else 1
+                    max_in_progress = limiter.max_limit * max(pack_width, 1)
+                    window_size = max(32, 2 * max_in_progress)
 
-                    async def process_chapter_async(i, ch, cache_manager, generator, prompt_hash, model_config, semaphore, file_lock, jsonl_path):
+                    def prepare_window(window):
+                        """window 为 [(i, ch)]。返回 (预取的缓存 {i: summary}, 打包 {ch.id: pack})"""
+                        # 强制重生成的章节不查询，以免计入命中统计
+                        lookup = [(i, ch) for i, ch in window if chapter_offset + i + 1 not in repair_chapters]
+                        lookup_results = cache_manager.get_cached_summaries([ch for _, ch in lookup], prompt_hash, model_config)
+                        prefetched = {i: summary for (i, _), summary in zip(lookup, lookup_results)}
+                        # 多章打包 (SUMMARY_PACK_TOKENS > 0)：未命中缓存的连续短章节合并为一次请求，
+                        # 同一包的章节共享同一个请求任务，结果仍按各自的章节缓存键保存
+                        pending_chapters = [ch for i, ch in window if prefetched.get(i) is None]
+                        packs = [pack for pack in generator.plan_packs(pending_chapters) if len(pack) > 1]
+                        packed[0] += sum(len(p) for p in packs)
+                        packed[1] += len(packs)
+                        return prefetched, {ch.id: pack for pack in packs for ch in pack}
+
+                    async def generate_packed(ch, pack, pack_tasks):
+                        task = pack_tasks.get(pack[0].id)
+                        if task is None:
+                            task = pack_tasks[pack[0].id] = asyncio.ensure_future(generator.generate_packed_summaries_async(pack))
+                        # shield: 某一章被取消时不影响同一包的其他章节
+                        results = await asyncio.shield(task)
+                        return results[pack.index(ch)]
+
+                    async def process_chapter_async(i, ch, cache_manager, generator, prompt_hash, model_config, semaphore, file_lock, jsonl_path,
+                                                    prefetched_summary=None, pack=None, pack_tasks=None):
                         async with semaphore:
-                            print(f"[{i+1}/{total_chapters}] 处理章节: {ch.title} ... ", end="", flush=True)
+                            current_chapter_num = chapter_offset + i + 1
+                            print(f"[{current_chapter_num}/{last_chapter_num}] 处理章节: {ch.title} ... ", end="", flush=True)
                             
                             # 1. Try Cache
-                            current_chapter_num = i + 1
                             should_repair = current_chapter_num in repair_chapters
                             
                             cached_summary = None
                             if not should_repair:
-                                cached_summary = cache_manager.get_cached_summary(ch.content, prompt_hash, model_config)
+                                cached_summary = prefetched_summary
                             else:
                                 print(f"🔧 [Repair] 强制重生成第 {current_chapter_num} 章...")
                             
@@ -616,37 +737,58 @@ def main():
                                 # 2. Generate (Async) with Retry
                                 max_retries = 3
                                 retry_delay = 2
-                                
-                                for attempt in range(max_retries):
-                                    try:
-                                        summary = await generator.generate_summary_async(ch)
-                                        
+
+                                async def generate_with_retry():
+                                    for attempt in range(max_retries):
+                                        try:
+                                            if attempt == 0 and pack is not None:
+                                                summary = await generate_packed(ch, pack, pack_tasks)
+                                            else:
+                                                # 打包请求失败后逐章重试
+                                                summary = await generator.generate_summary_async(ch)
+                                        except Exception as e:
+                                            if attempt < max_retries - 1:
+                                                print(f"⚠️ 失败(重试 {attempt+1}/{max_retries}): {e} ... ", end="", flush=True)
+                                                await asyncio.sleep(retry_delay * (2 ** attempt)) # Exponential backoff
+                                                continue
+                                            raise
+
+                                        generated[0] += 1
                                         # 3. Save to Cache
                                         try:
-                                            cache_manager.save_summary(ch.content, prompt_hash, model_config, summary)
+                                            cache_manager.save_summary(ch, prompt_hash, model_config, summary)
                                         except Exception as cache_err:
                                             print(f"(Cache Write Failed: {cache_err}) ", end="")
-                                            
-                                        summary_data = summary.model_dump()
+                                        return summary
+
+                                try:
+                                    # 正文相同的章节 (重复发布、请假条等) 并发时只调用一次 LLM
+                                    summary, shared = await cache_manager.generate_once(
+                                        ch, prompt_hash, model_config, generate_with_retry, force=should_repair)
+                                    summary = summary.model_copy(update={
+                                        "chapter_id": ch.id,
+                                        "chapter_title": ch.title,
+                                        "volume_title": ch.volume_title
+                                    })
+                                    summary_data = summary.model_dump()
+                                    if shared:
+                                        deduplicated[0] += 1
+                                        print("🔗 复用相同正文的生成结果")
+                                    else:
                                         print("✨ 生成完成")
-                                        break # Success
-                                    except Exception as e:
-                                        if attempt < max_retries - 1:
-                                            print(f"⚠️ 失败(重试 {attempt+1}/{max_retries}): {e} ... ", end="", flush=True)
-                                            await asyncio.sleep(retry_delay * (2 ** attempt)) # Exponential backoff
-                                        else:
-                                            print(f"❌ 最终失败: {e}")
-                                            # Create Empty Placeholder to keep chapter in timeline
-                                            from data_protocol.models import ChapterSummary
-                                            empty_summary = ChapterSummary(
-                                                chapter_id=ch.id,
-                                                chapter_title=ch.title,
-                                                headline="生成失败",
-                                                summary_sentences=[],
-                                                entities=[],
-                                                relationships=[]
-                                            )
-                                            summary_data = empty_summary.model_dump()
+                                except Exception as e:
+                                    print(f"❌ 最终失败: {e}")
+                                    # Create Empty Placeholder to keep chapter in timeline
+                                    from data_protocol.models import ChapterSummary
+                                    empty_summary = ChapterSummary(
+                                        chapter_id=ch.id,
+                                        chapter_title=ch.title,
+                                        headline="生成失败",
+                                        summary_sentences=[],
+                                        entities=[],
+                                        relationships=[]
+                                    )
+                                    summary_data = empty_summary.model_dump()
                                 
                             # Real-time save to summaries.jsonl (with lock)
                             if summary_data:
@@ -657,19 +799,38 @@ def main():
                             
                             return (i, summary_data)
 
-                    async def run_batch_processing():
-                        # Adjust concurrency based on provider
-                        limit = 1 if provider == 'local' else 5
-                        semaphore = asyncio.Semaphore(limit)
+                    async def run_batch_processing(lease_id):
+                        # 实际的 LLM 并发由 limiter 控制，这里只限制同时处理中的章节数
+                        # 同一包的章节共用一个请求，按包的大小放宽同时处理的章节数
+                        semaphore = asyncio.Semaphore(max_in_progress)
                         file_lock = asyncio.Lock()
                         jsonl_path = os.path.join(final_output_dir, "summaries.jsonl")
-                        
-                        tasks = []
-                        for i, ch in enumerate(chapters):
-                            task = process_chapter_async(i, ch, cache_manager, generator, prompt_hash, model_config, semaphore, file_lock, jsonl_path)
-                            tasks.append(task)
-                        
-                        results = await asyncio.gather(*tasks)
+                        loop = asyncio.get_running_loop()
+                        chapter_stream = enumerate(saved_chapters)
+
+                        results, running = [], set()
+                        while True:
+                            # 读取与保存在线程中进行，不阻塞进行中的请求
+                            window = await loop.run_in_executor(None, lambda: list(itertools.islice(chapter_stream, window_size)))
+                            if not window:
+                                break
+                            # 租约随读取逐步登记，保护本次运行用到的缓存不被并发的 cache-trim 淘汰
+                            cache_manager.extend_lease(lease_id, [ch for _, ch in window], prompt_hash, model_config)
+                            generator.extend_lease(lease_id, [ch for _, ch in window])
+                            prefetched, pack_of = prepare_window(window)
+                            pack_tasks = {}
+                            for i, ch in window:
+                                pack = pack_of.get(ch.id)
+                                running.add(asyncio.ensure_future(process_chapter_async(
+                                    i, ch, cache_manager, generator, prompt_hash, model_config, semaphore, file_lock, jsonl_path,
+                                    prefetched_summary=prefetched.get(i), pack=pack, pack_tasks=pack_tasks)))
+                            del window, prefetched, pack_of, pack_tasks
+                            while len(running) >= window_size:
+                                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                                results.extend(task.result() for task in done)
+                        if running:
+                            done, _ = await asyncio.wait(running)
+                            results.extend(task.result() for task in done)
                         
                         # Sort results by index to ensure order
                         valid_results = [r for r in results if r is not None]
@@ -678,7 +839,49 @@ def main():
                         return [r[1] for r in valid_results]
 
                     # Run Async Loop
-                    summaries = asyncio.run(run_batch_processing())
+                    # 本次运行的所有 LLM 调用 (含重试、故障转移) 都记录到 run_usage
+                    with cache_manager.lease([], prompt_hash, model_config) as lease_id, track_usage(UsageTracker()) as run_usage:
+                        summaries = asyncio.run(run_batch_processing(lease_id))
+                    if packed[1]:
+                        print(f"[Pack] {packed[0]} 个短章节打包为 {packed[1]} 次请求")
+
+                    # 按配置的磁盘预算淘汰旧缓存 (未配置预算时不做任何事)
+                    evicted, freed = cache_manager.trim()
+                    if evicted:
+                        print(f"[Cache] 已淘汰 {evicted} 条缓存，释放 {freed / 1e6:.1f} MB")
+                    cache_manager.close()
+                    if llm_replay:
+                        import shutil
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                        if replay_server is not None:
+                            print(f"[Replay] Mock 服务统计: {replay_server.RequestHandlerClass.responder.stats}")
+                            replay_server.shutdown()
+
+                    concurrency_stats = limiter.stats()
+                    print(f"[Limiter] 平均并发 {concurrency_stats['avg_concurrency']}，最终并发上限 {concurrency_stats['final_limit']} "
+                          f"(峰值 {concurrency_stats['peak_limit']})，限流 {concurrency_stats['congestions']} 次，"
+                          f"吞吐 {concurrency_stats['throughput_per_min']} 次/分钟")
+                    failover_stats = llm_client.stats() if hasattr(llm_client, 'stats') else None
+                    if failover_stats:
+                        print(f"[Failover] 各 Provider 完成 {failover_stats['served']}，故障转移 {failover_stats['failovers']} 次，"
+                              f"对冲 {failover_stats['hedged']} 次 (胜出 {failover_stats['hedge_wins']} 次)")
+                    if generator.stream_stats["requests"]:
+                        print(f"[Stream] 流式请求 {generator.stream_stats['requests']} 次，"
+                              f"提前发现截断 {generator.stream_stats['truncated']} 次、格式错误 {generator.stream_stats['malformed']} 次")
+
+                    usage_stats = run_usage.summary(chapters=generated[0])
+                    if usage_stats["calls"]:
+                        cost = f"，约 ${usage_stats['cost_usd']:.4f}" if usage_stats["cost_usd"] is not None else ""
+                        print(f"[Usage] LLM 调用 {usage_stats['calls']} 次 (失败 {usage_stats['errors']}，重试 {usage_stats['retries']})，"
+                              f"Token {usage_stats['prompt_tokens']} + {usage_stats['completion_tokens']}{cost}，"
+                              f"每章 {usage_stats['tokens_per_chapter']} tokens，{usage_stats['chapters_per_minute']} 章/分钟，"
+                              f"p95 耗时 {usage_stats['p95_latency_seconds']}s")
+
+                    cache_stats = cache_manager.run_stats
+                    print(f"[Cache] 命中 {cache_stats.hits}/{cache_stats.hits + cache_stats.misses} ({cache_stats.hit_rate:.1%})，"
+                          f"预计节省 {cache_stats.tokens_saved} tokens，重复正文复用 {deduplicated[0]} 次")
+                    if cache_stats.chunk_hits or cache_stats.chunk_misses:
+                        print(f"[Cache] 长章节分块: 命中 {cache_stats.chunk_hits}/{cache_stats.chunk_hits + cache_stats.chunk_misses} 块")
                     
                     # 保存总结结果，直接保存在 final_output_dir 根目录
                     summary_path = os.path.join(final_output_dir, "summaries.json")
@@ -690,31 +893,47 @@ def main():
                     metadata = {
                         "timestamp": timestamp,
                         "novel_name": novel_name,
-                        "file_hash": file_hash,
+                        "file_hash": version_hash,
+                        "source_file_hash": file_hash,
+                        "append": append_info,
                         "input_file": os.path.abspath(input_file),
                         "provider": provider,
                         "model": model,
                         "chapter_count": len(summaries),
+                        "concurrency": concurrency_stats,
+                        "failover": failover_stats,
+                        "stream": generator.stream_stats if generator.stream else None,
+                        "usage": {**usage_stats, "prompt_hash": prompt_hash},
+                        "replay": llm_replay,
+                        "cache": {**cache_stats.to_dict(), "prompt_hash": prompt_hash, "deduplicated": deduplicated[0]},
                         "fingerprint": current_fingerprint # 记录指纹，供下次校验
                     }
                     with open(os.path.join(final_output_dir, "run_metadata.json"), 'w', encoding='utf-8') as f:
                         json.dump(metadata, f, ensure_ascii=False, indent=2)
                     
                     # --- 自动执行数据库迁移 (Auto Migration) ---
-                    print("\n=== 正在自动更新图谱数据库 ===")
-                    try:
-                        from scripts.migrate_json_to_sqlite import migrate
-                        print("正在同步数据到 storytrace.db ...")
-                        migrate()
-                        print("✅ 数据库同步完成！现在可以启动 Web 服务查看图谱了。")
-                    except Exception as me:
-                        print(f"⚠️ 自动迁移失败: {me}")
-                        print("请稍后手动运行: python scripts/migrate_json_to_sqlite.py")
+                    if llm_replay:
+                        print("[Replay] 回放运行不同步数据库")
+                    else:
+                        print("\n=== 正在自动更新图谱数据库 ===")
+                        try:
+                            from scripts.migrate_json_to_sqlite import migrate
+                            print("正在同步数据到 storytrace.db ...")
+                            migrate()
+                            print("✅ 数据库同步完成！现在可以启动 Web 服务查看图谱了。")
+                        except Exception as me:
+                            print(f"⚠️ 自动迁移失败: {me}")
+                            print("请稍后手动运行: python scripts/migrate_json_to_sqlite.py")
 
                 except Exception as e:
                     print(f"智能总结失败: {e}")
                     import traceback
                     traceback.print_exc()
+
+            # 未开启总结 (或总结中途失败) 时写完剩余章节
+            for _ in saved_chapters:
+                pass
+            print("\n分割处理完成！")
             
         else:
             print("\n未找到任何章节。")
@@ -15,6 +15,7 @@ class JobStatus(BaseModel):
     created_at: float
     updated_at: float
     metadata: Optional[Dict[str, Any]] = None  # New field for metadata
+    usage: Optional[Dict[str, Any]] = None  # LLM token / latency / cost stats (core.summarizer.usage)
 
 class JobManager:
     _instance = None
@@ -90,6 +91,13 @@ class JobManager:
             elif job.status == "pending":
                 job.status = "processing"
                 
+    def update_usage(self, job_id: str, usage: Optional[Dict[str, Any]]):
+        if job_id not in self.jobs or usage is None:
+            return
+
+        with self._job_lock:
+            self.jobs[job_id].usage = usage
+
     def fail_job(self, job_id: str, error_msg: str):
         if job_id not in self.jobs:
             return
@@ -20,9 +20,11 @@ from data_protocol.models import (
     ConceptStage # Import ConceptStage
 )
 from core.world_builder.aggregator import EntityAggregator
-from backend.routers.analysis_helper import get_merged_chapters, db_chapter_to_summary, get_entity_timeline_logic
+from backend.routers.analysis_helper import get_merged_chapters, db_chapter_to_summary, get_entity_timeline_logic, get_chapter_content, get_word_counts
 from backend.narrative_engine.plugins.concept import ConceptAnalyzer
 from core.summarizer.llm_client import ClientFactory
+from core.summarizer.usage import UsageTracker, track_usage
+from backend.routers.novels import append_run_usage
 from core.config import settings
 from core.analysis.segmenter import PlotSegmenter
 from core.db.models import PlotSegment, PlotArc
@@ -85,6 +87,7 @@ def generate_segments(
     if llm_client:
         from core.summarizer.generator import SummaryGenerator
         generator = SummaryGenerator(llm_client)
+        usage = UsageTracker()
         
         print(f"Starting LLM enrichment for {len(segments)} segments...")
         for seg in segments:
@@ -113,7 +116,8 @@ def generate_segments(
                         seg_summaries.append(f"第{c.chapter_index}章: {text}")
                 
                 if seg_summaries:
-                    result = generator.generate_segment_summary(seg_summaries)
+                    with track_usage(usage):
+                        result = generator.generate_segment_summary(seg_summaries)
                     if result:
                         seg.title = result.get("title", seg.title)
                         seg.synopsis = result.get("synopsis", "")
@@ -123,6 +127,7 @@ def generate_segments(
                 print(f"Failed to enrich segment {seg.id}: {e}")
                 session.rollback() # Rollback only this segment update
                 continue
+        append_run_usage(session, run, "segments", usage)
         
     return [
         PlotSegmentResponse(
@@ -235,6 +240,7 @@ def generate_arcs(
     if llm_client:
         from core.summarizer.generator import SummaryGenerator
         generator = SummaryGenerator(llm_client)
+        usage = UsageTracker()
         
         print(f"Starting LLM enrichment for {len(arcs)} arcs...")
         for arc in arcs:
@@ -254,7 +260,8 @@ def generate_arcs(
                         arc_summaries.append(f"【{s.title}】: {s.synopsis}")
                 
                 if arc_summaries:
-                    result = generator.generate_arc_summary(arc_summaries)
+                    with track_usage(usage):
+                        result = generator.generate_arc_summary(arc_summaries)
                     if result:
                         arc.title = result.get("title", arc.title)
                         arc.synopsis = result.get("synopsis", "")
@@ -264,6 +271,7 @@ def generate_arcs(
                 print(f"Failed to enrich arc {arc.id}: {e}")
                 session.rollback()
                 continue
+        append_run_usage(session, run, "arcs", usage)
         
     return [
         PlotArcResponse(
@@ -322,6 +330,7 @@ def list_chapters(novel_name: str, file_hash: str, timestamp: str, session: Sess
     # instead returning the merged result of all runs for this hash.
     # This implements the "Best Effort Merge" logic.
     chapters = get_merged_chapters(session, novel_name, file_hash)
+    word_counts = get_word_counts(session, chapters)
     
     return [
         ChapterPreview(
@@ -332,7 +341,7 @@ def list_chapters(novel_name: str, file_hash: str, timestamp: str, session: Sess
             headline=c.headline or "",
             has_summary=True,
             stats={
-                "word_count": len(c.content) if c.content else 0,
+                "word_count": word_counts.get(c.id, 0),
                 "entity_count": len(c.entities),
                 "relationship_count": len(c.relationships)
             }
@@ -355,7 +364,7 @@ def get_chapter_detail(novel_name: str, file_hash: str, timestamp: str, chapter_
     
     # Convert Proto models to Schema models
     summary_sentences = []
-    chapter_content = chapter.content or ""
+    chapter_content = get_chapter_content(session, chapter)
 
     for s in summary.summary_sentences:
         spans = []
@@ -394,7 +403,7 @@ def get_chapter_detail(novel_name: str, file_hash: str, timestamp: str, chapter_
         title=chapter.title,
         volume_title=chapter.volume_title,
         headline=chapter.headline,
-        content=chapter.content or "",
+        content=chapter_content,
         summary_sentences=summary_sentences,
         entities=entities
     )
@@ -12,6 +12,10 @@ from data_protocol.models import (
 )
 from backend.schemas import TimelineEvent
 from core.world_builder.aggregator import EntityAggregator
+from core.paths import PathManager
+from core.identifiers import IdentifierGenerator
+from core.splitter.archive import ChapterArchive
+from core.db.text_store import ChapterTextStore
 import json
 
 def get_merged_chapters(session: Session, novel_name: str, file_hash: str) -> List[Chapter]:
@@ -42,6 +46,41 @@ def get_merged_chapters(session: Session, novel_name: str, file_hash: str) -> Li
     # 3. Return sorted list
     return [merged_map[idx] for idx in sorted(merged_map.keys())]
 
+def get_chapter_content(session: Session, chapter: Chapter) -> str:
+    """
+    章节正文 (按需加载)：优先读取数据库 (旧数据的 Chapter.content 或按哈希引用的 ChapterText)，
+    缺失时按偏移读取运行目录下的打包文件 (chapters.pack)。
+    """
+    content = ChapterTextStore.get_content(session, chapter)
+    if content:
+        return content
+
+    run = chapter.run
+    if not run or not run.version or not run.version.novel:
+        return ""
+    run_dir = PathManager.get_run_dir(run.version.novel.name, run.version.hash, run.timestamp)
+    archive = ChapterArchive.load(run_dir)
+    if not archive:
+        return ""
+    # 数据库中不保存拆分时的章节 ID：分卷章节的 ID 带有 vol_N_ 前缀，无法由 chapter_index 还原，
+    # 改按 (分卷标题, 章节标题) 查找，避免不同卷的同名章节取错正文
+    if chapter.volume_title:
+        return archive.read_content(None, chapter.title, chapter.volume_title) or ""
+    chapter_id = IdentifierGenerator.generate_chapter_id(chapter.chapter_index)
+    return archive.read_content(chapter_id, chapter.title) or ""
+
+def get_word_counts(session: Session, chapters: List[Chapter]) -> Dict[int, int]:
+    """
+    批量获取章节字数 {chapter.id: word_count}。
+    优先使用预计算的 Chapter.word_count，旧数据才回退到 ChapterText 的字数 (均不读取正文)。
+    """
+    missing = [c for c in chapters if c.word_count is None]
+    lengths = ChapterTextStore.get_lengths(session, [c.content_hash for c in missing if not c.content])
+    counts = {c.id: c.word_count for c in chapters if c.word_count is not None}
+    for c in missing:
+        counts[c.id] = len(c.content) if c.content else lengths.get(c.content_hash, 0)
+    return counts
+
 def db_chapter_to_summary(db_chapter: Chapter) -> ChapterSummary:
     # Convert summaries
     summaries = []
@@ -1,4 +1,5 @@
 import asyncio
+import contextvars
 from typing import List, Optional, Dict
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -10,6 +11,7 @@ from backend.routers.analysis import get_session, get_merged_chapters, db_chapte
 from backend.narrative_engine.core.models import AnalysisEvent
 from core.world_builder.aggregator import EntityAggregator
 from core.summarizer.llm_client import ClientFactory
+from core.summarizer.usage import UsageTracker, track_usage
 from core.config import settings
 from sqlmodel import Session
 from core.db.engine import engine
@@ -181,98 +183,110 @@ def run_relationship_analysis_task(job_id: str, request: RelationshipJobRequest)
     """
     Background task wrapper for single relationship analysis.
     """
-    try:
-        job_manager.update_progress(job_id, 0, "Initializing analysis...")
-        
-        def progress_callback(pct, msg):
-            job_manager.update_progress(job_id, pct, msg)
-            
-        result = analyze_relationship_core(
-            request.novel_name, 
-            request.file_hash, 
-            request.source, 
-            request.target, 
-            progress_callback
-        )
-        
-        job_manager.complete_job(job_id, result)
-            
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        job_manager.fail_job(job_id, str(e))
+    with track_usage(UsageTracker()) as usage:
+        try:
+            job_manager.update_progress(job_id, 0, "Initializing analysis...")
+
+            def progress_callback(pct, msg):
+                job_manager.update_progress(job_id, pct, msg)
+                job_manager.update_usage(job_id, usage.summary())
+
+            result = analyze_relationship_core(
+                request.novel_name,
+                request.file_hash,
+                request.source,
+                request.target,
+                progress_callback
+            )
+
+            job_manager.update_usage(job_id, usage.summary(chapters=result.get("chapters_analyzed")))
+            job_manager.complete_job(job_id, result)
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job_manager.update_usage(job_id, usage.summary())
+            job_manager.fail_job(job_id, str(e))
 
 def run_batch_analysis_orchestrator(job_id: str, request: BatchRelationshipJobRequest):
     """
     Orchestrator for batch analysis with concurrency control.
     """
-    try:
-        job_manager.update_progress(job_id, 0, f"Initializing batch of {len(request.pairs)} pairs...")
-        
-        total_pairs = len(request.pairs)
-        completed_pairs = 0
-        
-        # Helper to update parent job
-        def update_parent_progress(current_pair_idx, current_pair_name, sub_pct, sub_msg):
-            # Global progress = (completed_pairs * 100 + sub_pct) / total_pairs
-            # But simpler: just show which pair is being processed
-            # job_manager.update_progress(job_id, ...)
-            # Let's just track completed pairs for the progress bar
-            global_pct = int((completed_pairs / total_pairs) * 100)
-            job_manager.update_progress(job_id, global_pct, f"Processing {completed_pairs + 1}/{total_pairs}: {current_pair_name} - {sub_msg}")
-
-        # ThreadPoolExecutor
-        # We process pairs in queue, but max 3 concurrently.
-        # Since we want to update the Parent Job with "Current Activity", it's a bit tricky with threads.
-        # We can just report "Processing X/Y pairs" and let the sub-tasks log to console or something.
-        # Or we can pass a callback that doesn't overwrite the main message too frantically.
-        
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            future_to_pair = {}
-            
-            for pair in request.pairs:
-                source = pair.source
-                target = pair.target
-                pair_label = f"{source} & {target}"
-                
-                # Define a thread-safe callback for this specific task
-                # Note: job_manager.update_progress is likely thread-safe (dict update)
-                # But we share the same job_id! Race conditions on the message string.
-                # So we should probably NOT update the main job details from sub-threads frequently.
-                # We can just update it when a task starts or finishes.
-                
-                def silent_callback(pct, msg):
-                    # Maybe log to console?
-                    pass
-                
-                future = executor.submit(
-                    analyze_relationship_core,
-                    request.novel_name,
-                    request.file_hash,
-                    source,
-                    target,
-                    silent_callback
-                )
-                future_to_pair[future] = pair_label
-
-            for future in as_completed(future_to_pair):
-                pair_label = future_to_pair[future]
-                completed_pairs += 1
-                try:
-                    res = future.result()
-                    print(f"Batch sub-task finished: {pair_label}")
-                except Exception as exc:
-                    print(f"Batch sub-task failed: {pair_label} generated an exception: {exc}")
-                
-                pct = int((completed_pairs / total_pairs) * 100)
-                job_manager.update_progress(job_id, pct, f"Completed {completed_pairs}/{total_pairs} pairs")
+    with track_usage(UsageTracker()) as usage:
+        try:
+            job_manager.update_progress(job_id, 0, f"Initializing batch of {len(request.pairs)} pairs...")
+
+            total_pairs = len(request.pairs)
+            completed_pairs = 0
+            chapters_analyzed = 0
+
+            # Helper to update parent job
+            def update_parent_progress(current_pair_idx, current_pair_name, sub_pct, sub_msg):
+                # Global progress = (completed_pairs * 100 + sub_pct) / total_pairs
+                # But simpler: just show which pair is being processed
+                # job_manager.update_progress(job_id, ...)
+                # Let's just track completed pairs for the progress bar
+                global_pct = int((completed_pairs / total_pairs) * 100)
+                job_manager.update_progress(job_id, global_pct, f"Processing {completed_pairs + 1}/{total_pairs}: {current_pair_name} - {sub_msg}")
+
+            # ThreadPoolExecutor
+            # We process pairs in queue, but max 3 concurrently.
+            # Since we want to update the Parent Job with "Current Activity", it's a bit tricky with threads.
+            # We can just report "Processing X/Y pairs" and let the sub-tasks log to console or something.
+            # Or we can pass a callback that doesn't overwrite the main message too frantically.
+
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                future_to_pair = {}
+
+                for pair in request.pairs:
+                    source = pair.source
+                    target = pair.target
+                    pair_label = f"{source} & {target}"
+
+                    # Define a thread-safe callback for this specific task
+                    # Note: job_manager.update_progress is likely thread-safe (dict update)
+                    # But we share the same job_id! Race conditions on the message string.
+                    # So we should probably NOT update the main job details from sub-threads frequently.
+                    # We can just update it when a task starts or finishes.
+
+                    def silent_callback(pct, msg):
+                        # Maybe log to console?
+                        pass
+
+                    # 子线程不会自动继承 contextvars，复制上下文以便 LLM 用量记到本任务
+                    future = executor.submit(
+                        contextvars.copy_context().run,
+                        analyze_relationship_core,
+                        request.novel_name,
+                        request.file_hash,
+                        source,
+                        target,
+                        silent_callback
+                    )
+                    future_to_pair[future] = pair_label
+
+                for future in as_completed(future_to_pair):
+                    pair_label = future_to_pair[future]
+                    completed_pairs += 1
+                    try:
+                        res = future.result()
+                        chapters_analyzed += res.get("chapters_analyzed", 0)
+                        print(f"Batch sub-task finished: {pair_label}")
+                    except Exception as exc:
+                        print(f"Batch sub-task failed: {pair_label} generated an exception: {exc}")
+
+                    pct = int((completed_pairs / total_pairs) * 100)
+                    job_manager.update_progress(job_id, pct, f"Completed {completed_pairs}/{total_pairs} pairs")
+                    job_manager.update_usage(job_id, usage.summary())
 
-        job_manager.complete_job(job_id, {"total": total_pairs, "completed": completed_pairs})
+            job_manager.update_usage(job_id, usage.summary(chapters=chapters_analyzed))
+            job_manager.complete_job(job_id, {"total": total_pairs, "completed": completed_pairs})
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        job_manager.fail_job(job_id, str(e))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job_manager.update_usage(job_id, usage.summary())
+            job_manager.fail_job(job_id, str(e))
 
 @router.post("/batch-relationship", response_model=Dict[str, str])
 def submit_batch_relationship_job(request: BatchRelationshipJobRequest, background_tasks: BackgroundTasks):
@@ -3,7 +3,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session, select
 from core.db.engine import engine
 from core.db.models import Novel, NovelVersion, AnalysisRun
-from backend.schemas import NovelInfo, RunInfo
+from backend.schemas import NovelInfo, RunInfo, RunCacheStats, RunUsageStats
+from core.summarizer.usage import UsageTracker
 import json
 
 router = APIRouter(prefix="/api/novels", tags=["novels"])
@@ -21,25 +22,103 @@ def list_novels(session: Session = Depends(get_session)):
         results.append(NovelInfo(name=n.name, hashes=hashes))
     return results
 
-@router.get("/{novel_name}/{file_hash}/runs", response_model=List[RunInfo])
-def list_runs(novel_name: str, file_hash: str, session: Session = Depends(get_session)):
-    # Find version
+def get_version(session: Session, novel_name: str, file_hash: str) -> NovelVersion:
     statement = select(NovelVersion).join(Novel).where(Novel.name == novel_name).where(NovelVersion.hash == file_hash)
     version = session.exec(statement).first()
     
     if not version:
         raise HTTPException(status_code=404, detail="Novel version not found")
+    return version
+
+def load_run_metadata(run: AnalysisRun) -> dict:
+    if run.config_snapshot:
+        try:
+            return json.loads(run.config_snapshot)
+        except:
+            pass
+    return {}
+
+def append_run_usage(session: Session, run: AnalysisRun, endpoint: str, tracker: UsageTracker):
+    """把后端对某次运行追加的 LLM 用量 (剧情段落 / 剧情弧生成) 记入该运行的 metadata.backend_usage"""
+    usage = tracker.summary()
+    if not usage["calls"]:
+        return
+    from datetime import datetime
+    metadata = load_run_metadata(run)
+    metadata.setdefault("backend_usage", []).append(
+        {"endpoint": endpoint, "timestamp": datetime.now().isoformat(timespec="seconds"), **usage})
+    run.config_snapshot = json.dumps(metadata, ensure_ascii=False)
+    session.add(run)
+    session.commit()
+
+
+def get_session():
+    with Session(engine) as session:
+        yield session
+
+# Removed inline db_chapter_to_summary and get_merged_chapters as they are now in analysis_helper
+
+@router.get("/{novel_name}/{file_hash}/runs", response_model=List[RunInfo])
+def list_runs(novel_name: str, file_hash: str, session: Session = Depends(get_session)):
+    version = get_version(session, novel_name, file_hash)
     
     runs = []
     for run in version.runs:
-        metadata = {}
-        if run.config_snapshot:
-            try:
-                metadata = json.loads(run.config_snapshot)
-            except:
-                pass
-        runs.append(RunInfo(timestamp=run.timestamp, file_hash=file_hash, metadata=metadata))
+        runs.append(RunInfo(timestamp=run.timestamp, file_hash=file_hash, metadata=load_run_metadata(run)))
     
     # Sort descending
     runs.sort(key=lambda x: x.timestamp, reverse=True)
     return runs
+
+@router.get("/{novel_name}/{file_hash}/cache-stats", response_model=List[RunCacheStats])
+def list_cache_stats(novel_name: str, file_hash: str, session: Session = Depends(get_session)):
+    """
+    各次运行的章节缓存命中率 / 延迟 / 节省的 Token (按时间升序)。
+    相邻两次运行的 prompt_hash 或 model 变化且命中率骤降，说明缓存被整体失效。
+    没有缓存统计的旧运行会被跳过。
+    """
+    version = get_version(session, novel_name, file_hash)
+    
+    results = []
+    for run in version.runs:
+        metadata = load_run_metadata(run)
+        cache = metadata.get("cache")
+        if not isinstance(cache, dict):
+            continue
+        results.append(RunCacheStats(
+            timestamp=run.timestamp,
+            provider=metadata.get("provider"),
+            model=metadata.get("model"),
+            **{k: v for k, v in cache.items() if k in RunCacheStats.model_fields and k != "timestamp"}
+        ))
+    
+    results.sort(key=lambda x: x.timestamp)
+    return results
+
+@router.get("/{novel_name}/{file_hash}/usage-stats", response_model=List[RunUsageStats])
+def list_usage_stats(novel_name: str, file_hash: str, session: Session = Depends(get_session)):
+    """
+    各次运行的 LLM Token / 费用 / 吞吐 (按时间升序)。
+    相邻两次运行的 prompt_hash 变化且每章 Token 明显上升，说明 Prompt 修改带来了成本回归。
+    没有用量统计的旧运行会被跳过。
+    """
+    version = get_version(session, novel_name, file_hash)
+
+    results = []
+    for run in version.runs:
+        metadata = load_run_metadata(run)
+        usage = metadata.get("usage")
+        backend_usage = metadata.get("backend_usage") or []
+        if not isinstance(usage, dict) and not backend_usage:
+            continue
+        results.append(RunUsageStats(
+            timestamp=run.timestamp,
+            provider=metadata.get("provider"),
+            model=metadata.get("model"),
+            backend_usage=backend_usage,
+            **{k: v for k, v in (usage or {}).items()
+               if k in RunUsageStats.model_fields and k not in ("timestamp", "provider", "model", "backend_usage")}
+        ))
+
+    results.sort(key=lambda x: x.timestamp)
+    return results
@@ -11,6 +11,42 @@ class RunInfo(BaseModel):
     file_hash: str
     metadata: Optional[Dict[str, Any]] = None
 
+class RunCacheStats(BaseModel):
+    """单次运行的章节缓存效果 (来自 run_metadata.json 的 cache 字段)"""
+    timestamp: str
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    prompt_hash: Optional[str] = None
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    writes: int = 0
+    hit_rate: float = 0.0
+    avg_read_ms: float = 0.0
+    avg_write_ms: float = 0.0
+    tokens_saved: int = 0
+    chunk_hits: int = 0
+    chunk_misses: int = 0
+
+class RunUsageStats(BaseModel):
+    """单次运行的 LLM 用量 (来自 run_metadata.json 的 usage 字段；后端追加的调用见 backend_usage)"""
+    timestamp: str
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    prompt_hash: Optional[str] = None
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: Optional[float] = None
+    chapters: Optional[int] = None
+    tokens_per_chapter: Optional[float] = None
+    chapters_per_minute: Optional[float] = None
+    p95_latency_seconds: Optional[float] = None
+    backend_usage: List[Dict[str, Any]] = []
+
 class ChapterPreview(BaseModel):
     id: str
     index: int
@@ -39,6 +39,12 @@ async def startup_event():
         print(f"Path: {route.path} | Name: {route.name} | Methods: {route.methods}")
     print("=========================")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    # 关闭进程内共享的 LLM 连接池
+    from core.summarizer.llm_client import close_sync_clients
+    close_sync_clients()
+
 @app.get("/")
 async def index():
     return {"message": "StoryTrace API is running. Please access the frontend at http://localhost:5173"}
@@ -1,8 +1,465 @@
 import os
 import json
+import time
+import sqlite3
 import hashlib
-from typing import Dict, Optional, List
-from data_protocol.models import ChapterSummary
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, Dict, Optional, List, Iterable, Iterator, Tuple, Set, Union
+from data_protocol.models import Chapter, ChapterSummary
+from core.utils import estimate_tokens, calculate_content_hash
+from core.singleflight import SingleFlight
+
+# 缓存接口接受章节正文或 Chapter 对象 (后者直接使用分割时计算好的 content_hash)
+ContentLike = Union[str, Chapter]
+
+# SQLite 单条语句允许的参数数量有限，批量查询时分块
+_SQLITE_BATCH = 500
+
+# 按缓存键合并进行中的生成 (进程内共享，CLI 与后端使用同一实例)
+summary_flight = SingleFlight()
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目的元信息 (用于统计与淘汰)"""
+    key: str
+    size: int
+    last_access: float
+    hits: int = 0
+
+
+@dataclass
+class CacheStats:
+    """单次运行的缓存效果统计 (写入 run_metadata.json 的 "cache" 字段)"""
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    writes: int = 0
+    read_seconds: float = 0.0
+    write_seconds: float = 0.0
+    reads: int = 0
+    tokens_saved: int = 0
+    # 长章节分块总结的块级缓存 (不计入章节命中率)
+    chunk_hits: int = 0
+    chunk_misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["hit_rate"] = round(self.hit_rate, 4)
+        data["avg_read_ms"] = round(self.read_seconds * 1000 / self.reads, 3) if self.reads else 0.0
+        data["avg_write_ms"] = round(self.write_seconds * 1000 / self.writes, 3) if self.writes else 0.0
+        data["read_seconds"] = round(self.read_seconds, 4)
+        data["write_seconds"] = round(self.write_seconds, 4)
+        return data
+
+
+class CacheBackend(ABC):
+    """缓存存储后端：以字符串 key 存取 JSON 可序列化的 dict"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, data: Dict):
+        pass
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        """批量读取，只返回命中的 key"""
+        result = {}
+        for key in keys:
+            data = self.get(key)
+            if data is not None:
+                result[key] = data
+        return result
+
+    def put_many(self, items: Iterable[Tuple[str, Dict]]):
+        for key, data in items:
+            self.put(key, data)
+
+    @abstractmethod
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        pass
+
+    @abstractmethod
+    def entries(self) -> List[CacheEntry]:
+        """列出所有条目的元信息 (不读取内容)"""
+        pass
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]):
+        pass
+
+    def compact(self):
+        """删除条目后回收磁盘空间"""
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonFileBackend(CacheBackend):
+    """旧格式：每个 key 一个 JSON 文件 (平铺在缓存目录中)"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        cache_path = self._path(key)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # 以修改时间记录最近访问 (文件系统的 atime 常被关闭)
+            os.utime(cache_path)
+            return data
+        except Exception as e:
+            print(f"[Cache] Error reading cache {key}: {e}")
+            return None
+
+    def put(self, key: str, data: Dict):
+        # 先写临时文件再替换，避免并发读取到写了一半的文件
+        cache_path = self._path(key)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, cache_path)
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            data = self.get(key)
+            if data is not None:
+                yield key, data
+
+    def entries(self) -> List[CacheEntry]:
+        # 文件格式不记录命中次数，LFU 退化为 LRU
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            stat = os.stat(self._path(name[:-len('.json')]))
+            result.append(CacheEntry(key=name[:-len('.json')], size=stat.st_size, last_access=stat.st_mtime))
+        return result
+
+    def delete_many(self, keys: Iterable[str]):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class SqliteBackend(CacheBackend):
+    """
+    单文件 SQLite 缓存 (WAL 模式)。
+    读写共用一个连接并加锁，批量操作在单个事务中完成，写入天然原子。
+    """
+    DB_NAME = "cache.sqlite3"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # 旧版本创建的表缺少访问统计字段
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cache)")]
+        if 'last_access' not in columns:
+            self._conn.execute("ALTER TABLE cache ADD COLUMN last_access REAL")
+        if 'hits' not in columns:
+            self._conn.execute("ALTER TABLE cache ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        keys = list(dict.fromkeys(keys))
+        result = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                chunk = keys[i:i + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(f"SELECT key, value FROM cache WHERE key IN ({placeholders})", chunk).fetchall()
+                for key, value in rows:
+                    try:
+                        result[key] = json.loads(value)
+                    except Exception as e:
+                        print(f"[Cache] Error reading cache {key}: {e}")
+            if result:
+                # 记录访问时间与命中次数，供 LRU / LFU 淘汰使用
+                with self._conn:
+                    self._conn.executemany("UPDATE cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                                           [(time.time(), key) for key in result])
+        return result
+
+    def put(self, key: str, data: Dict):
+        self.put_many([(key, data)])
+
+    def put_many(self, items: Iterable[Tuple[str, Dict]]):
+        now = time.time()
+        rows = [(key, json.dumps(data, ensure_ascii=False), now, now) for key, data in items]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)", rows)
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM cache").fetchall()
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def entries(self) -> List[CacheEntry]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, length(CAST(value AS BLOB)), coalesce(last_access, created_at), hits FROM cache"
+            ).fetchall()
+        return [CacheEntry(key=key, size=size, last_access=last_access, hits=hits) for key, size, last_access, hits in rows]
+
+    def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        with self._lock:
+            with self._conn:
+                for i in range(0, len(keys), _SQLITE_BATCH):
+                    chunk = keys[i:i + _SQLITE_BATCH]
+                    placeholders = ','.join('?' * len(chunk))
+                    self._conn.execute(f"DELETE FROM cache WHERE key IN ({placeholders})", chunk)
+
+    def compact(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_backend(cache_dir: str, backend: str = None) -> CacheBackend:
+    """按名称创建缓存后端 (默认取 settings.CACHE_BACKEND)"""
+    if backend is None:
+        from core.config import settings
+        backend = settings.CACHE_BACKEND
+    if backend == 'json':
+        return JsonFileBackend(cache_dir)
+    if backend == 'sqlite':
+        return SqliteBackend(os.path.join(cache_dir, SqliteBackend.DB_NAME))
+    raise ValueError(f"未知的缓存后端: {backend} (可选: sqlite, json)")
+
+
+def migrate_json_cache(cache_dir: str, batch_size: int = 1000, delete: bool = False) -> int:
+    """
+    把旧格式的 .cache/*.json 批量导入 SQLite 后端。
+    Args:
+        delete: 导入成功后删除原 JSON 文件
+    Returns:
+        导入的条目数
+    """
+    source = JsonFileBackend(cache_dir)
+    target = SqliteBackend(os.path.join(cache_dir, SqliteBackend.DB_NAME))
+    imported = 0
+    batch = []
+
+    def flush():
+        nonlocal imported
+        target.put_many(batch)
+        imported += len(batch)
+        if delete:
+            for key, _ in batch:
+                os.remove(source._path(key))
+        batch.clear()
+        print(f"[Cache] 已导入 {imported} 条...")
+
+    try:
+        for key, data in source.iter_items():
+            batch.append((key, data))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        target.close()
+    return imported
+
+
+class LRUCache:
+    """进程内的定长 LRU (capacity <= 0 时禁用)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def discard(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # Windows 上 os.kill 会直接结束进程，只依赖租约的过期时间
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LeaseRegistry:
+    """
+    运行租约：正在进行的分析把它会用到的缓存 key 登记在 .cache/.leases/ 下，
+    淘汰时跳过这些 key。进程已退出或超过 TTL 的租约视为失效并被清理。
+    以文件存储，对各个存储后端以及多个进程 (manage.py 与 main.py) 都可见。
+    """
+
+    def __init__(self, cache_dir: str, ttl_seconds: float):
+        self.lease_dir = os.path.join(cache_dir, ".leases")
+        self.ttl_seconds = ttl_seconds
+
+    def acquire(self, keys: Iterable[str]) -> str:
+        os.makedirs(self.lease_dir, exist_ok=True)
+        lease_id = f"{os.getpid()}_{time.time_ns()}"
+        path = os.path.join(self.lease_dir, f"{lease_id}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"pid": os.getpid(), "created_at": time.time(), "keys": sorted(set(keys))}, f)
+        os.replace(tmp_path, path)
+        return lease_id
+
+    def extend(self, lease_id: str, keys: Iterable[str]):
+        """向进行中的租约追加 key (流式处理时边读取章节边登记)，追加写入 {lease_id}.keys，每行一个"""
+        keys = list(keys)
+        if not keys:
+            return
+        with open(os.path.join(self.lease_dir, f"{lease_id}.keys"), 'a', encoding='utf-8') as f:
+            f.write("".join(f"{key}\n" for key in keys))
+
+    def release(self, lease_id: str):
+        for suffix in (".json", ".keys"):
+            try:
+                os.remove(os.path.join(self.lease_dir, f"{lease_id}{suffix}"))
+            except FileNotFoundError:
+                pass
+
+    def active(self) -> Dict[str, Set[str]]:
+        """返回 {lease_id: keys}，顺带删除失效的租约"""
+        result = {}
+        if not os.path.isdir(self.lease_dir):
+            return result
+        now = time.time()
+        for name in os.listdir(self.lease_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.lease_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if now - lease.get("created_at", 0) > self.ttl_seconds or not _pid_alive(lease.get("pid", -1)):
+                self.release(name[:-len('.json')])
+                continue
+            keys = set(lease.get("keys", []))
+            try:
+                with open(f"{path[:-len('.json')]}.keys", 'r', encoding='utf-8') as f:
+                    keys.update(line.strip() for line in f if line.strip())
+            except OSError:
+                pass
+            result[name[:-len('.json')]] = keys
+        return result
+
+
+def select_evictions(entries: List[CacheEntry], max_bytes: int = 0, max_age_seconds: float = 0,
+                     policy: str = 'lru', protected: Set[str] = frozenset(), now: float = None) -> List[str]:
+    """
+    计算需要淘汰的 key。
+    1. 超过 max_age_seconds 未被访问的条目
+    2. 总体积仍超过 max_bytes 时，按 LRU (最久未访问) 或 LFU (命中最少，其次最久未访问) 继续淘汰
+    protected 中的条目永不淘汰 (但计入总体积)。max_bytes / max_age_seconds 为 0 表示不限制。
+    """
+    if policy not in ('lru', 'lfu'):
+        raise ValueError(f"未知的淘汰策略: {policy} (可选: lru, lfu)")
+    now = time.time() if now is None else now
+    evicted = []
+    remaining = []
+    for entry in entries:
+        if entry.key not in protected and max_age_seconds and now - entry.last_access > max_age_seconds:
+            evicted.append(entry.key)
+        else:
+            remaining.append(entry)
+
+    if max_bytes:
+        total = sum(entry.size for entry in remaining)
+        if total > max_bytes:
+            if policy == 'lru':
+                order = lambda e: e.last_access
+            else:
+                order = lambda e: (e.hits, e.last_access)
+            for entry in sorted((e for e in remaining if e.key not in protected), key=order):
+                if total <= max_bytes:
+                    break
+                evicted.append(entry.key)
+                total -= entry.size
+    return evicted
+
 
 class CacheManager:
     """
@@ -11,49 +468,252 @@ class CacheManager:
     1. 章节内容哈希 (Content Hash)
     2. Prompt 哈希 (Prompt Hash)
     3. 模型配置哈希 (Model Config Hash)
+    传入 Chapter 时复用分割阶段算好的 content_hash，配置哈希按配置内容记忆，
+    查询时只需对一个短字符串做一次 MD5。
+
+    两级存储：进程内 LRU (settings.CACHE_MEMORY_ITEMS) + 可插拔的磁盘后端 (settings.CACHE_BACKEND)。
+    使用 SQLite 后端时，未命中的 key 会回退读取旧格式的 JSON 文件并写入 SQLite (无需先手动迁移)。
+    磁盘体积 / 时间预算由 trim() 执行，正在运行的分析持有的租约 key 不会被淘汰。
     """
 
-    def __init__(self, cache_dir: str):
+    def __init__(self, cache_dir: str, backend: str = None, memory_items: int = None):
+        from core.config import settings
         self.cache_dir = cache_dir
         os.makedirs(self.cache_dir, exist_ok=True)
+        self.backend = create_backend(cache_dir, backend)
+        self.legacy = JsonFileBackend(cache_dir) if not isinstance(self.backend, JsonFileBackend) else None
+        self.memory = LRUCache(settings.CACHE_MEMORY_ITEMS if memory_items is None else memory_items)
+        self.leases = LeaseRegistry(cache_dir, settings.CACHE_LEASE_TTL_HOURS * 3600)
+        self.run_stats = CacheStats()
+        self._config_hashes: Dict[Tuple, str] = {}
 
-    def _calculate_key(self, content: str, prompt_hash: str, model_config: Dict) -> str:
-        """计算缓存唯一键"""
-        # 1. Content Hash
-        content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-        
-        # 2. Model Config Hash (ensure consistent ordering)
+    def _config_hash(self, model_config: Dict) -> str:
+        """模型配置哈希 (ensure consistent ordering)，同一配置只序列化一次"""
+        try:
+            memo_key = tuple(sorted(model_config.items()))
+            cached = self._config_hashes.get(memo_key)
+        except TypeError:
+            # 配置中含不可哈希的值 (如 list)，不做记忆
+            memo_key, cached = None, None
+        if cached is not None:
+            return cached
         config_str = json.dumps(model_config, sort_keys=True)
         config_hash = hashlib.md5(config_str.encode('utf-8')).hexdigest()
+        if memo_key is not None:
+            self._config_hashes[memo_key] = config_hash
+        return config_hash
 
-        # Combine
-        combined = f"{content_hash}_{prompt_hash}_{config_hash}"
+    @staticmethod
+    def _content_hash(item: ContentLike) -> str:
+        if isinstance(item, Chapter):
+            return item.content_hash or calculate_content_hash(item.content)
+        return calculate_content_hash(item)
+
+    def key_for_hash(self, content_hash: str, prompt_hash: str, model_config: Dict) -> str:
+        """由正文哈希计算缓存唯一键 (与 _calculate_key 结果一致)"""
+        combined = f"{content_hash}_{prompt_hash}_{self._config_hash(model_config)}"
         return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
-    def get_cached_summary(self, content: str, prompt_hash: str, model_config: Dict) -> Optional[ChapterSummary]:
+    def _calculate_key(self, content: ContentLike, prompt_hash: str, model_config: Dict) -> str:
+        """计算缓存唯一键"""
+        return self.key_for_hash(self._content_hash(content), prompt_hash, model_config)
+
+    def _get_many(self, keys: List[str]) -> Dict[str, ChapterSummary]:
+        start = time.perf_counter()
+        try:
+            return self._read_tiers(keys)
+        finally:
+            self.run_stats.reads += 1
+            self.run_stats.read_seconds += time.perf_counter() - start
+
+    def _read_tiers(self, keys: List[str]) -> Dict[str, ChapterSummary]:
+        found = {}
+        for key in keys:
+            summary = self.memory.get(key)
+            if summary is not None:
+                found[key] = summary
+        self.run_stats.memory_hits += len(found)
+
+        missing = [k for k in keys if k not in found]
+        if not missing:
+            return found
+        data = self.backend.get_many(missing)
+        if self.legacy:
+            legacy_found = self.legacy.get_many([k for k in missing if k not in data])
+            if legacy_found:
+                self.backend.put_many(legacy_found.items())
+                data.update(legacy_found)
+        for key, value in data.items():
+            summary = self._to_summary(key, value)
+            if summary is not None:
+                self.memory.put(key, summary)
+                found[key] = summary
+        return found
+
+    def _to_summary(self, key: str, data: Optional[Dict]) -> Optional[ChapterSummary]:
+        if data is None:
+            return None
+        try:
+            return ChapterSummary(**data)
+        except Exception as e:
+            print(f"[Cache] Error reading cache {key}: {e}")
+            return None
+
+    @staticmethod
+    def _copy(summary: Optional[ChapterSummary]) -> Optional[ChapterSummary]:
+        # 调用方会修改 chapter_id，返回副本以免污染内存缓存
+        return summary.model_copy(deep=True) if summary is not None else None
+
+    def _record_lookup(self, content: ContentLike, summary: Optional[ChapterSummary]):
+        if summary is None:
+            self.run_stats.misses += 1
+            return
+        self.run_stats.hits += 1
+        # 命中省下的 = 章节正文 (输入) + 模型输出的 JSON (估算)
+        output = [summary.headline or ""] + [s.summary_text for s in summary.summary_sentences]
+        output += [json.dumps([e.model_dump() for e in summary.entities], ensure_ascii=False),
+                   json.dumps([r.model_dump() for r in summary.relationships], ensure_ascii=False)]
+        text = content.content if isinstance(content, Chapter) else content
+        self.run_stats.tokens_saved += estimate_tokens(text) + estimate_tokens("".join(output))
+
+    def get_cached_summary(self, content: ContentLike, prompt_hash: str, model_config: Dict) -> Optional[ChapterSummary]:
         """尝试获取缓存的总结"""
-        key = self._calculate_key(content, prompt_hash, model_config)
-        cache_path = os.path.join(self.cache_dir, f"{key}.json")
-        
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return ChapterSummary(**data)
-            except Exception as e:
-                print(f"[Cache] Error reading cache {key}: {e}")
-                return None
-        return None
+        return self.get_cached_summaries([content], prompt_hash, model_config)[0]
 
-    def save_summary(self, content: str, prompt_hash: str, model_config: Dict, summary: ChapterSummary):
+    def get_cached_summaries(self, contents: List[ContentLike], prompt_hash: str, model_config: Dict) -> List[Optional[ChapterSummary]]:
+        """批量获取缓存的总结，返回与 contents 一一对应的列表 (未命中为 None)"""
+        keys = [self._calculate_key(content, prompt_hash, model_config) for content in contents]
+        found = self._get_many(keys)
+        results = []
+        for content, key in zip(contents, keys):
+            summary = found.get(key)
+            self._record_lookup(content, summary)
+            results.append(self._copy(summary))
+        return results
+
+    def save_summary(self, content: ContentLike, prompt_hash: str, model_config: Dict, summary: ChapterSummary):
         """保存总结到缓存"""
-        key = self._calculate_key(content, prompt_hash, model_config)
-        cache_path = os.path.join(self.cache_dir, f"{key}.json")
-        
+        self.save_summaries([(content, summary)], prompt_hash, model_config)
+
+    def save_summaries(self, items: List[Tuple[ContentLike, ChapterSummary]], prompt_hash: str, model_config: Dict):
+        """批量保存总结 (单个事务)"""
+        self._put([(self._calculate_key(content, prompt_hash, model_config), summary) for content, summary in items])
+
+    def _put(self, items: List[Tuple[str, ChapterSummary]]):
+        rows = []
+        for key, summary in items:
+            # model_dump is Pydantic v2, dict() is v1. Use model_dump if available.
+            data = summary.model_dump() if hasattr(summary, 'model_dump') else summary.dict()
+            rows.append((key, data))
+            self.memory.put(key, self._copy(summary))
+        start = time.perf_counter()
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                # model_dump is Pydantic v2, dict() is v1. Use model_dump if available.
-                data = summary.model_dump() if hasattr(summary, 'model_dump') else summary.dict()
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.backend.put_many(rows)
+            self.run_stats.writes += len(rows)
         except Exception as e:
-            print(f"[Cache] Error writing cache {key}: {e}")
+            print(f"[Cache] Error writing cache: {e}")
+        finally:
+            self.run_stats.write_seconds += time.perf_counter() - start
+
+    def _chunk_key(self, text: str, prompt_hash: str, model_config: Dict) -> str:
+        # 加前缀与整章的缓存键区分 (块的 Prompt 标题不同)
+        return self.key_for_hash("chunk_" + calculate_content_hash(text), prompt_hash, model_config)
+
+    def get_cached_chunk(self, text: str, prompt_hash: str, model_config: Dict) -> Optional[ChapterSummary]:
+        """获取长章节某一块的总结缓存 (溯源位置相对于块)"""
+        key = self._chunk_key(text, prompt_hash, model_config)
+        summary = self._get_many([key]).get(key)
+        if summary is None:
+            self.run_stats.chunk_misses += 1
+        else:
+            self.run_stats.chunk_hits += 1
+        return self._copy(summary)
+
+    def save_chunk(self, text: str, prompt_hash: str, model_config: Dict, summary: ChapterSummary):
+        """保存长章节某一块的总结"""
+        self._put([(self._chunk_key(text, prompt_hash, model_config), summary)])
+
+    async def generate_once(self, content: ContentLike, prompt_hash: str, model_config: Dict,
+                            generate: Callable[[], Awaitable[ChapterSummary]], force: bool = False) -> Tuple[ChapterSummary, bool]:
+        """
+        singleflight：相同缓存键的并发生成只执行一次，其余调用者共享结果；
+        刚由其他调用写入内存层的结果也直接复用 (force=True 时跳过，如修复模式)。
+        generate 负责调用 LLM 并写入缓存。
+        Returns:
+            (总结副本, 是否复用了其他调用的结果)
+        """
+        key = self._calculate_key(content, prompt_hash, model_config)
+
+        async def run():
+            if not force:
+                summary = self.memory.get(key)
+                if summary is not None:
+                    return summary, True
+            return await generate(), False
+
+        (summary, reused), shared = await summary_flight.do_async(key, run)
+        return self._copy(summary), shared or reused
+
+    @contextmanager
+    def lease(self, contents: Iterable[ContentLike], prompt_hash: str, model_config: Dict):
+        """
+        在一次运行期间保护这些章节的缓存不被淘汰。
+        流式处理时可先以空列表获取租约，再用 extend_lease 登记陆续读取的章节。
+        """
+        lease_id = self.leases.acquire(self._calculate_key(content, prompt_hash, model_config) for content in contents)
+        try:
+            yield lease_id
+        finally:
+            self.leases.release(lease_id)
+
+    def extend_lease(self, lease_id: str, contents: Iterable[ContentLike], prompt_hash: str, model_config: Dict):
+        self.leases.extend(lease_id, (self._calculate_key(content, prompt_hash, model_config) for content in contents))
+
+    def extend_chunk_lease(self, lease_id: str, texts: Iterable[str], prompt_hash: str, model_config: Dict):
+        """登记长章节分块的缓存键 (分块结果独立缓存，需与整章一同受租约保护)"""
+        self.leases.extend(lease_id, (self._chunk_key(text, prompt_hash, model_config) for text in texts))
+
+    def stats(self) -> Dict:
+        entries = self.backend.entries()
+        leases = self.leases.active()
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(entries),
+            "total_bytes": sum(e.size for e in entries),
+            "oldest_access": min((e.last_access for e in entries), default=None),
+            "newest_access": max((e.last_access for e in entries), default=None),
+            "total_hits": sum(e.hits for e in entries),
+            "memory_items": len(self.memory),
+            "active_leases": len(leases),
+            "leased_keys": len(set().union(*leases.values())) if leases else 0,
+        }
+
+    def trim(self, max_bytes: int = None, max_age_seconds: float = None, policy: str = None,
+             dry_run: bool = False) -> Tuple[int, int]:
+        """
+        按预算淘汰磁盘缓存 (参数缺省取 settings.CACHE_MAX_SIZE_MB / CACHE_MAX_AGE_DAYS / CACHE_EVICTION_POLICY)。
+        Returns:
+            (淘汰条目数, 释放的字节数)
+        """
+        from core.config import settings
+        if max_bytes is None:
+            max_bytes = settings.CACHE_MAX_SIZE_MB * 1024 * 1024
+        if max_age_seconds is None:
+            max_age_seconds = settings.CACHE_MAX_AGE_DAYS * 86400
+        policy = policy or settings.CACHE_EVICTION_POLICY
+        if not max_bytes and not max_age_seconds:
+            return 0, 0
+
+        entries = self.backend.entries()
+        protected = set().union(*self.leases.active().values())
+        evicted = select_evictions(entries, max_bytes, max_age_seconds, policy, protected)
+        sizes = {e.key: e.size for e in entries}
+        freed = sum(sizes[key] for key in evicted)
+        if evicted and not dry_run:
+            self.backend.delete_many(evicted)
+            self.memory.discard(evicted)
+            self.backend.compact()
+        return len(evicted), freed
+
+    def close(self):
+        self.backend.close()
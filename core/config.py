@@ -24,6 +24,81 @@ class Settings(BaseSettings):
     # LLM - Local
     LOCAL_LLM_BASE_URL: str = "http://localhost:11434/v1"
     LOCAL_LLM_MODEL: str = "qwen2.5:14b"
+
+    # LLM - DeepSeek (作为故障转移的备用 Provider)
+    DEEPSEEK_API_KEY: Optional[str] = None
+    DEEPSEEK_MODEL: str = "deepseek-chat"
+
+    # LLM - 故障转移：主 Provider 失败时依次尝试的备用 Provider (逗号分隔，如 "deepseek,local"，留空为不启用)
+    LLM_FAILOVER_PROVIDERS: str = ""
+    # 连续失败多少次后熔断该 Provider，熔断多少秒后放行一个试探请求
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_COOLDOWN: float = 60.0
+    # 对冲请求：调用超过该 Provider 的 p95 耗时 (不低于下限秒数) 仍未返回时，并行向下一个 Provider 发出同一请求
+    LLM_HEDGE_REQUESTS: bool = False
+    LLM_HEDGE_MIN_DELAY: float = 2.0
+
+    # LLM - 总结流程的自适应并发 (AIMD)：从初始值开始，成功时增加，遇到 429 / 超时减半
+    LLM_INITIAL_CONCURRENCY: int = 5
+    LLM_MAX_CONCURRENCY: int = 32
+    # 本地模型通常只能串行推理，默认固定为 1
+    LOCAL_LLM_MAX_CONCURRENCY: int = 1
+
+    # LLM - 各 Provider 的进程级速率预算 (每分钟请求数 / Token 数，0 为不限制)
+    # CLI 总结、剧情段落、编年史、概念分析、关系分析等所有调用共享同一预算
+    OPENROUTER_RPM: int = 0
+    OPENROUTER_TPM: int = 0
+    DEEPSEEK_RPM: int = 0
+    DEEPSEEK_TPM: int = 0
+    LOCAL_LLM_RPM: int = 0
+    LOCAL_LLM_TPM: int = 0
+
+    # LLM - 离线回放：设置后所有 Provider 的请求都发往该地址 (scripts/mock_llm_server.py)，
+    # CLI 的 --llm-replay 与后端任务均使用此配置
+    LLM_REPLAY_URL: Optional[str] = None
+
+    # LLM - 进程内共享的 HTTP 连接池 (所有分析接口与批处理任务共用)
+    # keep-alive 时间需长于两次 LLM 请求的间隔，否则每次调用都要重新 TLS 握手
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    # https 端点启用 HTTP/2 (需要 pip install h2；服务端不支持时自动回退 HTTP/1.1)
+    LLM_HTTP2: bool = True
+
+    # LLM - 模型单价 (美元 / 百万 Token，"模型=输入:输出" 逗号分隔)，用于在运行 / 任务统计中估算费用
+    # 例: "google/gemini-2.0-flash-001=0.1:0.4,deepseek-chat=0.27:1.1"
+    LLM_PRICING: str = ""
+
+    # LLM - 流式输出：逐 Token 接收并增量解析 JSON，headline / 实体等部分结果提前可用，
+    # 截断 (finish_reason=length) 或结构错误的输出在生成过程中即可发现并重试
+    LLM_STREAMING: bool = False
+    # 流式输出超过该秒数没有新内容时视为连接中断
+    LLM_STREAM_IDLE_TIMEOUT: float = 30.0
+
+    # 总结 - 单次请求的正文 Token 预算，超出的长章节按段落分块总结后合并实体与关系
+    SUMMARY_CHUNK_TOKENS: int = 4000
+    # 总结 - 多章打包：未命中缓存的连续短章节合并为一次请求 (正文 Token 预算，0 为不打包)，
+    # 分摊固定的 System Prompt 开销；每包章节数同时受输出长度限制
+    SUMMARY_PACK_TOKENS: int = 0
+    SUMMARY_PACK_MAX_CHAPTERS: int = 5
+
+    # Splitter - 额外启用的标题规则 (逗号分隔，如 "prologue_cn,extra_cn"，或 "all")
+    # 注意：启用后章节编号会变化，已处理过的小说会被视为新的分割结果
+    HEADING_EXTRA_RULES: str = ""
+    # Splitter - 逐章 .txt 的写入线程数。本地磁盘上顺序写入更快 (默认 1)，
+    # 网络文件系统 (NFS / SMB) 单次写入延迟高时可调大，CLI 可用 --save-workers 覆盖
+    SAVE_WORKERS: int = 1
+
+    # LLM 响应缓存后端: "sqlite" (单文件 output/.cache/cache.sqlite3) 或 "json" (旧格式，每个 key 一个文件)
+    CACHE_BACKEND: str = "sqlite"
+    # 进程内 LRU 缓存条目数 (0 为禁用)
+    CACHE_MEMORY_ITEMS: int = 1024
+    # 磁盘缓存预算 (0 为不限制)，超出后按 CACHE_EVICTION_POLICY ("lru" 或 "lfu") 淘汰
+    CACHE_MAX_SIZE_MB: int = 0
+    CACHE_MAX_AGE_DAYS: int = 0
+    CACHE_EVICTION_POLICY: str = "lru"
+    # 运行租约的最长有效期 (小时)，超时视为进程已异常退出
+    CACHE_LEASE_TTL_HOURS: int = 24
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,41 @@
+import zlib
+from typing import Tuple
+
+try:
+    import zstandard
+except ImportError:
+    # zstandard 为可选依赖，未安装时使用标准库 zlib
+    zstandard = None
+
+ZSTD = 'zstd'
+ZLIB = 'zlib'
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def default_codec() -> str:
+    return ZSTD if zstandard else ZLIB
+
+
+def compress_text(text: str, codec: str = None) -> Tuple[str, bytes]:
+    """压缩文本 (UTF-8)，返回 (codec, data)"""
+    codec = codec or default_codec()
+    raw = text.encode('utf-8')
+    if codec == ZSTD:
+        if not zstandard:
+            raise RuntimeError("未安装 zstandard，无法使用 zstd 压缩 (pip install zstandard)")
+        return ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if codec == ZLIB:
+        return ZLIB, zlib.compress(raw, ZLIB_LEVEL)
+    raise ValueError(f"未知的压缩格式: {codec}")
+
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec == ZSTD:
+        if not zstandard:
+            raise RuntimeError("数据使用 zstd 压缩，但未安装 zstandard (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == ZLIB:
+        return zlib.decompress(data).decode('utf-8')
+    raise ValueError(f"未知的压缩格式: {codec}")
@@ -1,6 +1,6 @@
 from typing import List, Optional
 from sqlmodel import Field, Relationship, SQLModel
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, Text, LargeBinary
 from data_protocol.models import BaseEntity, BaseRelationship
 
 class Novel(SQLModel, table=True):
@@ -26,6 +26,18 @@ class AnalysisRun(SQLModel, table=True):
     version: NovelVersion = Relationship(back_populates="runs")
     chapters: List["Chapter"] = Relationship(back_populates="run")
 
+class ChapterText(SQLModel, table=True):
+    """
+    按内容寻址的章节正文 (hash = MD5(content))。
+    同一本书多次运行时，相同的章节正文只存储一份。
+    正文压缩存储在 data 中 (codec = zstd / zlib)；content 仅用于未压缩的旧数据。
+    """
+    hash: str = Field(primary_key=True)
+    content: Optional[str] = Field(default=None, sa_column=Column(Text))
+    data: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))
+    codec: Optional[str] = None
+    word_count: Optional[int] = None
+
 class Chapter(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     run_id: int = Field(foreign_key="analysisrun.id")
@@ -33,7 +45,9 @@ class Chapter(SQLModel, table=True):
     title: str
     volume_title: Optional[str] = None
     headline: Optional[str] = None
-    content: Optional[str] = None
+    content: Optional[str] = None # Legacy: 旧数据直接存正文，新数据通过 content_hash 引用 ChapterText
+    content_hash: Optional[str] = Field(default=None, index=True)
+    word_count: Optional[int] = None # 预先计算的字数，列表接口无需读取正文
     
     run: AnalysisRun = Relationship(back_populates="chapters")
     summaries: List["Summary"] = Relationship(back_populates="chapter")
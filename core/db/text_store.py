@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, Optional
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from core.db.models import Chapter, ChapterText
+from core.db.compression import compress_text, decompress_text
+from core.utils import calculate_content_hash
+
+
+class ChapterTextStore:
+    """
+    章节正文的内容寻址存储。
+    Chapter 行只保存 content_hash，正文在 ChapterText 中按哈希去重并压缩存储，读取时按需解压。
+    """
+
+    @staticmethod
+    def put(session: Session, content: str, content_hash: Optional[str] = None) -> str:
+        """
+        写入正文 (已存在则跳过)，返回内容哈希。调用方负责 commit。
+        content_hash: 已知的正文哈希 (如分割阶段写入 chapters.pack.json 的值)，避免重复计算
+        """
+        content_hash = content_hash or calculate_content_hash(content)
+        if session.get(ChapterText, content_hash) is None:
+            codec, data = compress_text(content)
+            session.add(ChapterText(hash=content_hash, data=data, codec=codec, word_count=len(content)))
+        return content_hash
+
+    @staticmethod
+    def get(session: Session, content_hash: str) -> Optional[str]:
+        blob = session.get(ChapterText, content_hash)
+        if not blob:
+            return None
+        if blob.data is not None:
+            return decompress_text(blob.codec, blob.data)
+        return blob.content
+
+    @staticmethod
+    def get_content(session: Session, chapter: Chapter) -> Optional[str]:
+        """读取章节正文 (兼容直接存储在 Chapter.content 中的旧数据)"""
+        if chapter.content:
+            return chapter.content
+        if chapter.content_hash:
+            return ChapterTextStore.get(session, chapter.content_hash)
+        return None
+
+    @staticmethod
+    def get_lengths(session: Session, hashes: Iterable[str]) -> Dict[str, int]:
+        """批量查询正文字数，只读取预计算的 word_count (旧数据在数据库中计算 length())，不加载正文"""
+        hashes = list({h for h in hashes if h})
+        if not hashes:
+            return {}
+        length = func.coalesce(ChapterText.word_count, func.length(ChapterText.content))
+        statement = select(ChapterText.hash, length).where(ChapterText.hash.in_(hashes))
+        return {h: value or 0 for h, value in session.exec(statement).all()}
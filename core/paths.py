@@ -22,10 +22,20 @@ class PathManager:
         """output/novel_name/hash/timestamp/"""
         return PathManager.get_novel_root(novel_name, file_hash) / timestamp
 
+    @staticmethod
+    def get_replay_run_dir(novel_name: str, file_hash: str, timestamp: str) -> Path:
+        """output/.replay/novel_name/hash/timestamp/ (离线回放的运行，不会被同步到数据库)"""
+        return PathManager.get_output_root() / ".replay" / novel_name / file_hash / timestamp
+
     @staticmethod
     def get_cache_dir() -> Path:
         """output/.cache/"""
         return PathManager.get_output_root() / ".cache"
+
+    @staticmethod
+    def get_index_dir() -> Path:
+        """output/.index/ (章节偏移索引)"""
+        return PathManager.get_output_root() / ".index"
         
     @staticmethod
     def get_chapter_file_path(output_dir: Path, title: str, volume_title: str = None) -> Path:
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """一次进行中的同步调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _cancel_requested() -> bool:
+    """当前任务自身是否被请求取消 (Python 3.11+ 可区分；更早的版本按未取消处理)"""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling and cancelling())
+
+
+class SingleFlight:
+    """
+    合并相同 key 的并发调用：同一时刻只有第一个调用者 (leader) 真正执行，
+    其余调用者等待并共享它的结果或异常。调用结束后 key 立即释放，不缓存结果
+    (结果缓存由 CacheManager 负责)。
+
+    同时支持线程 (do) 与 asyncio (do_async)。异步调用按事件循环隔离，
+    不同线程各自运行的事件循环之间不会互相等待。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        同步执行 fn (相同 key 的并发调用只执行一次)。
+        Returns:
+            (结果, 是否为共享的结果)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        异步执行 fn() 返回的协程 (相同 key 的并发调用只执行一次)。
+        leader 被取消时，未被取消的等待者重新发起调用 (其中一个成为新的 leader)，而不是一并被取消。
+        Returns:
+            (结果, 是否为共享的结果)
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._async_calls.get(flight_key)
+                leader = future is None
+                if leader:
+                    future = loop.create_future()
+                    self._async_calls[flight_key] = future
+            if leader:
+                break
+
+            # shield: 某个等待者被取消时不影响 leader 和其他等待者
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled() or _cancel_requested():
+                    raise
+                # leader 被取消，本调用者未被取消：接手重新执行
+
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._async_calls.pop(flight_key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
@@ -0,0 +1,139 @@
+import os
+import json
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from data_protocol.models import Chapter
+
+ARCHIVE_NAME = "chapters.pack"
+ARCHIVE_INDEX_NAME = "chapters.pack.json"
+
+
+@dataclass
+class ArchiveEntry:
+    """打包文件中的单章记录 (offset / length 为字节偏移)"""
+    id: str
+    title: str
+    volume_title: Optional[str]
+    offset: int
+    length: int
+    word_count: int
+    content_hash: Optional[str] = None
+
+
+class ChapterArchive:
+    """
+    章节打包格式：一个内容文件 (chapters.pack，所有正文按顺序拼接) + 一个偏移表 (chapters.pack.json)。
+    代替每章一个 .txt 文件，读取时按偏移 seek，适合网络文件系统或章节数量巨大的场景。
+    """
+    VERSION = 1
+
+    def __init__(self, run_dir: Union[str, Path], entries: List[ArchiveEntry], encoding: str = 'utf-8'):
+        self.run_dir = Path(run_dir)
+        self.entries = entries
+        self.encoding = encoding
+        self._by_id: Dict[str, ArchiveEntry] = {e.id: e for e in entries}
+        self._by_title: Dict[str, ArchiveEntry] = {}
+        self._by_volume_title: Dict[tuple, ArchiveEntry] = {}
+        for e in entries:
+            self._by_title.setdefault(e.title, e)
+            self._by_volume_title.setdefault((e.volume_title, e.title), e)
+
+    @property
+    def pack_path(self) -> Path:
+        return self.run_dir / ARCHIVE_NAME
+
+    @staticmethod
+    def exists(run_dir: Union[str, Path]) -> bool:
+        return (Path(run_dir) / ARCHIVE_INDEX_NAME).exists()
+
+    @classmethod
+    def write(cls, chapters: Iterable[Chapter], run_dir: Union[str, Path], encoding: str = 'utf-8') -> "ChapterArchive":
+        """顺序写入内容文件，最后原子替换偏移表 (偏移表存在即代表打包完整)"""
+        entries: List[ArchiveEntry] = []
+        for _ in cls.iter_write(chapters, run_dir, encoding, entries):
+            pass
+        return cls(run_dir, entries, encoding)
+
+    @classmethod
+    def iter_write(cls, chapters: Iterable[Chapter], run_dir: Union[str, Path], encoding: str = 'utf-8',
+                   entries: Optional[List[ArchiveEntry]] = None) -> Iterator[Chapter]:
+        """
+        流式写入：每写入一章就把它交还给调用方 (可边写边总结，不必持有全部正文)。
+        迭代完成后才写入偏移表；中途放弃迭代时不会留下看似完整的打包文件。
+        """
+        run_dir = Path(run_dir)
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        entries = [] if entries is None else entries
+        offset = 0
+        with open(run_dir / ARCHIVE_NAME, 'wb') as f:
+            for chapter in chapters:
+                data = chapter.content.encode(encoding)
+                f.write(data)
+                entries.append(ArchiveEntry(
+                    id=chapter.id,
+                    title=chapter.title,
+                    volume_title=chapter.volume_title,
+                    offset=offset,
+                    length=len(data),
+                    word_count=len(chapter.content),
+                    content_hash=chapter.content_hash
+                ))
+                offset += len(data)
+                yield chapter
+
+        index_path = run_dir / ARCHIVE_INDEX_NAME
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": cls.VERSION,
+                "encoding": encoding,
+                "chapters": [asdict(e) for e in entries]
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, run_dir: Union[str, Path]) -> Optional["ChapterArchive"]:
+        """读取偏移表，不存在或版本不符时返回 None"""
+        index_path = Path(run_dir) / ARCHIVE_INDEX_NAME
+        if not index_path.exists():
+            return None
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != cls.VERSION:
+                return None
+            entries = [ArchiveEntry(**e) for e in data.get("chapters", [])]
+            return cls(run_dir, entries, data.get("encoding", "utf-8"))
+        except Exception as e:
+            print(f"[Archive] 偏移表读取失败 {index_path}: {e}")
+            return None
+
+    def find(self, chapter_id: Optional[str] = None, title: Optional[str] = None,
+             volume_title: Optional[str] = None) -> Optional[ArchiveEntry]:
+        """优先按章节 ID 查找，其次按标题 (提供分卷标题时只匹配同卷章节，不同卷的同名章节不会混淆)"""
+        if chapter_id and chapter_id in self._by_id:
+            return self._by_id[chapter_id]
+        if not title:
+            return None
+        if volume_title:
+            return self._by_volume_title.get((volume_title, title))
+        return self._by_title.get(title)
+
+    def read(self, entry: ArchiveEntry) -> str:
+        with open(self.pack_path, 'rb') as f:
+            f.seek(entry.offset)
+            return f.read(entry.length).decode(self.encoding)
+
+    def read_content(self, chapter_id: Optional[str] = None, title: Optional[str] = None,
+                     volume_title: Optional[str] = None) -> Optional[str]:
+        entry = self.find(chapter_id, title, volume_title)
+        return self.read(entry) if entry else None
+
+    def read_all(self) -> Dict[str, str]:
+        """一次顺序读取全部正文，返回 {chapter_id: content} (批量导入时避免逐章 seek)"""
+        with open(self.pack_path, 'rb') as f:
+            data = f.read()
+        return {e.id: data[e.offset:e.offset + e.length].decode(self.encoding) for e in self.entries}
@@ -0,0 +1,96 @@
+import codecs
+from dataclasses import dataclass
+from typing import List, Optional
+
+# 单个采样窗口大小 (字节)
+DEFAULT_SAMPLE_SIZE = 64 * 1024
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+]
+
+
+@dataclass
+class EncodingGuess:
+    """
+    编码探测结果。
+    confidence 取值 0~1：整文件都被采样或存在 BOM 时为 1.0；
+    否则取决于采样覆盖率以及样本中非 ASCII 字符的数量 (纯 ASCII 样本无法区分编码)。
+    """
+    encoding: str
+    confidence: float
+    sampled_bytes: int = 0
+
+
+def _sample_windows(buf, sample_size: int) -> List[tuple]:
+    """
+    取 头部 / 中部 / 尾部 三个窗口，返回 (start, end) 列表。
+    文件足够小时直接返回整个文件。
+    """
+    size = len(buf)
+    if size <= sample_size * 3:
+        return [(0, size)]
+    middle = size // 2 - sample_size // 2
+    return [(0, sample_size), (middle, middle + sample_size), (size - sample_size, size)]
+
+
+def _decode_window(buf, start: int, end: int, encoding: str) -> Optional[str]:
+    """
+    解码一个采样窗口，失败返回 None。
+    非文件开头的窗口从第一个换行符之后开始 (多字节编码的尾字节不会是 0x0A，换行符总是字符边界)；
+    窗口中没有换行符时依次尝试 0~3 字节的偏移。未到文件末尾的窗口允许结尾处有被截断的字符。
+    """
+    final = end >= len(buf)
+    offsets = [0]
+    if start > 0:
+        newline = buf.find(b'\n', start, end)
+        offsets = [newline + 1 - start] if newline != -1 else [0, 1, 2, 3]
+
+    for offset in offsets:
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            return decoder.decode(buf[start + offset:end], final=final)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def detect_encoding(buf, candidates: List[str], sample_size: int = DEFAULT_SAMPLE_SIZE) -> Optional[EncodingGuess]:
+    """
+    通过采样窗口 (BOM / 头部 / 中部 / 尾部) 推断编码，不对整个文件做解码尝试。
+    按 candidates 的优先级返回第一个能解码全部样本的编码；都不满足时返回 None。
+    Args:
+        buf: bytes 或 mmap
+        candidates: 按优先级排列的候选编码 (与 Splitter._candidate_encodings 一致)
+        sample_size: 单个窗口大小
+    """
+    size = len(buf)
+    for bom, encoding in _BOMS:
+        if buf[:len(bom)] == bom:
+            return EncodingGuess(encoding=encoding, confidence=1.0, sampled_bytes=len(bom))
+
+    windows = _sample_windows(buf, sample_size)
+    sampled = sum(end - start for start, end in windows)
+
+    for encoding in candidates:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            continue
+
+        texts = []
+        for start, end in windows:
+            text = _decode_window(buf, start, end, encoding)
+            if text is None:
+                break
+            texts.append(text)
+        else:
+            if sampled >= size:
+                return EncodingGuess(encoding=encoding, confidence=1.0, sampled_bytes=sampled)
+            # 样本中的非 ASCII 字符越多，误判的可能越低
+            non_ascii = sum(len(text) - len(text.encode('ascii', 'ignore')) for text in texts)
+            evidence = min(1.0, non_ascii / 256)
+            confidence = max(sampled / size, 0.5 + 0.49 * evidence)
+            return EncodingGuess(encoding=encoding, confidence=round(confidence, 2), sampled_bytes=sampled)
+
+    return None
@@ -0,0 +1,251 @@
+import re
+import codecs
+import hashlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 支持繁体中文数字和异体字
+CN_NUMS = '零一二三四五六七八九十百千万壹贰叁肆伍陆柒捌玖拾佰仟萬億'
+# str 模式下 \d 会匹配全角数字，字节模式下需要显式列出
+FULLWIDTH_DIGITS = '０１２３４５６７８９'
+# 关键字标题 (序章 / 楔子 / Prologue ...) 之后允许出现的分隔符
+KEYWORD_DELIMITERS = '　:：,，.。·・-—_'
+
+VOLUME = 'volume'
+CHAPTER = 'chapter'
+
+
+# --- 字节正则构建工具 ---
+
+def _alternatives(chars: str, encoding: str) -> List[bytes]:
+    """把字符逐个编码为字节序列，无法编码的字符直接跳过"""
+    parts = []
+    for ch in chars:
+        try:
+            parts.append(re.escape(ch.encode(encoding)))
+        except UnicodeEncodeError:
+            continue
+    return parts
+
+
+def _words(words: List[str], encoding: str) -> List[bytes]:
+    """把词语编码为字节序列 (纯 ASCII 词语忽略大小写)，无法编码的词语直接跳过"""
+    parts = []
+    for word in words:
+        try:
+            encoded = re.escape(word.encode(encoding))
+        except UnicodeEncodeError:
+            continue
+        parts.append(b'(?i:' + encoded + b')' if word.isascii() else encoded)
+    return parts
+
+
+def _group(parts: List[bytes]) -> bytes:
+    return b'(?:' + b'|'.join(parts) + b')' if parts else b'(?!)'
+
+
+def _digit_bytes(encoding: str) -> bytes:
+    return _group([b'[0-9]'] + _alternatives(FULLWIDTH_DIGITS, encoding))
+
+
+def _nums_bytes(encoding: str) -> bytes:
+    return _group(_alternatives(CN_NUMS, encoding) + [_digit_bytes(encoding)])
+
+
+@dataclass(frozen=True)
+class HeadingRule:
+    """
+    一条标题识别规则。
+    pattern 为 str 正则片段 (不含 ^，由引擎统一锚定到行首，不允许包含捕获组)；
+    byte_pattern 根据编码返回等价的字节正则片段，供 mmap 流式扫描使用。
+    未提供 byte_pattern 时 pattern 必须为纯 ASCII (可直接按字节匹配；注意字节模式下 \d 不匹配全角数字)。
+    """
+    name: str
+    kind: str                    # VOLUME / CHAPTER
+    pattern: str
+    byte_pattern: Optional[Callable[[str], bytes]] = None
+
+    def to_bytes(self, encoding: str) -> bytes:
+        if self.byte_pattern:
+            return self.byte_pattern(encoding)
+        # 与 str 组合正则的 IGNORECASE 保持一致
+        return b'(?i:' + self.pattern.encode('ascii') + b')'
+
+    def validate(self):
+        if self.kind not in (VOLUME, CHAPTER):
+            raise ValueError(f"未知的标题类型: {self.kind}")
+        if re.compile(self.pattern).groups:
+            raise ValueError(f"标题规则 {self.name} 不能包含捕获组，请使用 (?:...)")
+        if not self.byte_pattern and not self.pattern.isascii():
+            raise ValueError(f"标题规则 {self.name} 包含非 ASCII 字符，需要提供 byte_pattern 或使用 HeadingRule.keywords")
+
+    @classmethod
+    def keywords(cls, name: str, kind: str, words: List[str], numbered: bool = False) -> "HeadingRule":
+        """
+        由字面关键字构造规则 (如 序章 / 楔子 / 番外 / Prologue)。
+        关键字之后必须是空白、分隔符或文件末尾，避免正文中以相同字词开头的句子被误判为标题。
+        Args:
+            numbered: 关键字后允许紧跟编号 (如 "番外一"、"番外2")
+        """
+        words = sorted(words, key=len, reverse=True)  # 长词优先，如 "番外篇" 先于 "番外"
+        suffix = f'[{CN_NUMS}\\d]*' if numbered else ''
+        delimiters = re.escape(KEYWORD_DELIMITERS)
+        pattern = f"(?:{'|'.join(re.escape(w) for w in words)}){suffix}(?=[\\s{delimiters}]|\\Z)"
+
+        def byte_pattern(encoding: str) -> bytes:
+            byte_suffix = _nums_bytes(encoding) + b'*' if numbered else b''
+            boundary = _group([b'\\s'] + _alternatives(KEYWORD_DELIMITERS, encoding))
+            return _group(_words(words, encoding)) + byte_suffix + b'(?=' + boundary + b'|\\Z)'
+
+        return cls(name=name, kind=kind, pattern=pattern, byte_pattern=byte_pattern)
+
+
+# --- 内置规则 ---
+
+def _volume_bytes(encoding: str) -> bytes:
+    di = re.escape('第'.encode(encoding))
+    juan = re.escape('卷'.encode(encoding))
+    return _group([di, juan, _nums_bytes(encoding)]) + b'+' + _group(_alternatives('卷巻', encoding))
+
+
+def _cn_chapter_bytes(encoding: str) -> bytes:
+    di = re.escape('第'.encode(encoding))
+    return di + _nums_bytes(encoding) + b'+' + _group(_alternatives('章回節节', encoding))
+
+
+def _en_chapter_bytes(encoding: str) -> bytes:
+    space = _group([b'\\s'] + _alternatives('　', encoding))
+    return b'(?i:chapter)' + space + b'+' + _digit_bytes(encoding) + b'+'
+
+
+# 默认启用的规则 (决定章节编号，修改会改变已有小说的章节 ID)
+BUILTIN_RULES = [
+    HeadingRule('volume', VOLUME, f'[第卷{CN_NUMS}\\d]+[卷巻]', _volume_bytes),
+    HeadingRule('chapter_cn', CHAPTER, f'第[{CN_NUMS}\\d]+[章回節节]', _cn_chapter_bytes),
+    HeadingRule('chapter_en', CHAPTER, r'Chapter\s+\d+', _en_chapter_bytes),
+]
+
+# 可选规则，通过 settings.HEADING_EXTRA_RULES 或 register_heading_rule 启用
+EXTRA_RULES = {
+    'prologue_cn': HeadingRule.keywords('prologue_cn', CHAPTER, ['序章', '序幕', '楔子', '引子']),
+    'extra_cn': HeadingRule.keywords('extra_cn', CHAPTER, ['番外篇', '番外'], numbered=True),
+    'epilogue_cn': HeadingRule.keywords('epilogue_cn', CHAPTER, ['尾声', '终章', '后记']),
+    'prologue_en': HeadingRule.keywords('prologue_en', CHAPTER, ['Prologue', 'Epilogue', 'Interlude']),
+}
+
+
+class HeadingEngine:
+    """
+    标题识别引擎。
+    把所有规则合并为一个预编译的组合正则 (Group 1 = Volume, Group 2 = Chapter)，单次扫描即可识别全部标题样式。
+    str 正则与按编码生成的字节正则均带缓存，注册/注销规则时自动失效。
+    """
+    def __init__(self, rules: Optional[List[HeadingRule]] = None):
+        self._rules: List[HeadingRule] = []
+        self._cache: Dict[str, object] = {}
+        for rule in rules or []:
+            self.register(rule)
+
+    @property
+    def rules(self) -> List[HeadingRule]:
+        return list(self._rules)
+
+    def register(self, rule: HeadingRule):
+        """注册规则 (同名规则会被替换)。新规则排在已有规则之后，优先级更低。"""
+        rule.validate()
+        self._rules = [r for r in self._rules if r.name != rule.name] + [rule]
+        self._cache.clear()
+
+    def unregister(self, name: str):
+        self._rules = [r for r in self._rules if r.name != name]
+        self._cache.clear()
+
+    def _patterns(self, kind: str) -> List[str]:
+        return [f'(?:{r.pattern})' for r in self._rules if r.kind == kind]
+
+    def _cached(self, key: str, factory):
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    @property
+    def pattern(self) -> re.Pattern:
+        """组合正则 (Group 1 = Volume, Group 2 = Chapter)，MULTILINE 下匹配行首"""
+        def build():
+            volume = '|'.join(self._patterns(VOLUME)) or '(?!)'
+            chapter = '|'.join(self._patterns(CHAPTER)) or '(?!)'
+            return re.compile(f'^(?:({volume})|({chapter}))', re.MULTILINE | re.IGNORECASE)
+        return self._cached('pattern', build)
+
+    @property
+    def chapter_pattern(self) -> re.Pattern:
+        """仅匹配章节标题 (用于快速扫描章节数)"""
+        def build():
+            chapter = '|'.join(self._patterns(CHAPTER)) or '(?!)'
+            return re.compile(f'^(?:{chapter})', re.MULTILINE | re.IGNORECASE)
+        return self._cached('chapter_pattern', build)
+
+    @property
+    def volume_pattern(self) -> str:
+        """仅匹配分卷标题的正则字符串 (与 split_by_volume 的 volume_pattern 参数格式一致)"""
+        return f"^(?:{'|'.join(self._patterns(VOLUME)) or '(?!)'})"
+
+    def byte_patterns(self, encoding: str) -> Tuple[re.Pattern, re.Pattern]:
+        """
+        编译字节级的组合正则。
+        Returns:
+            (head, body): head 只用于匹配文件开头；body 以换行符作为字面前缀，
+            正则引擎可以先快速定位换行符再尝试匹配，比 MULTILINE 下的 ^ 快一个数量级。
+        由于只在行首匹配，对 GBK/Big5 等多字节编码也不会从字符中间开始匹配。
+        """
+        key = encoding.lower()
+
+        def build():
+            # 文本模式读取 utf-8-sig 时 BOM 会被去掉，文件首行的标题同样需要能被识别
+            enc = 'utf-8' if key == 'utf-8-sig' else encoding
+            volume = _group([r.to_bytes(enc) for r in self._rules if r.kind == VOLUME])
+            chapter = _group([r.to_bytes(enc) for r in self._rules if r.kind == CHAPTER])
+            headings = b'(?:(' + volume + b')|(' + chapter + b'))'
+
+            bom = b'(?:' + re.escape(codecs.BOM_UTF8) + b')?' if key == 'utf-8-sig' else b''
+            return re.compile(bom + headings), re.compile(b'\\n' + headings)
+        return self._cached(f'bytes:{key}', build)
+
+    def signature(self, encoding: str = 'utf-8') -> str:
+        """
+        规则集签名 (规则变化后依赖它的索引自动失效)。
+        流式扫描实际使用字节正则匹配，签名同时包含各规则在该编码下的 byte_pattern，
+        只修改 byte_pattern 而 str 正则不变时签名同样会变化。
+        """
+        hash_obj = hashlib.md5()
+        for r in self._rules:
+            hash_obj.update(f'{r.kind}:{r.name}:{r.pattern}\n'.encode('utf-8'))
+            hash_obj.update(r.to_bytes(encoding) + b'\n')
+        return hash_obj.hexdigest()
+
+
+def _build_default_engine() -> HeadingEngine:
+    from core.config import settings
+    engine = HeadingEngine(BUILTIN_RULES)
+    names = [n.strip() for n in settings.HEADING_EXTRA_RULES.split(',') if n.strip()]
+    if 'all' in names:
+        names = list(EXTRA_RULES)
+    for name in names:
+        if name in EXTRA_RULES:
+            engine.register(EXTRA_RULES[name])
+        else:
+            print(f"警告: 未知的标题规则 {name}，可选: {', '.join(EXTRA_RULES)}")
+    return engine
+
+
+# 全局默认引擎 (Splitter / 流式扫描 / 章节索引共用)
+default_engine = _build_default_engine()
+
+
+def register_heading_rule(rule: HeadingRule):
+    """向默认引擎注册自定义标题规则"""
+    default_engine.register(rule)
+
+
+def unregister_heading_rule(name: str):
+    default_engine.unregister(name)
@@ -0,0 +1,286 @@
+import os
+import json
+import mmap
+import hashlib
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Optional, Tuple, Iterator
+
+from data_protocol.models import Chapter
+from core.identifiers import IdentifierGenerator
+from core.paths import PathManager
+from core.utils import calculate_file_hash, calculate_content_hash
+from core.splitter.stream import iter_chapter_spans, compile_byte_pattern, decode_text
+
+
+@dataclass
+class ChapterEntry:
+    """索引中的单章记录 (字节偏移用于 seek，字符偏移对应文本模式读取后的 str)"""
+    index: int
+    title: str
+    volume_title: Optional[str]
+    heading: str                 # 标题所在整行 (与 scan_chapters 返回的标题一致)
+    start: int
+    body_start: int
+    end: int
+    char_start: int
+    char_body_start: int
+    char_end: int
+    chain: str                   # 滚动哈希: md5(上一章 chain + 文件中 [上一章 end, end) 的字节)
+
+
+def _chain_hash(prev_chain: str, data: bytes) -> str:
+    hash_obj = hashlib.md5(prev_chain.encode('ascii'))
+    hash_obj.update(data)
+    return hash_obj.hexdigest()
+
+
+class ChapterIndex:
+    """
+    章节偏移索引 (Sidecar)。
+    以文件哈希为键持久化到 output/.index/{file_hash}.json，
+    同一文件再次分割时无需重新解码和正则扫描，可直接按章节号随机读取。
+
+    每章附带一个覆盖 [0, end) 全部字节的滚动哈希，用于识别连载小说的
+    "追加更新" (新文件是旧文件的前缀扩展)。version_hash 记录章节实际归属的
+    NovelVersion，追加得到的新文件沿用旧版本的 version_hash。
+    """
+    VERSION = 2
+
+    def __init__(self, file_hash: str, file_size: int, encoding: str, chapters: List[ChapterEntry],
+                 novel_name: Optional[str] = None, version_hash: Optional[str] = None):
+        self.file_hash = file_hash
+        self.file_size = file_size
+        self.encoding = encoding
+        self.chapters = chapters
+        self.novel_name = novel_name
+        self.version_hash = version_hash or file_hash
+
+    @property
+    def total(self) -> int:
+        return len(self.chapters)
+
+    @property
+    def headings(self) -> List[str]:
+        return [c.heading for c in self.chapters]
+
+    @staticmethod
+    def pattern_signature(encoding: str) -> str:
+        """标题正则的签名，正则变化后旧索引自动失效"""
+        head, body = compile_byte_pattern(encoding)
+        return hashlib.md5(head.pattern + body.pattern).hexdigest()
+
+    @staticmethod
+    def get_index_path(file_hash: str) -> Path:
+        return PathManager.get_index_dir() / f"{file_hash}.json"
+
+    # --- 构建 / 持久化 ---
+
+    @classmethod
+    def build(cls, file_path: str, file_hash: str, encoding: str) -> "ChapterIndex":
+        """单次扫描文件，记录每章的标题、分卷及字节/字符偏移"""
+        file_size = os.path.getsize(file_path)
+        chapters = []
+        if file_size == 0:
+            return cls(file_hash, 0, encoding, chapters)
+
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                prev_byte = 0
+                char_pos = 0
+                chain = ""
+                for span in iter_chapter_spans(mm, encoding):
+                    chain = _chain_hash(chain, mm[prev_byte:span.end])
+                    char_start = char_pos + len(decode_text(mm[prev_byte:span.start], encoding))
+                    char_end = char_start + len(decode_text(mm[span.start:span.end], encoding))
+                    # 标题行以 \r\n 结尾时，文本模式下 \r\n 折叠为正文起点处的一个 \n
+                    raw_header = mm[span.start:span.body_start]
+                    if raw_header.endswith(b'\r') and mm[span.body_start:span.body_start + 1] == b'\n':
+                        raw_header = raw_header[:-1]
+                    header = decode_text(raw_header, encoding)
+                    char_body_start = char_start + len(header)
+
+                    chapters.append(ChapterEntry(
+                        index=span.index,
+                        title=span.title,
+                        volume_title=span.volume_title,
+                        heading=header.split('\n', 1)[0].strip(),
+                        start=span.start,
+                        body_start=span.body_start,
+                        end=span.end,
+                        char_start=char_start,
+                        char_body_start=char_body_start,
+                        char_end=char_end,
+                        chain=chain
+                    ))
+                    prev_byte = span.end
+                    char_pos = char_end
+
+        return cls(file_hash, file_size, encoding, chapters)
+
+    @classmethod
+    def load(cls, file_hash: str, file_size: Optional[int] = None) -> Optional["ChapterIndex"]:
+        """读取索引；版本、正则签名或文件大小不一致时视为失效"""
+        path = cls.get_index_path(file_hash)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != cls.VERSION:
+                return None
+            if data.get("pattern_signature") != cls.pattern_signature(data["encoding"]):
+                return None
+            if file_size is not None and data.get("file_size") != file_size:
+                return None
+            chapters = [ChapterEntry(**c) for c in data.get("chapters", [])]
+            return cls(data["file_hash"], data["file_size"], data["encoding"], chapters,
+                       novel_name=data.get("novel_name"), version_hash=data.get("version_hash"))
+        except Exception as e:
+            print(f"[Index] 索引读取失败 {path}: {e}")
+            return None
+
+    def save(self):
+        path = self.get_index_path(self.file_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.VERSION,
+            "file_hash": self.file_hash,
+            "novel_name": self.novel_name,
+            "version_hash": self.version_hash,
+            "file_size": self.file_size,
+            "encoding": self.encoding,
+            "pattern_signature": self.pattern_signature(self.encoding),
+            "chapters": [asdict(c) for c in self.chapters]
+        }
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_or_build(cls, file_path: str, file_hash: Optional[str] = None, encoding: str = 'utf-8',
+                      novel_name: Optional[str] = None) -> "ChapterIndex":
+        """
+        优先读取已有索引，不存在时扫描文件并写入索引。
+        Args:
+            file_path: 文件路径
+            file_hash: 文件哈希 (与输出目录一致，默认取 MD5 前 8 位)
+            encoding: 首选编码 (构建索引时按 Splitter 的规则探测实际编码)
+            novel_name: 小说名，用于查找同一本书的历史版本
+        """
+        if not file_hash:
+            file_hash = calculate_file_hash(file_path)[:8]
+
+        index = cls.load(file_hash, file_size=os.path.getsize(file_path))
+        if index:
+            print(f"[Index] 命中章节索引: {index.total} 章")
+            if novel_name and index.novel_name != novel_name:
+                index.novel_name = novel_name
+                index.save()
+            return index
+
+        from core.splitter.processor import Splitter
+        splitter = Splitter(encoding=encoding)
+        with open(file_path, 'rb') as f:
+            if os.path.getsize(file_path) > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    encoding = splitter._detect_buffer_encoding(mm, file_path)
+
+        index = cls.build(file_path, file_hash, encoding)
+        index.novel_name = novel_name
+        try:
+            index.save()
+        except Exception as e:
+            print(f"[Index] 索引写入失败: {e}")
+        return index
+
+    # --- 追加更新检测 ---
+
+    @classmethod
+    def iter_novel_indexes(cls, novel_name: str) -> Iterator["ChapterIndex"]:
+        """遍历同一本小说的所有已知版本索引"""
+        index_dir = PathManager.get_index_dir()
+        if not index_dir.exists():
+            return
+        for path in index_dir.glob("*.json"):
+            index = cls.load(path.stem)
+            if index and index.novel_name == novel_name:
+                yield index
+
+    def find_append_base(self, file_path: str) -> Optional[Tuple["ChapterIndex", int]]:
+        """
+        判断当前文件是否为某个已知版本的严格前缀扩展 (连载追加更新)。
+        比较滚动哈希链：旧版本除最后一章外的哈希必须逐章一致，且旧文件的全部字节
+        必须是新文件的前缀 (旧的最后一章允许被续写)。
+        Returns:
+            (base_index, first_new_index) 或 None。first_new_index 为第一个需要重新处理的章节号 (1-based)。
+        """
+        if not self.novel_name:
+            return None
+
+        best = None
+        for base in self.iter_novel_indexes(self.novel_name):
+            n = base.total
+            if base.file_hash == self.file_hash or n == 0 or n > self.total or base.file_size >= self.file_size:
+                continue
+            if any(self.chapters[i].chain != base.chapters[i].chain for i in range(n - 1)):
+                continue
+
+            # 旧文件最后一章到文件末尾的字节必须原样出现在新文件的相同位置
+            prev_chain = base.chapters[n - 2].chain if n > 1 else ""
+            prev_end = base.chapters[n - 2].end if n > 1 else 0
+            with open(file_path, 'rb') as f:
+                f.seek(prev_end)
+                tail = f.read(base.file_size - prev_end)
+            if _chain_hash(prev_chain, tail) != base.chapters[n - 1].chain:
+                continue
+
+            first_new = n + 1 if self.chapters[n - 1].chain == base.chapters[n - 1].chain else n
+            if best is None or n > best[0].total:
+                best = (base, first_new)
+
+        return best
+
+    # --- 随机访问 ---
+
+    def _select(self, chapter_range: Optional[Tuple[int, int]]) -> List[ChapterEntry]:
+        if not chapter_range:
+            return self.chapters
+        r_start, r_end = chapter_range
+        return self.chapters[max(0, r_start - 1):max(0, r_end)]
+
+    def count(self, chapter_range: Optional[Tuple[int, int]] = None) -> int:
+        """范围内的章节数 (不读取正文)"""
+        return len(self._select(chapter_range))
+
+    def _to_chapter(self, entry: ChapterEntry, body: str) -> Chapter:
+        return Chapter(
+            id=IdentifierGenerator.generate_chapter_id(entry.index),
+            title=entry.title,
+            volume_title=entry.volume_title,
+            content=body,
+            word_count=len(body),
+            content_hash=calculate_content_hash(body)
+        )
+
+    def iter_chapters(self, file_path: str, chapter_range: Optional[Tuple[int, int]] = None) -> Iterator[Chapter]:
+        """按字节偏移直接 seek 读取章节，无需重新扫描"""
+        with open(file_path, 'rb') as f:
+            for entry in self._select(chapter_range):
+                f.seek(entry.body_start)
+                raw = f.read(entry.end - entry.body_start)
+                yield self._to_chapter(entry, decode_text(raw, self.encoding).strip())
+
+    def read_chapter(self, file_path: str, chapter_index: int) -> Optional[Chapter]:
+        """读取第 N 章 (1-based)"""
+        if chapter_index < 1 or chapter_index > self.total:
+            return None
+        return next(self.iter_chapters(file_path, (chapter_index, chapter_index)), None)
+
+    def chapters_from_content(self, content: str, chapter_range: Optional[Tuple[int, int]] = None) -> List[Chapter]:
+        """对已读入内存的文本 (read_file 的结果) 按字符偏移切片"""
+        return [
+            self._to_chapter(entry, content[entry.char_body_start:entry.char_end].strip())
+            for entry in self._select(chapter_range)
+        ]
@@ -1,10 +1,45 @@
 import re
 import os
-from typing import List, Tuple, Optional
+import mmap
+from typing import List, Tuple, Optional, Iterator
 from data_protocol.models import Chapter, BookStructure
-from core.utils import extract_line_by_match
+from core.utils import extract_line_by_match, calculate_content_hash
 
 from core.identifiers import IdentifierGenerator
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from core.splitter.stream import iter_chapter_spans, decode_text, validate_encoding
+from core.splitter.encoding import detect_encoding
+from core.splitter.headings import default_engine
+
+
+def scan_volume_chapters(volume_content: str, pattern: Optional[re.Pattern] = None) -> List[Tuple[str, int, int]]:
+    """
+    扫描单卷文本中的章节，返回轻量的章节描述 (title, body_start, body_end)。
+    content[body_start:body_end] 与 split_by_chapter 得到的正文完全一致。
+    模块级函数，可直接提交给进程池执行 (只回传偏移量，不回传正文)。
+    Args:
+        pattern: 标题组合正则，默认取默认标题引擎 (提交到进程池时显式传入，保证子进程使用相同规则)
+    """
+    pattern = pattern or default_engine.pattern
+    matches = list(pattern.finditer(volume_content))
+    descriptors = []
+    for i, match in enumerate(matches):
+        if match.group(1): # 分卷标题不产生章节
+            continue
+        start = match.start()
+        end = matches[i+1].start() if i < len(matches) - 1 else len(volume_content)
+
+        header_end = volume_content.find('\n', start)
+        if header_end == -1 or header_end > end:
+            header_end = end
+
+        segment = volume_content[header_end:end]
+        body_start = header_end + len(segment) - len(segment.lstrip())
+        body_end = max(body_start, header_end + len(segment.rstrip()))
+        descriptors.append((match.group(0).strip(), body_start, body_end))
+    return descriptors
+
 
 class Splitter:
     """
@@ -13,8 +48,8 @@ class Splitter:
     def __init__(self, encoding: str = 'utf-8'):
         self.encoding = encoding
 
-    def read_file(self, file_path: str) -> str:
-        """读取文件内容，尝试多种编码"""
+    def _candidate_encodings(self) -> List[str]:
+        """按优先级返回待尝试的编码列表"""
         encodings_to_try = [self.encoding]
         
         # 添加常见备选编码
@@ -30,18 +65,40 @@ class Splitter:
             if enc not in seen:
                 final_encodings.append(enc)
                 seen.add(enc)
+        return final_encodings
+
+    def read_file(self, file_path: str) -> str:
+        """
+        读取文件内容。
+        先通过采样窗口推断编码，整个文件只解码一次；推断失败或解码出错时再按优先级逐个尝试。
+        """
+        final_encodings = self._candidate_encodings()
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"文件 {file_path} 不存在。")
+
+        guess = detect_encoding(data, final_encodings)
+        if guess:
+            try:
+                content = decode_text(data, guess.encoding)
+                print(f"成功使用编码读取文件: {guess.encoding} (置信度 {guess.confidence:.2f})")
+                self.encoding = guess.encoding # 更新为实际有效的编码
+                return content
+            except UnicodeDecodeError:
+                print(f"采样推断的编码 {guess.encoding} 解码失败，回退到逐个尝试。")
 
         for enc in final_encodings:
+            if guess and enc == guess.encoding:
+                continue
             try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    content = f.read()
-                    print(f"成功使用编码读取文件: {enc}")
-                    self.encoding = enc # 更新为实际有效的编码
-                    return content
+                content = decode_text(data, enc)
+                print(f"成功使用编码读取文件: {enc}")
+                self.encoding = enc # 更新为实际有效的编码
+                return content
             except UnicodeDecodeError:
                 continue
-            except FileNotFoundError:
-                raise FileNotFoundError(f"文件 {file_path} 不存在。")
             except Exception:
                 continue
         
@@ -56,12 +113,8 @@ class Splitter:
             titles: 章节标题列表
             is_continuous: 是否检测到连续的数字编号 (1, 2, 3...)
         """
-        # 支持繁体中文数字和异体字
-        cn_nums = '零一二三四五六七八九十百千万壹贰叁肆伍陆柒捌玖拾佰仟萬億'
-        # 匹配 "第xxx章" 或 "Chapter xxx"
-        chapter_pattern = fr'(?:^第[{cn_nums}\d]+[章回節节])|(?:^Chapter\s+\d+)'
-        
-        matches = list(re.finditer(chapter_pattern, content, re.MULTILINE | re.IGNORECASE))
+        # 匹配 "第xxx章" 或 "Chapter xxx" (以及标题引擎中注册的其他章节样式)
+        matches = list(default_engine.chapter_pattern.finditer(content))
         
         titles = []
         for match in matches:
@@ -82,41 +135,103 @@ class Splitter:
         
         return total, titles, is_continuous
 
+    def iter_chapters(self, file_path: str, chapter_range: Optional[Tuple[int, int]] = None) -> Iterator[Chapter]:
+        """
+        流式按章节分割 (适用于数百 MB 的大文件)
+        通过 mmap 映射文件，只扫描标题位置，正文在产出时才按 (字节偏移, 长度) 解码。
+        调用方可以边迭代边处理，无需等待整本书解析完成。
+        生成的 ID / 标题 / 分卷与 split_by_chapter 完全一致。
+        Args:
+            file_path: 文件路径
+            chapter_range: (start, end) 闭区间，从1开始计数。
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件 {file_path} 不存在。")
+        if os.path.getsize(file_path) == 0:
+            return
+
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                encoding = self._detect_buffer_encoding(mm, file_path)
+
+                for span in iter_chapter_spans(mm, encoding, chapter_range):
+                    body = decode_text(mm[span.body_start:span.end], encoding).strip()
+                    yield Chapter(
+                        id=IdentifierGenerator.generate_chapter_id(span.index),
+                        title=span.title,
+                        volume_title=span.volume_title,
+                        content=body,
+                        word_count=len(body),
+                        content_hash=calculate_content_hash(body)
+                    )
+
+    def _detect_buffer_encoding(self, buf, file_path: str) -> str:
+        """
+        确定字节缓冲区的编码：先采样推断，再只对推断结果做一次增量校验；
+        校验失败时按 read_file 相同的优先级逐个尝试。
+        """
+        final_encodings = self._candidate_encodings()
+        guess = detect_encoding(buf, final_encodings)
+        if guess and (guess.confidence >= 1.0 and guess.sampled_bytes >= len(buf) or validate_encoding(buf, guess.encoding)):
+            print(f"成功使用编码读取文件: {guess.encoding} (置信度 {guess.confidence:.2f})")
+            self.encoding = guess.encoding
+            return guess.encoding
+
+        for enc in final_encodings:
+            if guess and enc == guess.encoding:
+                continue
+            if validate_encoding(buf, enc):
+                print(f"成功使用编码读取文件: {enc}")
+                self.encoding = enc
+                return enc
+        raise ValueError(f"无法读取文件 {file_path}，已尝试编码: {', '.join(final_encodings)}。请检查文件是否损坏。")
+
     def split_by_chapter(self, content: str, chapter_range: Optional[Tuple[int, int]] = None) -> List[Chapter]:
         """
         按章节分割 (智能识别分卷信息)
+        标题只扫描一次，全局序号直接来自枚举；只有范围内的章节才会切片正文。
         Args:
             content: 文本内容
             chapter_range: (start, end) 闭区间，从1开始计数。
         """
-        # 支持繁体中文数字和异体字
-        cn_nums = '零一二三四五六七八九十百千万壹贰叁肆伍陆柒捌玖拾佰仟萬億'
-        chapter_pattern_str = fr'(?:^第[{cn_nums}\d]+[章回節节])|(?:^Chapter\s+\d+)'
-        volume_pattern_str = fr'^[第卷{cn_nums}\d]+[卷巻]'
-        
-        # Combined pattern: Group 1 = Volume, Group 2 = Chapter
-        combined_pattern = re.compile(f"({volume_pattern_str})|({chapter_pattern_str})", re.MULTILINE | re.IGNORECASE)
-        
         print(f"DEBUG: 正在扫描章节与分卷...")
-        matches = list(combined_pattern.finditer(content))
+        matches = list(default_engine.pattern.finditer(content))
         
         if not matches:
             # Fallback: Try looser chapter match if strict match fails?
             # For now, return empty
             return []
 
-        parsed_items = []
+        total = sum(1 for match in matches if not match.group(1))
+        print(f"DEBUG: 扫描到 {total} 个章节。")
+
+        # Apply Range Filtering
+        if chapter_range:
+            r_start, r_end = chapter_range
+            print(f"DEBUG: 应用范围过滤: {r_start}-{r_end}")
+        else:
+            r_start, r_end = 1, total
+
+        chapters = []
         current_volume = None
+        global_idx = 0
         
         for i, match in enumerate(matches):
-            text = match.group(0).strip()
+            if match.group(1): # It is a Volume
+                current_volume = match.group(0).strip()
+                # We don't create a chapter entry for volume header
+                continue
+
+            # Generate ID based on global index to keep consistency
+            global_idx += 1
+            if global_idx < r_start:
+                continue
+            if global_idx > r_end:
+                break
+
             start = match.start()
-            
             # Find end of this section (start of next match or end of file)
-            if i < len(matches) - 1:
-                end = matches[i+1].start()
-            else:
-                end = len(content)
+            end = matches[i+1].start() if i < len(matches) - 1 else len(content)
             
             # Extract body
             # Find newline after header
@@ -125,54 +240,28 @@ class Splitter:
                 header_end = end
             
             body = content[header_end:end].strip()
-            
-            if match.group(1): # It is a Volume
-                current_volume = text
-                # We don't create a chapter entry for volume header
-            else: # It is a Chapter
-                parsed_items.append({
-                    "title": text,
-                    "volume": current_volume,
-                    "content": body
-                })
-        
-        print(f"DEBUG: 扫描到 {len(parsed_items)} 个章节。")
-
-        # Apply Range Filtering
-        if chapter_range:
-            r_start, r_end = chapter_range
-            print(f"DEBUG: 应用范围过滤: {r_start}-{r_end}")
-            start_idx = max(0, r_start - 1)
-            end_idx = min(len(parsed_items), r_end)
-            
-            if start_idx >= len(parsed_items):
-                return []
-            
-            target_items = parsed_items[start_idx : end_idx]
-        else:
-            target_items = parsed_items
-
-        chapters = []
-        for i, item in enumerate(target_items):
-            # Generate ID based on global index to keep consistency
-            global_idx = parsed_items.index(item) + 1
-            
             chapters.append(Chapter(
                 id=IdentifierGenerator.generate_chapter_id(global_idx),
-                title=item['title'],
-                volume_title=item['volume'],
-                content=item['content'],
-                word_count=len(item['content'])
+                title=match.group(0).strip(),
+                volume_title=current_volume,
+                content=body,
+                word_count=len(body),
+                content_hash=calculate_content_hash(body)
             ))
             
         return chapters
 
-    def split_by_volume(self, content: str, volume_pattern: str = None) -> List[Chapter]:
-        """按卷分割，卷内再分章"""
+    def split_by_volume(self, content: str, volume_pattern: str = None, workers: int = 0) -> List[Chapter]:
+        """
+        按卷分割，卷内再分章
+        Args:
+            content: 文本内容
+            volume_pattern: 分卷正则
+            workers: 大于 1 时使用进程池并行扫描各卷 (适用于包含数百卷的合集)，结果与顺序执行完全一致
+        """
         # 如果未提供 pattern，使用默认增强版
         if not volume_pattern:
-            cn_nums = '零一二三四五六七八九十百千万壹贰叁肆伍陆柒捌玖拾佰仟萬億'
-            volume_pattern = fr'^[第卷{cn_nums}\d]+[卷巻]'
+            volume_pattern = default_engine.volume_pattern
             
         matches = list(re.finditer(volume_pattern, content, re.MULTILINE))
         
@@ -180,7 +269,7 @@ class Splitter:
             # 如果没有分卷，尝试直接分章
             return self.split_by_chapter(content)
 
-        all_chapters = []
+        volumes = []
         for i, match in enumerate(matches):
             # 获取卷标题行
             line_start = match.start()
@@ -201,27 +290,48 @@ class Splitter:
             else:
                 content_end = len(content)
             
-            volume_content = content[content_start:content_end].strip()
-            
-            # 在卷内分章
-            # 注意：split_by_chapter 会重新从 volume_content 中找章节
-            volume_chapters = self.split_by_chapter(volume_content)
-            
+            volumes.append((i + 1, volume_title_line, content[content_start:content_end].strip()))
+
+        # 在卷内分章 (可并行)，按卷顺序合并
+        volume_texts = [volume_content for _, _, volume_content in volumes]
+        if workers and workers > 1 and len(volumes) > 1:
+            print(f"DEBUG: 使用 {workers} 个进程并行扫描 {len(volumes)} 卷...")
+            chunksize = max(1, len(volumes) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                scan = partial(scan_volume_chapters, pattern=default_engine.pattern)
+                all_descriptors = list(executor.map(scan, volume_texts, chunksize=chunksize))
+        else:
+            all_descriptors = [scan_volume_chapters(text) for text in volume_texts]
+
+        all_chapters = []
+        for (volume_no, volume_title_line, volume_content), descriptors in zip(volumes, all_descriptors):
+            volume_id = IdentifierGenerator.generate_volume_id(volume_no)
+
             # 如果卷内找不到章节（例如序卷），可能整卷就是一个内容
-            if not volume_chapters and volume_content:
-                 volume_chapters = [Chapter(
-                     id=f"{IdentifierGenerator.generate_volume_id(i+1)}_content",
-                     title=volume_title_line, # 使用卷名作为章名
-                     content=volume_content,
-                     word_count=len(volume_content)
-                 )]
-
-            for ch in volume_chapters:
-                ch.volume_title = volume_title_line
-                # 更新ID以包含卷信息，确保唯一性
-                # ch.id 已经是 ch_1, ch_2...
-                ch.id = f"{IdentifierGenerator.generate_volume_id(i+1)}_{ch.id}"
-                all_chapters.append(ch)
+            # (ID 与历史输出保持一致，同样带有卷前缀: vol_N_vol_N_content)
+            if not descriptors:
+                if volume_content:
+                    all_chapters.append(Chapter(
+                        id=f"{volume_id}_{volume_id}_content",
+                        title=volume_title_line, # 使用卷名作为章名
+                        volume_title=volume_title_line,
+                        content=volume_content,
+                        word_count=len(volume_content),
+                        content_hash=calculate_content_hash(volume_content)
+                    ))
+                continue
+
+            for idx, (title, body_start, body_end) in enumerate(descriptors, start=1):
+                body = volume_content[body_start:body_end]
+                # ID 包含卷信息，确保唯一性 (vol_1_ch_1, vol_1_ch_2...)
+                all_chapters.append(Chapter(
+                    id=f"{volume_id}_{IdentifierGenerator.generate_chapter_id(idx)}",
+                    title=title,
+                    volume_title=volume_title_line,
+                    content=body,
+                    word_count=len(body),
+                    content_hash=calculate_content_hash(body)
+                ))
                 
         return all_chapters
 
@@ -247,7 +357,8 @@ class Splitter:
                 id=IdentifierGenerator.generate_batch_id(start_ch, end_ch),
                 title=title,
                 content=combined_content,
-                word_count=len(combined_content)
+                word_count=len(combined_content),
+                content_hash=calculate_content_hash(combined_content)
             ))
             
         return batched_chapters
@@ -1,31 +1,104 @@
 import os
-from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional
 from data_protocol.models import Chapter
+from core.splitter.archive import ChapterArchive, ARCHIVE_NAME
 
-def save_chapters(chapters: List[Chapter], output_dir: str, encoding: str = 'utf-8'):
+
+def _chapter_file_path(output_dir: str, chapter: Chapter) -> str:
+    """根据是否有 volume_title 来决定是否放入分卷子文件夹"""
+    if chapter.volume_title:
+        # 清理非法字符
+        volume_clean = "".join([c for c in chapter.volume_title if c not in r'\/:*?"<>|'])
+        return os.path.join(output_dir, volume_clean, f"{chapter.title}.txt")
+    return os.path.join(output_dir, f"{chapter.title}.txt")
+
+
+def _write_file(file_path: str, content: str, encoding: str):
+    # 分卷目录在各章自己的写入任务中创建 (exist_ok 可并发调用)，单个非法路径只影响该章
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding=encoding) as f:
+        f.write(content)
+
+
+def save_chapters(chapters: Iterable[Chapter], output_dir: str, encoding: str = 'utf-8',
+                  workers: Optional[int] = None, pack: bool = False) -> int:
     """
     保存章节列表到文件系统。
     根据是否有 volume_title 来决定是否创建子文件夹。
+    Args:
+        workers: 并发写入的线程数 (默认 settings.SAVE_WORKERS = 1，即顺序写入；线程池只在网络文件系统上有收益)
+        pack: 为 True 时写入单个打包文件 (chapters.pack + 偏移表)，不再生成逐章 .txt 文件
+    Returns:
+        保存的章节数
+    """
+    count = 0
+    for _ in iter_save_chapters(chapters, output_dir, encoding, workers, pack):
+        count += 1
+    return count
+
+
+def iter_save_chapters(chapters: Iterable[Chapter], output_dir: str, encoding: str = 'utf-8',
+                       workers: Optional[int] = None, pack: bool = False) -> Iterator[Chapter]:
+    """
+    流式保存：逐章写入 (或提交给写入线程) 后立即交还该章，调用方可以边保存边总结，
+    配合 ChapterIndex.iter_chapters 时全书正文不会同时驻留内存。
+    迭代结束时等待所有写入完成并输出统计 (打包格式此时才写入偏移表)。
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    if workers is None:
+        from core.config import settings
+        workers = settings.SAVE_WORKERS
+
+    if pack:
+        entries = []
+        yield from ChapterArchive.iter_write(chapters, output_dir, encoding=encoding, entries=entries)
+        print(f"已打包保存 {len(entries)} 章: {os.path.join(output_dir, ARCHIVE_NAME)}")
+        return
 
-    for chapter in chapters:
-        # 确定保存路径
-        if chapter.volume_title:
-            # 清理非法字符
-            volume_clean = "".join([c for c in chapter.volume_title if c not in r'\/:*?"<>|'])
-            volume_dir = os.path.join(output_dir, volume_clean)
-            if not os.path.exists(volume_dir):
-                os.makedirs(volume_dir)
-            
-            file_path = os.path.join(volume_dir, f"{chapter.title}.txt")
-        else:
-            file_path = os.path.join(output_dir, f"{chapter.title}.txt")
+    saved, failed = 0, 0
+    if workers <= 1:
+        for chapter in chapters:
+            file_path = _chapter_file_path(output_dir, chapter)
+            try:
+                _write_file(file_path, chapter.content, encoding)
+                saved += 1
+            except Exception as e:
+                failed += 1
+                print(f"保存失败 {file_path}: {e}")
+            yield chapter
+        print(f"已保存 {saved} 章到: {output_dir}")
+        return
 
+    # 同名章节与顺序写入一样以最后一章为准：同一路径的上一次写入完成后才提交下一次，避免多个线程写同一个文件
+    pending: Dict[str, Future] = {}
+    paths = set()
+
+    def collect(file_path: str, future: Future):
+        nonlocal failed
         try:
-            with open(file_path, 'w', encoding=encoding) as f:
-                f.write(chapter.content)
-            print(f"已保存: {file_path}")
+            future.result()
         except Exception as e:
+            failed += 1
             print(f"保存失败 {file_path}: {e}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chapter in chapters:
+            file_path = _chapter_file_path(output_dir, chapter)
+            previous = pending.pop(file_path, None)
+            if previous is not None:
+                collect(file_path, previous)
+            pending[file_path] = executor.submit(_write_file, file_path, chapter.content, encoding)
+            paths.add(file_path)
+            # 回收已完成的写入；积压过多时等待最早的写入，正在写出的正文不超过 2 * workers 章
+            for done_path in [p for p, f in pending.items() if f.done()]:
+                collect(done_path, pending.pop(done_path))
+            while len(pending) > 2 * workers:
+                oldest = next(iter(pending))
+                collect(oldest, pending.pop(oldest))
+            yield chapter
+        for file_path, future in pending.items():
+            collect(file_path, future)
+
+    print(f"已保存 {len(paths) - failed} 章到: {output_dir}")
@@ -0,0 +1,110 @@
+import re
+import codecs
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from core.splitter.headings import default_engine
+
+
+@dataclass
+class ChapterSpan:
+    """
+    章节在原始字节流中的位置视图 (不含正文内容)。
+    所有偏移量均为字节偏移，可直接用于 mmap / seek。
+    """
+    index: int                   # 1-based 全局章节序号，与 IdentifierGenerator 一致
+    title: str
+    volume_title: Optional[str]
+    start: int                   # 标题起点
+    body_start: int              # 正文起点 (标题行的换行符位置)
+    end: int                     # 正文终点 (下一个标题起点或文件末尾)
+
+    @property
+    def length(self) -> int:
+        return self.end - self.body_start
+
+
+def compile_byte_pattern(encoding: str) -> Tuple[re.Pattern, re.Pattern]:
+    """编译字节级的 分卷/章节 组合正则 (Group 1 = Volume, Group 2 = Chapter)，规则来自默认标题引擎"""
+    return default_engine.byte_patterns(encoding)
+
+
+def iter_heading_matches(buf, encoding: str) -> Iterator[re.Match]:
+    """按顺序产出所有位于行首的 分卷/章节 标题匹配 (group(1) 为分卷，group(2) 为章节)"""
+    head, body = compile_byte_pattern(encoding)
+    match = head.match(buf)
+    if match:
+        yield match
+    yield from body.finditer(buf)
+
+
+def _heading_start(match: re.Match) -> int:
+    return match.start(1) if match.group(1) else match.start(2)
+
+
+def decode_text(data: bytes, encoding: str) -> str:
+    """解码字节片段，并按文本模式 open() 的规则统一换行符"""
+    return data.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+
+def validate_encoding(buf, encoding: str, chunk_size: int = 1 << 20) -> bool:
+    """以增量方式校验整个缓冲区能否用指定编码解码 (不在内存中保留解码结果)"""
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for pos in range(0, len(buf), chunk_size):
+            decoder.decode(buf[pos:pos + chunk_size])
+        decoder.decode(b'', final=True)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+def iter_chapter_spans(buf, encoding: str, chapter_range: Optional[Tuple[int, int]] = None) -> Iterator[ChapterSpan]:
+    """
+    单次扫描字节缓冲区 (bytes 或 mmap)，按顺序产出章节位置视图。
+    Args:
+        buf: 原始字节数据
+        encoding: 文件编码
+        chapter_range: (start, end) 闭区间，从1开始计数；越过 end 后立即停止扫描。
+    """
+    r_start, r_end = chapter_range if chapter_range else (1, None)
+
+    current_volume = None
+    chapter_index = 0
+
+    def emit(match, end) -> Optional[ChapterSpan]:
+        nonlocal current_volume, chapter_index
+        start = _heading_start(match)
+        header_end = buf.find(b'\n', start)
+        if header_end == -1 or header_end > end:
+            header_end = end
+        text = decode_text(match.group(1) or match.group(2), encoding).strip()
+
+        if match.group(1):  # It is a Volume
+            current_volume = text
+            return None
+        chapter_index += 1
+        return ChapterSpan(
+            index=chapter_index,
+            title=text,
+            volume_title=current_volume,
+            start=start,
+            body_start=header_end,
+            end=end
+        )
+
+    prev = None
+    for match in iter_heading_matches(buf, encoding):
+        if prev is not None:
+            span = emit(prev, _heading_start(match))
+            if span:
+                if r_end is not None and span.index > r_end:
+                    return
+                if span.index >= r_start:
+                    yield span
+        prev = match
+
+    if prev is not None:
+        span = emit(prev, len(buf))
+        if span and span.index >= r_start and (r_end is None or span.index <= r_end):
+            yield span
@@ -0,0 +1,60 @@
+import re
+from typing import List, Tuple
+
+from core.utils import estimate_tokens
+
+# 段落 (含结尾换行)
+_PARAGRAPH_RE = re.compile(r'[^\n]*\n*')
+# 句子 (含句末标点与紧随的引号)
+_SENTENCE_RE = re.compile(r'[^。！？!?…\n]*[。！？!?…]+[”’"』」]*|[^。！？!?…\n]+\n*|\n+')
+
+
+def _pieces(content: str, max_tokens: int) -> List[Tuple[int, str]]:
+    """把正文切成不超过预算的最小单元：优先段落，过长的段落按句子切，过长的句子按字数硬切"""
+    pieces = []
+    for para in _PARAGRAPH_RE.finditer(content):
+        text = para.group()
+        if not text:
+            continue
+        if estimate_tokens(text) <= max_tokens:
+            pieces.append((para.start(), text))
+            continue
+        for sent in _SENTENCE_RE.finditer(text):
+            s = sent.group()
+            if not s:
+                continue
+            start = para.start() + sent.start()
+            if estimate_tokens(s) <= max_tokens:
+                pieces.append((start, s))
+                continue
+            # 中文 1 字约 1 Token，按 max_tokens 个字符切分不会超预算
+            for offset in range(0, len(s), max_tokens):
+                pieces.append((start + offset, s[offset:offset + max_tokens]))
+    return pieces
+
+
+def split_into_chunks(content: str, max_tokens: int) -> List[Tuple[int, str]]:
+    """
+    按段落边界把长正文切成若干块，每块估算 Token 数不超过 max_tokens。
+    每块从头开始贪心装入段落，因此修改某一段时 (只要该块仍装得下) 其余块的边界和内容都不变，
+    按块内容缓存的结果可以继续命中。
+    Returns:
+        [(块在原文中的起始位置, 块文本), ...]，所有块按顺序拼接等于原文
+    """
+    if not content or estimate_tokens(content) <= max_tokens:
+        return [(0, content)]
+
+    chunks = []
+    start, parts, used = 0, [], 0
+    for offset, text in _pieces(content, max_tokens):
+        tokens = estimate_tokens(text)
+        if parts and used + tokens > max_tokens:
+            chunks.append((start, "".join(parts)))
+            parts, used = [], 0
+        if not parts:
+            start = offset
+        parts.append(text)
+        used += tokens
+    if parts:
+        chunks.append((start, "".join(parts)))
+    return chunks
@@ -0,0 +1,275 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from core.summarizer.llm_client import LLMClient
+
+
+class CircuitBreaker:
+    """
+    单个 Provider 的熔断器：
+    - closed: 正常调用，连续失败 failure_threshold 次后进入 open
+    - open: cooldown 秒内直接跳过该 Provider
+    - half-open: 冷却结束后只放行一个试探请求，成功则 closed，失败重新 open
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def abandon(self):
+        """试探请求被取消 (未得出结果)，允许下一次重新试探"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyTracker:
+    """最近 window 次成功调用的耗时，用于计算 p95"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class FailoverClient(LLMClient):
+    """
+    组合多个 Provider 的客户端：
+    - 按顺序故障转移：当前 Provider 出错时尝试下一个，熔断中的 Provider 被跳过
+    - 对冲请求 (hedge, 仅异步)：首选 Provider 超过其 p95 耗时仍未返回时，
+      向下一个 Provider 并行发出同一请求，取先成功的结果并取消另一个，
+      避免最慢 1% 的调用决定整批任务的尾延迟
+    """
+
+    def __init__(self, clients: List[Tuple[str, LLMClient]], hedge: bool = False,
+                 hedge_min_delay: float = 2.0, hedge_min_samples: int = 20,
+                 failure_threshold: int = 5, cooldown: float = 60.0):
+        if not clients:
+            raise ValueError("FailoverClient 至少需要一个 Provider")
+        self.clients = clients
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(failure_threshold, cooldown) for name, _ in clients}
+        self.latency: Dict[str, LatencyTracker] = {name: LatencyTracker() for name, _ in clients}
+        self.served: Dict[str, int] = {name: 0 for name, _ in clients}
+        self.failovers = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def model(self) -> str:
+        return getattr(self.clients[0][1], "model", "")
+
+    def attach_limiter(self, limiter, congestion_retries: int = 5):
+        """自适应并发控制作用于所有 Provider (共享同一个 limiter)"""
+        for _, client in self.clients:
+            if hasattr(client, "attach_limiter"):
+                client.attach_limiter(limiter, congestion_retries)
+
+    def _next_candidate(self, start: int) -> Tuple[int, Optional[str], Optional[LLMClient]]:
+        """从 start 开始找下一个未熔断的 Provider (熔断器只在真正发出请求前检查，保证半开状态只放行一个试探)"""
+        for index in range(start, len(self.clients)):
+            name, client = self.clients[index]
+            if self.breakers[name].allow():
+                return index, name, client
+        return len(self.clients), None, None
+
+    def _no_provider(self, last_error: Optional[BaseException]):
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError("所有 LLM Provider 均处于熔断状态: " + ", ".join(name for name, _ in self.clients))
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        tracker = self.latency[name]
+        if len(tracker) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, tracker.percentile(0.95))
+
+    def _record(self, name: str, started: float, error: Optional[BaseException]):
+        if error is None:
+            self.breakers[name].record_success()
+            self.latency[name].record(time.monotonic() - started)
+            self.served[name] += 1
+        else:
+            self.breakers[name].record_failure()
+            print(f"[Failover] {name} 调用失败: {error}")
+
+    def chat_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        last_error = None
+        index, attempts = 0, 0
+        while True:
+            index, name, client = self._next_candidate(index)
+            if client is None:
+                self._no_provider(last_error)
+            index += 1
+            if attempts:
+                self.failovers += 1
+            attempts += 1
+            started = time.monotonic()
+            try:
+                result = client.chat_completion(messages, temperature)
+            except Exception as e:
+                self._record(name, started, e)
+                last_error = e
+                continue
+            self._record(name, started, None)
+            return result
+
+    def generate(self, prompt: str) -> str:
+        return self.chat_completion([{"role": "user", "content": prompt}])
+
+    async def _call_async(self, name: str, client: LLMClient, messages, temperature) -> str:
+        started = time.monotonic()
+        try:
+            result = await client.chat_completion_async(messages, temperature)
+        except asyncio.CancelledError:
+            # 输给对冲请求而被取消，不算失败
+            self.breakers[name].abandon()
+            raise
+        except Exception as e:
+            self._record(name, started, e)
+            raise
+        self._record(name, started, None)
+        return result
+
+    async def chat_completion_async(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        pending: Dict[asyncio.Future, str] = {}
+        last_error = None
+        next_index = 0
+        hedge_task = None
+        hedge_tried = False
+
+        def launch() -> Optional[asyncio.Future]:
+            nonlocal next_index
+            next_index, name, client = self._next_candidate(next_index)
+            if client is None:
+                return None
+            next_index += 1
+            task = asyncio.ensure_future(self._call_async(name, client, messages, temperature))
+            pending[task] = name
+            return task
+
+        if launch() is None:
+            self._no_provider(None)
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedge_tried and len(pending) == 1 and next_index < len(self.clients):
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 首选 Provider 超过其 p95 耗时仍未返回，向下一个 Provider 发出对冲请求
+                    hedge_tried = True
+                    hedge_task = launch()
+                    if hedge_task is not None:
+                        self.hedged += 1
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+
+                # 所有进行中的请求都失败了，故障转移到下一个 Provider
+                if not pending:
+                    if launch() is None:
+                        break
+                    self.failovers += 1
+        finally:
+            for task in pending:
+                task.cancel()
+        self._no_provider(last_error)
+
+    async def chat_completion_stream(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                                     on_event=None):
+        """
+        流式调用的故障转移 (按顺序，不对冲：两路流的增量事件无法合并)。
+        失败 Provider 已经回调过的部分结果不会撤回，最终结果以返回值为准。
+        """
+        last_error = None
+        index, attempts = 0, 0
+        while True:
+            index, name, client = self._next_candidate(index)
+            if client is None:
+                self._no_provider(last_error)
+            index += 1
+            if attempts:
+                self.failovers += 1
+            attempts += 1
+            started = time.monotonic()
+            try:
+                result = await client.chat_completion_stream(messages, temperature, on_event)
+            except asyncio.CancelledError:
+                self.breakers[name].abandon()
+                raise
+            except Exception as e:
+                self._record(name, started, e)
+                last_error = e
+                continue
+            self._record(name, started, None)
+            return result
+
+    def stats(self) -> Dict:
+        return {
+            "served": dict(self.served),
+            "failovers": self.failovers,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "breakers": {name: breaker.state for name, breaker in self.breakers.items()},
+            "p95_seconds": {name: tracker.percentile(0.95) for name, tracker in self.latency.items()},
+        }
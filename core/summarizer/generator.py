@@ -1,9 +1,15 @@
+import re
 import json
+import asyncio
 import jieba
 from collections import defaultdict
-from typing import List, Tuple, Set
+from typing import Any, Callable, Dict, List, Optional, Tuple, Set
 from core.summarizer.llm_client import LLMClient
+from core.summarizer.streaming import MalformedStreamError, StreamError, TruncatedResponseError
+from core.summarizer.chunking import split_into_chunks
+from core.summarizer.keyword_matcher import KeywordMatcher
 from core.summarizer.prompts import Prompts
+from core.utils import estimate_tokens
 from data_protocol.models import Chapter, ChapterSummary, SummarySentence, TextSpan, Entity, Relationship
 
 STOPWORDS = {
@@ -16,155 +22,283 @@ STOPWORDS = {
 class SummaryGenerator:
     """总结生成器，负责调用 LLM 并提取原文溯源"""
     
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, chunk_tokens: Optional[int] = None,
+                 cache_manager=None, prompt_hash: Optional[str] = None, model_config: Optional[Dict] = None,
+                 pack_tokens: Optional[int] = None, pack_max_chapters: Optional[int] = None,
+                 stream: Optional[bool] = None,
+                 on_partial: Optional[Callable[[Chapter, str, Optional[str], Any], None]] = None):
+        """
+        Args:
+            chunk_tokens: 单次请求的正文 Token 预算 (默认 settings.SUMMARY_CHUNK_TOKENS)，
+                超出的长章节按段落分块总结后合并 (map-reduce)
+            cache_manager / prompt_hash / model_config: 提供时按块缓存分块总结的结果，
+                修改长章节的某一部分只会重新总结对应的块
+            pack_tokens / pack_max_chapters: 多章打包的正文 Token 预算与章节数上限
+                (默认 settings.SUMMARY_PACK_TOKENS / SUMMARY_PACK_MAX_CHAPTERS，预算为 0 时不打包)
+            stream: 异步接口是否使用流式输出并增量解析 JSON (默认 settings.LLM_STREAMING，
+                客户端不支持流式时自动退回普通调用)。截断或结构错误的输出直接抛出 StreamError 由调用方重试
+            on_partial: 流式解析出部分结果时的回调 on_partial(chapter, kind, key, value)，
+                如 (chapter, "field", "headline", "...")、(chapter, "item", "entities", {...})；
+                打包请求中的 chapter 为包内第一章，value 为带 chapter_index 的单章结果
+        """
+        from core.config import settings
         self.llm = llm_client
+        self.chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+        self.pack_tokens = settings.SUMMARY_PACK_TOKENS if pack_tokens is None else pack_tokens
+        self.pack_max_chapters = pack_max_chapters or settings.SUMMARY_PACK_MAX_CHAPTERS
+        self.cache_manager = cache_manager
+        self.prompt_hash = prompt_hash
+        self.model_config = model_config
+        self.stream = settings.LLM_STREAMING if stream is None else stream
+        self.on_partial = on_partial
+        self.stream_stats = {"requests": 0, "truncated": 0, "malformed": 0}
 
-    async def generate_summary_async(self, chapter: Chapter) -> ChapterSummary:
-        """异步为单个章节生成总结"""
-        print(f"正在总结章节: {chapter.title} (字数: {chapter.word_count})")
-        
-        # 1. 调用 LLM 生成总结文本 (异步)
-        prompt_messages = Prompts.get_summary_prompt(chapter.title, chapter.content[:4000])
-        headline = None
-        summary_texts = []
-        entities_data = []
-        relationships_data = [] # Add initialization
-        
+    async def _chat_async(self, prompt_messages: List[Dict[str, str]]) -> str:
+        # Check if client supports async
+        if hasattr(self.llm, 'chat_completion_async'):
+            return await self.llm.chat_completion_async(prompt_messages)
+        # Fallback to sync if async not implemented (though it should be)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.llm.chat_completion, prompt_messages)
+
+    async def _complete_async(self, prompt_messages: List[Dict[str, str]], chapter: Chapter,
+                              parse: Optional[Callable[[str], object]] = None) -> object:
+        """调用 LLM 并返回解析后的 JSON 对象 (启用流式时边接收边解析，否则用 parse 解析完整响应)"""
+        if not (self.stream and hasattr(self.llm, 'chat_completion_stream')):
+            return (parse or self._parse_json_response)(await self._chat_async(prompt_messages))
+
+        on_event = None
+        if self.on_partial:
+            on_event = lambda kind, key, value: self.on_partial(chapter, kind, key, value)
+        self.stream_stats["requests"] += 1
         try:
-            # Check if client supports async
-            if hasattr(self.llm, 'chat_completion_async'):
-                raw_response = await self.llm.chat_completion_async(prompt_messages)
-            else:
-                # Fallback to sync if async not implemented (though it should be)
-                import asyncio
-                loop = asyncio.get_event_loop()
-                raw_response = await loop.run_in_executor(None, self.llm.chat_completion, prompt_messages)
+            return await self.llm.chat_completion_stream(prompt_messages, on_event=on_event)
+        except TruncatedResponseError:
+            self.stream_stats["truncated"] += 1
+            raise
+        except MalformedStreamError:
+            self.stream_stats["malformed"] += 1
+            raise
 
-            parsed_data = self._parse_json_response(raw_response)
-            
-            if isinstance(parsed_data, dict):
-                headline = parsed_data.get("headline")
-                summary_texts = parsed_data.get("summary_sentences", [])
-                entities_data = parsed_data.get("entities", [])
-                relationships_data = parsed_data.get("relationships", [])
-            elif isinstance(parsed_data, list):
-                summary_texts = parsed_data
-                if summary_texts:
-                    headline = summary_texts[0]
-            else:
-                summary_texts = [str(parsed_data)]
-                
-        except Exception as e:
-            print(f"LLM 响应解析失败: {e}")
-            summary_texts = ["(总结生成失败)"]
+    async def generate_summary_async(self, chapter: Chapter) -> ChapterSummary:
+        """异步为单个章节生成总结 (长章节分块并发总结后合并)"""
+        print(f"正在总结章节: {chapter.title} (字数: {chapter.word_count})")
+        chunks = split_into_chunks(chapter.content, self.chunk_tokens)
+        if len(chunks) == 1:
+            try:
+                parsed = await self._complete_async(Prompts.get_summary_prompt(chapter.title, chapter.content), chapter)
+                payload = self._payload_from_parsed(parsed)
+            except StreamError:
+                # 流式输出被截断 / 格式错误：抛出由调用方重试，而不是保存失败占位
+                raise
+            except Exception as e:
+                print(f"LLM 响应解析失败: {e}")
+                payload = (None, ["(总结生成失败)"], [], [])
+            return self._build_summary(chapter, chapter.content, *payload)
 
-        # 2. 溯源匹配 (CPU-bound, can keep sync or run in executor if slow)
-        # For simplicity, we keep it sync as it's usually fast enough for now
-        summary_objects = []
-        if not isinstance(summary_texts, list):
-            summary_texts = [str(summary_texts)]
+        async def summarize_chunk(index: int, text: str) -> ChapterSummary:
+            cached = self._get_cached_chunk(text)
+            if cached is not None:
+                return cached
+            title = self._chunk_title(chapter, index, len(chunks))
+            # 单块失败直接抛出，由调用方重试整章 (已成功的块已写入缓存，不会重复调用)
+            parsed = await self._complete_async(Prompts.get_summary_prompt(title, text), chapter)
+            summary = self._build_summary(chapter, text, *self._payload_from_parsed(parsed))
+            self._save_chunk(text, summary)
+            return summary
 
-        for text in summary_texts:
-            spans = self._find_source_spans(text, chapter.content)
-            summary_objects.append(SummarySentence(
-                summary_text=text,
-                source_spans=spans,
-                confidence=1.0 if spans else 0.5
-            ))
+        parts = await asyncio.gather(*[summarize_chunk(i, text) for i, (_, text) in enumerate(chunks)])
+        return self._merge_chunk_summaries(chapter, [(start, part) for (start, _), part in zip(chunks, parts)])
 
-        # 3. 构建实体对象
-        entity_objects = []
-        for ent in entities_data:
+    def generate_summary(self, chapter: Chapter) -> ChapterSummary:
+        """为单个章节生成总结 (长章节按块依次总结后合并)"""
+        print(f"正在总结章节: {chapter.title} (字数: {chapter.word_count})")
+        chunks = split_into_chunks(chapter.content, self.chunk_tokens)
+        if len(chunks) == 1:
             try:
-                entity_objects.append(Entity(
-                    name=ent.get("name", "Unknown"),
-                    type=ent.get("type", "Other"),
-                    description=ent.get("description", ""),
-                    confidence=0.9
-                ))
+                raw_response = self.llm.chat_completion(Prompts.get_summary_prompt(chapter.title, chapter.content))
+                payload = self._parse_summary_payload(raw_response)
             except Exception as e:
-                print(f"实体解析失败: {ent}, error: {e}")
+                print(f"LLM 响应解析失败: {e}")
+                payload = (None, ["(总结生成失败)"], [], [])
+            return self._build_summary(chapter, chapter.content, *payload)
 
-        # 4. 构建关系对象
-        relationship_objects = []
-        for rel in relationships_data:
+        parts = []
+        for index, (start, text) in enumerate(chunks):
+            summary = self._get_cached_chunk(text)
+            if summary is None:
+                title = self._chunk_title(chapter, index, len(chunks))
+                raw_response = self.llm.chat_completion(Prompts.get_summary_prompt(title, text))
+                summary = self._build_summary(chapter, text, *self._parse_summary_payload(raw_response))
+                self._save_chunk(text, summary)
+            parts.append((start, summary))
+        return self._merge_chunk_summaries(chapter, parts)
+
+    def plan_packs(self, chapters: List[Chapter]) -> List[List[Chapter]]:
+        """
+        把连续的短章节按 pack_tokens 预算分组，每组用一次请求总结。
+        超出预算 (或需要分块) 的长章节单独成组；未启用打包时每章一组。
+        """
+        if not self.pack_tokens or self.pack_max_chapters < 2:
+            return [[ch] for ch in chapters]
+        packs, current, used = [], [], 0
+        for ch in chapters:
+            tokens = estimate_tokens(ch.content)
+            if tokens > self.pack_tokens or tokens > self.chunk_tokens:
+                if current:
+                    packs.append(current)
+                    current, used = [], 0
+                packs.append([ch])
+                continue
+            if current and (used + tokens > self.pack_tokens or len(current) >= self.pack_max_chapters):
+                packs.append(current)
+                current, used = [], 0
+            current.append(ch)
+            used += tokens
+        if current:
+            packs.append(current)
+        return packs
+
+    async def generate_packed_summaries_async(self, chapters: List[Chapter]) -> List[ChapterSummary]:
+        """
+        一次请求总结多个短章节，按章节拆分响应，返回与 chapters 一一对应的总结。
+        响应中缺失的章节单独重新总结。
+        """
+        if len(chapters) == 1:
+            return [await self.generate_summary_async(chapters[0])]
+        print(f"正在打包总结 {len(chapters)} 章: {chapters[0].title} ~ {chapters[-1].title}")
+        prompt_messages = Prompts.get_packed_summary_prompt([(ch.title, ch.content) for ch in chapters])
+        items = self._split_packed_response(
+            await self._complete_async(prompt_messages, chapters[0], self._parse_packed_json), len(chapters))
+
+        results = [self._build_summary(ch, ch.content, *self._payload_from_parsed(items[i])) if i in items else None
+                   for i, ch in enumerate(chapters)]
+        missing = [i for i, summary in enumerate(results) if summary is None]
+        if missing:
+            print(f"打包响应缺少 {len(missing)} 章，单独总结")
+            fallback = await asyncio.gather(*[self.generate_summary_async(chapters[i]) for i in missing])
+            for i, summary in zip(missing, fallback):
+                results[i] = summary
+        return results
+
+    def generate_packed_summaries(self, chapters: List[Chapter]) -> List[ChapterSummary]:
+        """同步版本的多章打包总结"""
+        if len(chapters) == 1:
+            return [self.generate_summary(chapters[0])]
+        print(f"正在打包总结 {len(chapters)} 章: {chapters[0].title} ~ {chapters[-1].title}")
+        prompt_messages = Prompts.get_packed_summary_prompt([(ch.title, ch.content) for ch in chapters])
+        items = self._split_packed_response(self._parse_packed_json(self.llm.chat_completion(prompt_messages)),
+                                            len(chapters))
+        return [self._build_summary(ch, ch.content, *self._payload_from_parsed(items[i])) if i in items
+                else self.generate_summary(ch) for i, ch in enumerate(chapters)]
+
+    def _parse_packed_json(self, raw_response: str) -> object:
+        """解析打包请求的完整响应 (JSON 数组)"""
+        parsed = self._parse_json_response(raw_response)
+        if isinstance(parsed, list) or (isinstance(parsed, dict) and (parsed.get("chapters") or parsed.get("summaries"))):
+            return parsed
+        # 数组前后带有说明文字时，提取最外层的 []
+        cleaned = re.sub(r'<think>.*?</think>', '', raw_response, flags=re.DOTALL)
+        start, end = cleaned.find('['), cleaned.rfind(']')
+        try:
+            return json.loads(cleaned[start:end + 1]) if start != -1 and end > start else parsed
+        except json.JSONDecodeError:
+            return parsed
+
+    def _split_packed_response(self, parsed: object, count: int) -> Dict[int, Dict]:
+        """
+        把打包请求解析后的响应拆成 {章节下标: 单章 JSON 对象}。
+        优先按 chapter_index 对应，没有序号时按顺序对应 (数量必须一致)。
+        """
+        if isinstance(parsed, dict):
+            parsed = parsed.get("chapters") or parsed.get("summaries")
+        if not isinstance(parsed, list):
+            print("无法解析打包响应，逐章重新总结")
+            return {}
+
+        items = [item for item in parsed if isinstance(item, dict)]
+        by_index = {}
+        for item in items:
             try:
-                source = rel.get("source", "").strip()
-                target = rel.get("target", "").strip()
-                relation = rel.get("relation", "").strip()
-                description = rel.get("description", "").strip()
-                
-                if not source or not target or not relation:
-                    continue
-                    
-                relationship_objects.append(Relationship(
-                    source=source,
-                    target=target,
-                    relation=relation,
-                    description=description,
-                    confidence=0.9
-                ))
-            except Exception as e:
-                print(f"关系解析失败: {rel}, error: {e}")
+                index = int(item.get("chapter_index")) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < count:
+                by_index.setdefault(index, item)
+        if not by_index and len(items) == count:
+            by_index = dict(enumerate(items))
+        return by_index
 
-        return ChapterSummary(
-            chapter_id=chapter.id,
-            chapter_title=chapter.title,
-            volume_title=chapter.volume_title,
-            headline=headline,
-            summary_sentences=summary_objects,
-            entities=entity_objects,
-            relationships=relationship_objects
-        )
+    @staticmethod
+    def _chunk_title(chapter: Chapter, index: int, total: int) -> str:
+        return f"{chapter.title} (第 {index + 1}/{total} 部分)"
 
-    def generate_summary(self, chapter: Chapter) -> ChapterSummary:
-        """为单个章节生成总结"""
-        print(f"正在总结章节: {chapter.title} (字数: {chapter.word_count})")
-        
-        # 1. 调用 LLM 生成总结文本
-        prompt_messages = Prompts.get_summary_prompt(chapter.title, chapter.content[:4000]) # 限制长度以避免超 token
-        headline = None
-        summary_texts = []
-        entities_data = []
-        
+    def extend_lease(self, lease_id: str, chapters: List[Chapter]):
+        """将长章节各分块的缓存键登记到运行租约，避免读回前被 cache-trim 淘汰"""
+        if self.cache_manager is None:
+            return
+        texts = []
+        for chapter in chapters:
+            chunks = split_into_chunks(chapter.content, self.chunk_tokens)
+            if len(chunks) > 1:
+                texts.extend(text for _, text in chunks)
+        if texts:
+            self.cache_manager.extend_chunk_lease(lease_id, texts, self.prompt_hash, self.model_config)
+
+    def _get_cached_chunk(self, text: str) -> Optional[ChapterSummary]:
+        if self.cache_manager is None:
+            return None
+        return self.cache_manager.get_cached_chunk(text, self.prompt_hash, self.model_config)
+
+    def _save_chunk(self, text: str, summary: ChapterSummary):
+        if self.cache_manager is None:
+            return
         try:
-            raw_response = self.llm.chat_completion(prompt_messages)
-            parsed_data = self._parse_json_response(raw_response)
-            
-            if isinstance(parsed_data, dict):
-                headline = parsed_data.get("headline")
-                summary_texts = parsed_data.get("summary_sentences", [])
-                entities_data = parsed_data.get("entities", [])
-                relationships_data = parsed_data.get("relationships", [])
-            elif isinstance(parsed_data, list):
-                # 兼容旧格式（如果是 list，则视为 detailed summaries）
-                summary_texts = parsed_data
-                # 尝试用第一句作为 headline 的 fallback
-                if summary_texts:
-                    headline = summary_texts[0]
-            else:
-                summary_texts = [str(parsed_data)]
-                
+            self.cache_manager.save_chunk(text, self.prompt_hash, self.model_config, summary)
         except Exception as e:
-            print(f"LLM 响应解析失败: {e}")
-            summary_texts = ["(总结生成失败)"]
+            print(f"(Chunk Cache Write Failed: {e}) ", end="")
 
-        # 2. 溯源匹配 (简单实现：基于关键词匹配)
+    def _parse_summary_payload(self, raw_response: str) -> Tuple[Optional[str], List, List, List]:
+        """解析总结响应，返回 (headline, summary_sentences, entities, relationships)"""
+        return self._payload_from_parsed(self._parse_json_response(raw_response))
+
+    @staticmethod
+    def _payload_from_parsed(parsed_data: object) -> Tuple[Optional[str], List, List, List]:
+        headline = None
+        summary_texts, entities_data, relationships_data = [], [], []
+        if isinstance(parsed_data, dict):
+            headline = parsed_data.get("headline")
+            summary_texts = parsed_data.get("summary_sentences", [])
+            entities_data = parsed_data.get("entities", [])
+            relationships_data = parsed_data.get("relationships", [])
+        elif isinstance(parsed_data, list):
+            # 兼容旧格式（如果是 list，则视为 detailed summaries）
+            summary_texts = parsed_data
+            # 尝试用第一句作为 headline 的 fallback
+            if summary_texts:
+                headline = summary_texts[0]
+        else:
+            summary_texts = [str(parsed_data)]
+        return headline, summary_texts, entities_data, relationships_data
+
+    def _build_summary(self, chapter: Chapter, content: str, headline: Optional[str], summary_texts,
+                       entities_data: List, relationships_data: List) -> ChapterSummary:
+        """溯源匹配并构建总结对象 (content 为本次总结的正文，溯源位置相对于它)"""
+        # 1. 溯源匹配 (简单实现：基于关键词匹配)
         summary_objects = []
         
         # 确保 summary_texts 是列表
         if not isinstance(summary_texts, list):
             summary_texts = [str(summary_texts)]
 
-        for text in summary_texts:
-            spans = self._find_source_spans(text, chapter.content)
+        for text, spans in zip(summary_texts, self._find_all_source_spans(summary_texts, content)):
             summary_objects.append(SummarySentence(
                 summary_text=text,
                 source_spans=spans,
                 confidence=1.0 if spans else 0.5
             ))
 
-        # 3. 构建实体对象
+        # 2. 构建实体对象
         entity_objects = []
         for ent in entities_data:
             try:
@@ -177,7 +311,7 @@ class SummaryGenerator:
             except Exception as e:
                 print(f"实体解析失败: {ent}, error: {e}")
 
-        # 4. 构建关系对象
+        # 3. 构建关系对象
         relationship_objects = []
         for rel in relationships_data:
             try:
@@ -213,6 +347,44 @@ class SummaryGenerator:
             relationships=relationship_objects
         )
 
+    def _merge_chunk_summaries(self, chapter: Chapter, parts: List[Tuple[int, ChapterSummary]]) -> ChapterSummary:
+        """
+        合并各块的总结 (reduce)：
+        - 总结句按块顺序拼接，溯源位置加上块的起始偏移
+        - 实体按名称合并，类型取首次出现，描述去重后拼接
+        - 关系按 (source, relation, target) 去重
+        - headline 由各块 headline 拼接
+        """
+        headlines, sentences = [], []
+        entities: Dict[str, Entity] = {}
+        relationships: Dict[Tuple[str, str, str], Relationship] = {}
+
+        for start, part in parts:
+            if part.headline and part.headline not in headlines:
+                headlines.append(part.headline)
+            for sentence in part.summary_sentences:
+                spans = [TextSpan(text=span.text, start_index=span.start_index + start, end_index=span.end_index + start)
+                         for span in sentence.source_spans]
+                sentences.append(sentence.model_copy(update={"source_spans": spans}))
+            for entity in part.entities:
+                existing = entities.get(entity.name)
+                if existing is None:
+                    entities[entity.name] = entity.model_copy()
+                elif entity.description and entity.description not in existing.description:
+                    existing.description = "；".join(filter(None, [existing.description, entity.description]))
+            for rel in part.relationships:
+                relationships.setdefault((rel.source, rel.relation, rel.target), rel)
+
+        return ChapterSummary(
+            chapter_id=chapter.id,
+            chapter_title=chapter.title,
+            volume_title=chapter.volume_title,
+            headline="；".join(headlines) or None,
+            summary_sentences=sentences,
+            entities=list(entities.values()),
+            relationships=list(relationships.values())
+        )
+
     def generate_segment_summary(self, segment_summaries: List[str]) -> Dict[str, str]:
         """
         为剧情段落生成总结
@@ -325,9 +497,21 @@ class SummaryGenerator:
         在原文中寻找与总结句最相关的片段。
         采用基于关键词密度的滑动窗口算法。
         """
+        return self._find_all_source_spans([summary], content)[0]
+
+    def _find_all_source_spans(self, summaries: List[str], content: str) -> List[List[TextSpan]]:
+        """
+        为同一正文的多个总结句寻找溯源片段。
+        所有句子的关键词合并后一次定位 (KeywordMatcher，每个关键词只匹配一次)，再逐句做滑动窗口评分。
+        """
         # 1. 分词并过滤停用词
-        keywords = [w for w in jieba.lcut(summary) if w not in STOPWORDS and len(w) > 1]
-        
+        keywords_list = [[w for w in jieba.lcut(summary) if w not in STOPWORDS and len(w) > 1] for summary in summaries]
+        positions = KeywordMatcher(w for keywords in keywords_list for w in keywords).find_all(content)
+        return [self._best_span(summary, content, keywords, positions)
+                for summary, keywords in zip(summaries, keywords_list)]
+
+    def _best_span(self, summary: str, content: str, keywords: List[str],
+                   positions: Dict[str, List[int]]) -> List[TextSpan]:
         if not keywords:
             # 降级：如果找不到关键词，尝试直接搜索前10个字符
             start = content.find(summary[:10])
@@ -335,16 +519,9 @@ class SummaryGenerator:
                 return [TextSpan(text=content[start:start+len(summary)], start_index=start, end_index=start+len(summary))]
             return []
 
-        # 2. 找到所有关键词在原文中的位置
+        # 2. 所有关键词在原文中的位置 (来自自动机的单次扫描)
         # 格式: (index, word)
-        keyword_positions = []
-        for w in keywords:
-            start = 0
-            while True:
-                idx = content.find(w, start)
-                if idx == -1: break
-                keyword_positions.append((idx, w))
-                start = idx + 1
+        keyword_positions = [(idx, w) for w in keywords for idx in positions[w]]
         
         if not keyword_positions:
             return []
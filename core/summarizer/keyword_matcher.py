@@ -0,0 +1,42 @@
+from typing import Dict, Iterable, List
+
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick 已列入 requirements.txt；无法安装 (C 扩展) 时每个不同的关键词用 str.find 扫描一遍正文
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """
+    多关键词匹配：一次找出所有关键词在正文中的全部出现位置 (含相互重叠的关键词)。
+    溯源时一章的所有总结句共用一次匹配，而不是每句的每个关键词各扫描一遍正文。
+
+    安装 pyahocorasick 时使用 Aho-Corasick 自动机，正文只扫描一遍；
+    否则对每个不同的关键词调用一次 str.find 循环 (纯 Python 的自动机或单个多选正则需逐个匹配回到 Python 处理，
+    实测反而比 C 实现的 find 慢，见 scripts/benchmark_source_spans.py)。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def find_all(self, text: str) -> Dict[str, List[int]]:
+        """返回 {关键词: 所有出现的起始位置 (升序)}，未出现的关键词为空列表"""
+        positions: Dict[str, List[int]] = {keyword: [] for keyword in self.keywords}
+        if self._automaton is not None:
+            for end, keyword in self._automaton.iter(text):
+                positions[keyword].append(end - len(keyword) + 1)
+            return positions
+
+        for keyword, found in positions.items():
+            idx = text.find(keyword)
+            while idx != -1:
+                found.append(idx)
+                idx = text.find(keyword, idx + 1)
+        return positions
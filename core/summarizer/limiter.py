@@ -0,0 +1,214 @@
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import openai
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头 (秒数或 HTTP 日期)，返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception):
+    """
+    判断异常是否为拥塞信号 (429 / 503 / 超时)。
+    Returns:
+        (是否拥塞, Retry-After 秒数或 None)
+    """
+    if isinstance(error, openai.APITimeoutError):
+        return True, None
+    if isinstance(error, openai.APIStatusError) and error.status_code in (429, 503):
+        headers = error.response.headers if error.response is not None else {}
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after is None and headers.get("retry-after-ms"):
+            retry_after = parse_retry_after(headers.get("retry-after-ms"))
+            retry_after = retry_after / 1000 if retry_after is not None else None
+        return True, retry_after
+    return False, None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发限制 (加性增、乘性减)：
+    - 每次成功: limit += increase / limit (约每完成一整轮并发 +increase)
+    - 遇到 429 / 503 / 超时: limit *= decrease (同一轮拥塞只减一次)，
+      若带有 Retry-After 则在此之前暂停发出新请求
+    limit 在 [min_limit, max_limit] 之间变化。asyncio 使用，非线程安全。
+    """
+
+    def __init__(self, initial: int = 5, min_limit: int = 1, max_limit: int = 32,
+                 increase: float = 1.0, decrease: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = float(min(max(initial, min_limit), self.max_limit))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+        # 统计
+        self.successes = 0
+        self.congestions = 0
+        self.errors = 0
+        self.peak_limit = self.limit
+        self._started = None
+        self._last_change = None
+        self._busy_integral = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _track(self, delta: int):
+        # 累计 in_flight 对时间的积分，用于计算实际平均并发
+        now = time.monotonic()
+        if self._started is None:
+            self._started = self._last_change = now
+        self._busy_integral += self._in_flight * (now - self._last_change)
+        self._last_change = now
+        self._in_flight += delta
+
+    async def acquire(self) -> float:
+        """等待空闲槽位，返回请求开始时间 (传给 release)"""
+        async with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self._in_flight < self.limit:
+                    self._track(+1)
+                    return time.monotonic()
+                await self._cond.wait()
+
+    async def release(self, started_at: float, outcome: str = "success", retry_after: Optional[float] = None):
+        """
+        释放槽位并根据结果调整 limit。
+        outcome: "success" / "congestion" / "error" (其他错误不影响 limit)
+        """
+        async with self._cond:
+            self._track(-1)
+            now = time.monotonic()
+            if outcome == "success":
+                self.successes += 1
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+                self.peak_limit = max(self.peak_limit, self.limit)
+            elif outcome == "congestion":
+                self.congestions += 1
+                # 在上次减小之后才发出的请求才会再次触发减小，避免同一波 429 把并发降到底
+                if started_at >= self._last_decrease:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease)
+                    self._last_decrease = now
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            else:
+                self.errors += 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        """运行结束时的并发与吞吐统计"""
+        elapsed = 0.0
+        busy = self._busy_integral
+        if self._started is not None:
+            now = time.monotonic()
+            elapsed = now - self._started
+            busy += self._in_flight * (now - self._last_change)
+        return {
+            "final_limit": self.limit,
+            "peak_limit": self.peak_limit,
+            "avg_concurrency": round(busy / elapsed, 2) if elapsed else 0.0,
+            "successes": self.successes,
+            "congestions": self.congestions,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_per_min": round(self.successes * 60 / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶 (按分钟配额匀速补充，容量为一分钟的配额)。
+    reserve 立即预留并返回需要等待的秒数 (允许透支，后来者排在透支之后)，
+    因此同步线程与 asyncio 协程可以共用同一个桶。
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self._tokens = per_minute
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self._rate)
+
+    def adjust(self, amount: float):
+        """事后修正预留量 (正数退还，负数补扣)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """
+    请求数 / Token 数双令牌桶 (RPM / TPM，0 表示不限制)。
+    调用前按估算的输入 Token 预留，返回后用实际用量修正。
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.waited_seconds = 0.0
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = self.requests.reserve(1)
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        self.waited_seconds += wait
+        return wait
+
+    def acquire(self, estimated_tokens: int):
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens: int):
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
@@ -1,7 +1,130 @@
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict, Any
-from openai import OpenAI, AsyncOpenAI
+from typing import Optional, List, Dict, Any, Awaitable, Callable
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 import asyncio
+import json
+import hashlib
+import threading
+import time
+import weakref
+import importlib.util
+try:
+    import httpx
+except ImportError:
+    httpx = None
+from core.singleflight import SingleFlight
+from core.summarizer.limiter import AdaptiveLimiter, RateLimiter, classify_error
+from core.summarizer import usage
+from core.summarizer.streaming import EventCallback, IncrementalJSONParser, ThinkStripper, TruncatedResponseError
+from core.utils import estimate_tokens
+
+# 进程内共享：后端每个请求都会新建客户端，合并必须跨实例生效
+llm_flight = SingleFlight()
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    进程级共享的 Provider 速率限制 (预算见 settings.<PROVIDER>_RPM / _TPM)。
+    每次 create_client 都返回同一个实例，批处理任务与前端触发的分析共用配额。
+    """
+    from core.config import settings
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            prefix = {"local": "LOCAL_LLM"}.get(provider, provider.upper())
+            limiter = RateLimiter(rpm=getattr(settings, f"{prefix}_RPM", 0), tpm=getattr(settings, f"{prefix}_TPM", 0))
+            _rate_limiters[provider] = limiter
+        return limiter
+
+# 进程内共享的 SDK 客户端 (连接池)：后端每个请求都会新建 OpenAIClient，
+# 若各自持有连接池，每次分析都要重新建立 TCP / TLS 连接
+_sync_clients: Dict[tuple, OpenAI] = {}
+# 异步连接池绑定创建它的事件循环 (CLI / 测试中每次 asyncio.run 都是新的循环)，按循环分别缓存
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_detached_async_clients: Dict[tuple, AsyncOpenAI] = {}
+_sdk_clients_lock = threading.Lock()
+
+def _http_client_kwargs(base_url: str) -> Dict[str, Any]:
+    """
+    连接池参数 (见 settings.LLM_HTTP_*)。LLM 请求间隔常常超过 httpx 默认的 5 秒 keep-alive，
+    调大后批量任务基本不再重复握手；https 端点在安装了 h2 时启用 HTTP/2 (不支持的服务端由 ALPN 回退到 HTTP/1.1)。
+    openai SDK 不基于 httpx 时 (或未安装 httpx) 使用 SDK 默认参数。
+    """
+    from core.config import settings
+    if httpx is None or not issubclass(DefaultHttpxClient, httpx.Client):
+        return {}
+    kwargs = {"limits": httpx.Limits(max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                                     max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                                     keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY)}
+    if settings.LLM_HTTP2 and (base_url or "").startswith("https://") and importlib.util.find_spec("h2"):
+        kwargs["http2"] = True
+    return kwargs
+
+def get_sync_client(api_key: str, base_url: str) -> OpenAI:
+    """进程级共享的同步 SDK 客户端 (按 endpoint 与 API Key 区分，模型是请求参数，不影响连接)"""
+    key = (base_url, api_key)
+    with _sdk_clients_lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url,
+                            http_client=DefaultHttpxClient(**_http_client_kwargs(base_url)))
+            _sync_clients[key] = client
+        return client
+
+def get_async_client(api_key: str, base_url: str, max_retries: Optional[int] = None) -> AsyncOpenAI:
+    """当前事件循环内共享的异步 SDK 客户端；max_retries 不同的副本共用同一连接池"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _sdk_clients_lock:
+        if loop is not None and loop not in _async_clients:
+            # 已结束的事件循环的连接池不会再被使用 (其中的连接仍引用旧循环，需主动丢弃)
+            for closed in [l for l in _async_clients if l.is_closed()]:
+                del _async_clients[closed]
+        clients = _async_clients.setdefault(loop, {}) if loop is not None else _detached_async_clients
+        client = clients.get((base_url, api_key, max_retries))
+        if client is None:
+            base = clients.get((base_url, api_key, None))
+            if base is None:
+                base = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                   http_client=DefaultAsyncHttpxClient(**_http_client_kwargs(base_url)))
+                clients[(base_url, api_key, None)] = base
+            client = base if max_retries is None else base.with_options(max_retries=max_retries)
+            clients[(base_url, api_key, max_retries)] = client
+        return client
+
+def close_sync_clients():
+    """关闭共享的同步连接池 (进程退出前调用；异步连接池随事件循环释放)"""
+    with _sdk_clients_lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        client.close()
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+
+def usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage else None
+
+def record_usage(model: str, response_usage, estimated_prompt: int, content: Optional[str], started: float):
+    """记录一次成功调用的用量 (服务端未返回 usage 时按字数估算)"""
+    prompt_tokens = getattr(response_usage, "prompt_tokens", None)
+    completion_tokens = getattr(response_usage, "completion_tokens", None)
+    estimated = prompt_tokens is None or completion_tokens is None
+    if estimated:
+        prompt_tokens, completion_tokens = estimated_prompt, estimate_tokens(content or "")
+    usage.record_call(model, prompt_tokens, completion_tokens, time.monotonic() - started, estimated=estimated)
+
+def request_key(base_url: str, model: str, messages: List[Dict[str, str]], temperature: float,
+                api_key: Optional[str] = None) -> str:
+    """相同凭据 / endpoint / 模型 / 消息 / 温度的请求视为同一请求 (不同 API Key 的调用者不合并，各自计费与限流)"""
+    payload = json.dumps([api_key, base_url, model, messages, temperature], ensure_ascii=False, sort_keys=True)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
 
 class LLMClient(ABC):
     """LLM 客户端抽象基类"""
@@ -15,22 +138,62 @@ class LLMClient(ABC):
         pass
 
 class OpenAIClient(LLMClient):
-    """基于 OpenAI SDK 的通用客户端 (支持 OpenRouter, Local, DeepSeek 等)"""
-    def __init__(self, api_key: str, base_url: str, model: str):
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
-        self.async_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    """
+    基于 OpenAI SDK 的通用客户端 (支持 OpenRouter, Local, DeepSeek 等)
+    完全相同的并发请求 (如多个用户同时触发同一分析) 只发送一次，共享响应。
+    底层的 SDK 客户端与连接池在进程内共享 (见 get_sync_client / get_async_client)，
+    首次调用同步 / 异步接口时才创建，因此每个请求新建 OpenAIClient 的开销可以忽略。
+    """
+    def __init__(self, api_key: str, base_url: str, model: str, rate_limiter: Optional[RateLimiter] = None):
+        self.api_key = api_key
+        self.base_url = base_url
         self.model = model
+        self.rate_limiter = rate_limiter
+        self.limiter: Optional[AdaptiveLimiter] = None
+        self.congestion_retries = 0
+        self._max_retries: Optional[int] = None
+
+    @property
+    def client(self) -> OpenAI:
+        return get_sync_client(self.api_key, self.base_url)
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return get_async_client(self.api_key, self.base_url, self._max_retries)
+
+    def attach_limiter(self, limiter: AdaptiveLimiter, congestion_retries: int = 5):
+        """
+        启用自适应并发控制 (仅异步接口)。
+        429 / 超时交由 limiter 处理并在此重试，因此关闭 SDK 自带的重试，
+        否则 limiter 看不到被 SDK 吞掉的限流信号。
+        """
+        self.limiter = limiter
+        self.congestion_retries = congestion_retries
+        self._max_retries = 0
 
     def chat_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        key = request_key(self.base_url, self.model, messages, temperature, self.api_key)
+        return llm_flight.do(key, lambda: self._chat_completion(messages, temperature))[0]
+
+    def _chat_completion(self, messages: List[Dict[str, str]], temperature: float) -> str:
+        estimated = estimate_messages_tokens(messages)
+        if self.rate_limiter:
+            self.rate_limiter.acquire(estimated)
+        started = time.monotonic()
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature
             )
-            return response.choices[0].message.content
+            if self.rate_limiter:
+                self.rate_limiter.settle(estimated, usage_tokens(response))
+            content = response.choices[0].message.content
+            record_usage(self.model, response.usage, estimated, content, started)
+            return content
         except Exception as e:
             print(f"LLM 同步调用失败: {e}")
+            usage.record_call(self.model, 0, 0, time.monotonic() - started, error=e)
             raise e
 
     def generate(self, prompt: str) -> str:
@@ -38,38 +201,189 @@ class OpenAIClient(LLMClient):
         return self.chat_completion([{"role": "user", "content": prompt}])
 
     async def chat_completion_async(self, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        key = request_key(self.base_url, self.model, messages, temperature, self.api_key)
+        return (await llm_flight.do_async(key, lambda: self._chat_completion_async(messages, temperature)))[0]
+
+    async def _chat_completion_async(self, messages: List[Dict[str, str]], temperature: float) -> str:
+        return await self._with_limiter(lambda: self._request_async(messages, temperature),
+                                        estimate_messages_tokens(messages))
+
+    async def _with_limiter(self, request: Callable[[], Awaitable[Any]], estimated_tokens: int = 0) -> Any:
+        """
+        在自适应并发控制下执行请求，429 / 超时时按 limiter 的节奏重试。
+        每次尝试先等待 RPM / TPM 预算，再占用并发槽位：等待速率预算时不占槽位，
+        也不计入 limiter 观测到的请求耗时。
+        """
+        for attempt in range(self.congestion_retries + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async(estimated_tokens)
+            if self.limiter is None:
+                return await request()
+
+            started_at = await self.limiter.acquire()
+            try:
+                result = await request()
+            except Exception as e:
+                congested, retry_after = classify_error(e)
+                await self.limiter.release(started_at, "congestion" if congested else "error", retry_after)
+                if congested and attempt < self.congestion_retries:
+                    usage.record_retry(self.model)
+                    wait = f"，{retry_after:.0f}s 后重试" if retry_after else ""
+                    print(f"[Limiter] 触发限流，并发降至 {self.limiter.limit}{wait} ... ", end="", flush=True)
+                    continue
+                raise
+            await self.limiter.release(started_at, "success")
+            return result
+
+    async def _request_async(self, messages: List[Dict[str, str]], temperature: float) -> str:
+        """单次请求 (速率预算已由 _with_limiter 预留)"""
+        estimated = estimate_messages_tokens(messages)
+        started = time.monotonic()
         try:
             response = await self.async_client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature
             )
-            return response.choices[0].message.content
+            if self.rate_limiter:
+                self.rate_limiter.settle(estimated, usage_tokens(response))
+            content = response.choices[0].message.content
+            record_usage(self.model, response.usage, estimated, content, started)
+            return content
         except Exception as e:
             print(f"LLM 异步调用失败: {e}")
+            usage.record_call(self.model, 0, 0, time.monotonic() - started, error=e)
+            raise e
+
+    async def chat_completion_stream(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                                     on_event: Optional[EventCallback] = None) -> Any:
+        """
+        流式调用并增量解析 JSON，返回解析后的对象。
+        每个字段 / 数组元素解析完成时回调 on_event (见 streaming.EventCallback)，
+        截断 (finish_reason=length、连接中断、超过 LLM_STREAM_IDLE_TIMEOUT 没有新内容) 或 JSON 结构错误时
+        立即抛出 StreamError，不必等待完整响应。
+        流式请求不做请求合并 (各调用方需要各自的增量回调)。
+        """
+        return await self._with_limiter(lambda: self._stream_async(messages, temperature, on_event),
+                                        estimate_messages_tokens(messages))
+
+    async def _stream_async(self, messages: List[Dict[str, str]], temperature: float,
+                            on_event: Optional[EventCallback]) -> Any:
+        from core.config import settings
+        estimated = estimate_messages_tokens(messages)
+        stripper = ThinkStripper()
+        parser = IncrementalJSONParser(on_event)
+        response_usage, finish_reason = None, None
+        started = time.monotonic()
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            try:
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), settings.LLM_STREAM_IDLE_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise TruncatedResponseError(f"超过 {settings.LLM_STREAM_IDLE_TIMEOUT}s 没有收到新内容")
+                    response_usage = getattr(chunk, "usage", None) or response_usage
+                    for choice in chunk.choices or []:
+                        if choice.delta and choice.delta.content:
+                            parser.feed(stripper.feed(choice.delta.content))
+                        finish_reason = choice.finish_reason or finish_reason
+                    # JSON 完整之后的内容 (说明文字等) 会被忽略，但仍读完以获取 usage
+                    if finish_reason == "length" and not parser.done:
+                        raise TruncatedResponseError("输出达到长度上限 (finish_reason=length)")
+            finally:
+                await stream.close()
+            parser.feed(stripper.flush())
+            result = parser.finish()
+            if self.rate_limiter:
+                self.rate_limiter.settle(estimated, getattr(response_usage, "total_tokens", None))
+            record_usage(self.model, response_usage, estimated, parser.text, started)
+            return result
+        except Exception as e:
+            print(f"LLM 流式调用失败: {e}")
+            usage.record_call(self.model, 0, 0, time.monotonic() - started, error=e)
             raise e
 
 class ClientFactory:
     """工厂类，用于创建不同类型的 LLM 客户端"""
     @staticmethod
     def create_client(provider: str, **kwargs) -> LLMClient:
+        from core.config import settings
         if provider == "local":
-            return OpenAIClient(
-                api_key="lm-studio", # 本地通常不需要真实 Key
-                base_url=kwargs.get("base_url", "http://localhost:1234/v1"),
-                model=kwargs.get("model", "local-model")
-            )
+            api_key = "lm-studio" # 本地通常不需要真实 Key
+            base_url = kwargs.get("base_url", "http://localhost:1234/v1")
+            model = kwargs.get("model", "local-model")
         elif provider == "openrouter":
-            return OpenAIClient(
-                api_key=kwargs.get("api_key"),
-                base_url="https://openrouter.ai/api/v1",
-                model=kwargs.get("model", "openai/gpt-3.5-turbo")
-            )
+            api_key = kwargs.get("api_key")
+            base_url = "https://openrouter.ai/api/v1"
+            model = kwargs.get("model", "openai/gpt-3.5-turbo")
         elif provider == "deepseek":
-            return OpenAIClient(
-                api_key=kwargs.get("api_key"),
-                base_url="https://api.deepseek.com",
-                model=kwargs.get("model", "deepseek-chat")
-            )
+            api_key = kwargs.get("api_key")
+            base_url = "https://api.deepseek.com"
+            model = kwargs.get("model", "deepseek-chat")
         else:
             raise ValueError(f"不支持的 Provider: {provider}")
+
+        if settings.LLM_REPLAY_URL:
+            # 离线回放：所有 Provider 都指向 Mock 服务 (scripts/mock_llm_server.py)，模型名保持不变以便命中录制的缓存
+            api_key = api_key or "replay"
+            base_url = settings.LLM_REPLAY_URL
+
+        return OpenAIClient(
+            api_key=api_key,
+            base_url=base_url,
+            model=model,
+            rate_limiter=get_rate_limiter(provider)
+        )
+
+    @staticmethod
+    def settings_kwargs(provider: str) -> Dict[str, Any]:
+        """从配置中读取某个 Provider 的连接参数 (用于构建备用 Provider)"""
+        from core.config import settings
+        if provider == "local":
+            return {"base_url": settings.LOCAL_LLM_BASE_URL, "model": settings.LOCAL_LLM_MODEL}
+        if provider == "openrouter":
+            return {"api_key": settings.OPENROUTER_API_KEY, "model": settings.OPENROUTER_MODEL}
+        if provider == "deepseek":
+            return {"api_key": settings.DEEPSEEK_API_KEY, "model": settings.DEEPSEEK_MODEL}
+        raise ValueError(f"不支持的 Provider: {provider}")
+
+    @staticmethod
+    def create_with_failover(provider: str, fallbacks: Optional[List[str]] = None, **kwargs) -> LLMClient:
+        """
+        创建带故障转移的客户端：主 Provider 使用传入参数，备用 Provider 使用配置中的参数。
+        fallbacks 默认取 LLM_FAILOVER_PROVIDERS；没有可用的备用 Provider 时直接返回主客户端。
+        """
+        from core.config import settings
+        from core.summarizer.failover import FailoverClient
+
+        if fallbacks is None:
+            fallbacks = [p.strip() for p in settings.LLM_FAILOVER_PROVIDERS.split(",") if p.strip()]
+        clients = [(provider, ClientFactory.create_client(provider, **kwargs))]
+        for name in fallbacks:
+            if name == provider:
+                continue
+            fallback_kwargs = ClientFactory.settings_kwargs(name)
+            if name != "local" and not fallback_kwargs.get("api_key") and not settings.LLM_REPLAY_URL:
+                print(f"[Failover] 未配置 {name} 的 API Key，跳过该备用 Provider")
+                continue
+            clients.append((name, ClientFactory.create_client(name, **fallback_kwargs)))
+
+        if len(clients) == 1:
+            return clients[0][1]
+        return FailoverClient(
+            clients,
+            hedge=settings.LLM_HEDGE_REQUESTS,
+            hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY,
+            failure_threshold=settings.LLM_BREAKER_FAILURES,
+            cooldown=settings.LLM_BREAKER_COOLDOWN,
+        )
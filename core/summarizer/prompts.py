@@ -1,9 +1,14 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import hashlib
 
 class Prompts:
     """Prompt 模板管理"""
+
+    # 总结流程版本，计入 Prompt 哈希：流程改变 "一条总结覆盖什么内容" 时递增，使旧缓存失效
+    #   1: 正文截断至前 4000 字
+    #   2: 长章节分块总结整章正文后合并
+    SUMMARIZER_VERSION = 2
     
     SYSTEM_PROMPT = """你是一个专业的文学分析师。你的任务是对给定的小说章节进行总结，并提取其中的关键实体。
 请遵循以下规则，涵盖小说的三要素（人物、情节、环境）：
@@ -59,12 +64,31 @@ class Prompts:
         {{"source": "李四", "relation": "持有", "target": "青云剑", "description": "随身佩戴"}}
     ]
 }}
+"""
+
+    PACKED_USER_PROMPT_TEMPLATE = """请分别总结以下 {count} 个连续的小说章节，并基于“小说三要素”分别提取每一章的实体与关系。
+各章独立总结，不要把一章的内容写进另一章。
+
+{chapters}
+
+请输出 JSON 数组，按章节顺序每章一个对象，chapter_index 为章节序号 (从 1 开始)，其余字段与单章总结相同，例如：
+[
+    {{"chapter_index": 1, "headline": "...", "summary_sentences": ["..."], "entities": [...], "relationships": [...]}},
+    {{"chapter_index": 2, "headline": "...", "summary_sentences": ["..."], "entities": [...], "relationships": [...]}}
+]
+"""
+
+    PACKED_CHAPTER_TEMPLATE = """### 第 {index} 章
+标题：{title}
+内容：
+{content}
 """
 
     @classmethod
     def get_prompt_hash(cls) -> str:
-        """计算 Prompt 模板的哈希值，用于缓存校验"""
-        content = cls.SYSTEM_PROMPT + cls.USER_PROMPT_TEMPLATE
+        """计算 Prompt 模板的哈希值，用于缓存校验 (打包总结的结果同样按章缓存，其模板一并计入)"""
+        content = (f"v{cls.SUMMARIZER_VERSION}" + cls.SYSTEM_PROMPT + cls.USER_PROMPT_TEMPLATE
+                   + cls.PACKED_USER_PROMPT_TEMPLATE + cls.PACKED_CHAPTER_TEMPLATE)
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
     @staticmethod
@@ -76,6 +100,18 @@ class Prompts:
             {"role": "user", "content": Prompts.USER_PROMPT_TEMPLATE.format(title=title, content=content)}
         ]
 
+    @staticmethod
+    def get_packed_summary_prompt(chapters: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        """生成多章打包总结的 Prompt (chapters 为 [(标题, 正文), ...])，共用单章的 System Prompt"""
+        sections = "\n".join(
+            Prompts.PACKED_CHAPTER_TEMPLATE.format(index=i, title=title, content=content)
+            for i, (title, content) in enumerate(chapters, 1)
+        )
+        return [
+            {"role": "system", "content": Prompts.SYSTEM_PROMPT},
+            {"role": "user", "content": Prompts.PACKED_USER_PROMPT_TEMPLATE.format(count=len(chapters), chapters=sections)}
+        ]
+
     SEGMENT_SYSTEM_PROMPT = """你是一个专业的小说编辑。你的任务是将一系列连续章节的摘要合并为一个连贯的“剧情段落梗概”。
 请遵循以下规则：
 1. **高度概括**: 不要流水账式地罗列每章内容，而是提炼出这一段剧情的核心冲突、转折和结果。
@@ -0,0 +1,176 @@
+import json
+from typing import Any, Callable, List, Optional
+
+
+class StreamError(Exception):
+    """流式响应无法得到完整 JSON (由调用方重试)"""
+
+
+class TruncatedResponseError(StreamError):
+    """响应被截断 (finish_reason=length、连接中断或长时间没有新内容)"""
+
+
+class MalformedStreamError(StreamError):
+    """响应的 JSON 结构错误，不必等到结束即可判定"""
+
+
+class ThinkStripper:
+    """流式去除 <think>...</think>，标签被拆在两个分片之间时也能识别"""
+
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        out = []
+        while True:
+            tag = self.CLOSE if self._inside else self.OPEN
+            idx = self._buffer.find(tag)
+            if idx != -1:
+                if not self._inside:
+                    out.append(self._buffer[:idx])
+                self._buffer = self._buffer[idx + len(tag):]
+                self._inside = not self._inside
+                continue
+            # 末尾可能是半个标签，留到下一个分片
+            keep = 0
+            for k in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+                if tag.startswith(self._buffer[-k:]):
+                    keep = k
+                    break
+            if not self._inside:
+                out.append(self._buffer[:len(self._buffer) - keep])
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            return "".join(out)
+
+    def flush(self) -> str:
+        rest = "" if self._inside else self._buffer
+        self._buffer = ""
+        return rest
+
+
+# on_event(kind, key, value):
+#   ("field", key, value)  顶层对象的一个字段解析完成 (如 headline)
+#   ("item", key, value)   顶层对象中数组字段的一个元素完成 (如 entities 的一个实体)；顶层为数组时 key 为 None
+#   ("done", None, value)  整个 JSON 解析完成
+EventCallback = Callable[[str, Optional[str], Any], None]
+
+
+class IncrementalJSONParser:
+    """
+    增量解析 LLM 输出的第一个 JSON 值 (对象或数组)。
+    逐字符跟踪括号 / 字符串状态，字段或数组元素一结束就解析并通过 on_event 回调，
+    括号不匹配、字段无法解析时立即抛出 MalformedStreamError。
+    JSON 之前的说明文字 / markdown 代码块标记会被跳过，之后的内容被忽略。
+    """
+
+    def __init__(self, on_event: Optional[EventCallback] = None):
+        self.on_event = on_event
+        self.text = ""
+        self.value: Any = None
+        self.done = False
+        self.fields = {}
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+        self._item_start = 0
+        self._key: Optional[str] = None
+
+    def _emit(self, kind: str, key: Optional[str], value: Any):
+        if self.on_event:
+            self.on_event(kind, key, value)
+
+    def _in_items(self) -> bool:
+        # 需要逐个回调元素的数组：顶层数组，或顶层对象的数组字段
+        stack = self._stack
+        return bool(stack) and stack[-1] == "[" and (len(stack) == 1 or (len(stack) == 2 and stack[0] == "{"))
+
+    def _finish_item(self, end: int):
+        segment = self.text[self._item_start:end].strip()
+        self._item_start = end + 1
+        if not segment:
+            return
+        try:
+            item = json.loads(segment)
+        except json.JSONDecodeError as e:
+            raise MalformedStreamError(f"数组元素无法解析: {segment[:80]}") from e
+        self._emit("item", self._key if len(self._stack) == 2 else None, item)
+
+    def _finish_member(self, end: int):
+        segment = self.text[self._member_start:end].strip()
+        self._member_start = end + 1
+        self._key = None
+        if not segment:
+            return
+        try:
+            member = json.loads("{" + segment + "}")
+        except json.JSONDecodeError as e:
+            raise MalformedStreamError(f"字段无法解析: {segment[:80]}") from e
+        for key, value in member.items():
+            self.fields[key] = value
+            self._emit("field", key, value)
+
+    def feed(self, chunk: str):
+        for c in chunk:
+            if self.done:
+                return
+            if not self._stack and not self.text:
+                if c not in "{[":
+                    continue
+            self.text += c
+            pos = len(self.text) - 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                continue
+
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._stack.append(c)
+                if len(self._stack) == 1:
+                    self._member_start = self._item_start = pos + 1
+                elif self._in_items():
+                    self._item_start = pos + 1
+            elif c in "}]":
+                if not self._stack or {"}": "{", "]": "["}[c] != self._stack[-1]:
+                    raise MalformedStreamError(f"括号不匹配: {self.text[-80:]}")
+                if self._in_items():
+                    self._finish_item(pos)
+                if len(self._stack) == 1 and self._stack[0] == "{":
+                    self._finish_member(pos)
+                self._stack.pop()
+                if not self._stack:
+                    try:
+                        self.value = json.loads(self.text)
+                    except json.JSONDecodeError as e:
+                        raise MalformedStreamError(f"JSON 无法解析: {e}") from e
+                    self.done = True
+                    self._emit("done", None, self.value)
+            elif c == ",":
+                if self._in_items():
+                    self._finish_item(pos)
+                elif len(self._stack) == 1 and self._stack[0] == "{":
+                    self._finish_member(pos)
+            elif c == ":" and len(self._stack) == 1 and self._stack[0] == "{" and self._key is None:
+                try:
+                    self._key = json.loads(self.text[self._member_start:pos].strip())
+                except json.JSONDecodeError as e:
+                    raise MalformedStreamError(f"字段名无法解析: {self.text[self._member_start:pos][:80]}") from e
+
+    def finish(self) -> Any:
+        """流结束时调用：JSON 未完整结束视为截断"""
+        if not self.done:
+            if not self.text:
+                raise MalformedStreamError("响应中没有 JSON")
+            raise TruncatedResponseError(f"JSON 未完整结束 (已接收 {len(self.text)} 字符)")
+        return self.value
@@ -0,0 +1,141 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+# 当前上下文中生效的统计器 (可嵌套，如 "整次任务" 与 "单个关系对" 同时统计)。
+# asyncio 任务创建时复制上下文；线程池需用 contextvars.copy_context().run 提交才能继承
+_active_trackers: contextvars.ContextVar[Tuple["UsageTracker", ...]] = contextvars.ContextVar(
+    "llm_usage_trackers", default=())
+
+
+def parse_pricing(spec: str) -> Dict[str, Tuple[float, float]]:
+    """
+    解析模型单价 (美元 / 百万 Token):
+      "google/gemini-2.0-flash-001=0.1:0.4,deepseek-chat=0.27:1.1" -> {模型: (输入单价, 输出单价)}
+    """
+    pricing = {}
+    for item in (spec or "").split(","):
+        model, _, prices = item.strip().rpartition("=")
+        if not model:
+            continue
+        prompt_price, _, completion_price = prices.partition(":")
+        try:
+            pricing[model.strip()] = (float(prompt_price), float(completion_price or prompt_price))
+        except ValueError:
+            print(f"[Usage] 无法解析模型单价: {item}")
+    return pricing
+
+
+class UsageTracker:
+    """
+    统计一次运行 / 一个任务内所有 LLM 调用的 Token、耗时、重试与错误 (线程安全)。
+    通过 track_usage() 限定作用范围，OpenAIClient 的每次调用都会记录到当前上下文中的统计器。
+    """
+
+    def __init__(self, pricing: Optional[Dict[str, Tuple[float, float]]] = None, latency_window: int = 10000):
+        if pricing is None:
+            from core.config import settings
+            pricing = parse_pricing(settings.LLM_PRICING)
+        self.pricing = pricing
+        self.started = time.monotonic()
+        self.models: Dict[str, Dict[str, int]] = {}
+        self.errors_by_type: Dict[str, int] = {}
+        self.latency_total = 0.0
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def _model(self, model: str) -> Dict[str, int]:
+        counters = self.models.get(model)
+        if counters is None:
+            counters = self.models[model] = {"calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0,
+                                             "completion_tokens": 0, "estimated_calls": 0}
+        return counters
+
+    def record_call(self, model: str, prompt_tokens: int, completion_tokens: int, latency: float,
+                    error: Optional[BaseException] = None, estimated: bool = False):
+        with self._lock:
+            counters = self._model(model)
+            counters["calls"] += 1
+            self.latency_total += latency
+            self._latencies.append(latency)
+            if error is not None:
+                counters["errors"] += 1
+                name = type(error).__name__
+                self.errors_by_type[name] = self.errors_by_type.get(name, 0) + 1
+                return
+            counters["prompt_tokens"] += prompt_tokens or 0
+            counters["completion_tokens"] += completion_tokens or 0
+            if estimated:
+                counters["estimated_calls"] += 1
+
+    def record_retry(self, model: str):
+        with self._lock:
+            self._model(model)["retries"] += 1
+
+    def _cost(self, model: str, counters: Dict[str, int]) -> Optional[float]:
+        price = self.pricing.get(model)
+        if price is None:
+            return None
+        return (counters["prompt_tokens"] * price[0] + counters["completion_tokens"] * price[1]) / 1e6
+
+    def summary(self, chapters: Optional[int] = None) -> Dict:
+        """
+        汇总结果 (写入 run_metadata.json 的 "usage" 字段 / 任务结果)。
+        chapters 为本次实际调用 LLM 总结的章节数，提供时计算每章 Token 与每分钟章节数。
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            latencies = sorted(self._latencies)
+            by_model = {}
+            for model, counters in self.models.items():
+                by_model[model] = {**counters, "total_tokens": counters["prompt_tokens"] + counters["completion_tokens"],
+                                   "cost_usd": self._cost(model, counters)}
+            errors_by_type = dict(self.errors_by_type)
+            latency_total = self.latency_total
+
+        totals = {key: sum(m[key] for m in by_model.values())
+                  for key in ("calls", "errors", "retries", "prompt_tokens", "completion_tokens", "total_tokens",
+                              "estimated_calls")}
+        costs = [m["cost_usd"] for m in by_model.values() if m["cost_usd"] is not None]
+        percentile = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+        result = {
+            **totals,
+            "cost_usd": round(sum(costs), 6) if costs else None,
+            "elapsed_seconds": round(elapsed, 3),
+            "avg_latency_seconds": round(latency_total / totals["calls"], 3) if totals["calls"] else None,
+            "p50_latency_seconds": percentile(0.5),
+            "p95_latency_seconds": percentile(0.95),
+            "calls_per_minute": round(totals["calls"] * 60 / elapsed, 2) if elapsed > 0 else None,
+            "errors_by_type": errors_by_type,
+            "by_model": by_model,
+        }
+        if chapters is not None:
+            result["chapters"] = chapters
+            result["tokens_per_chapter"] = round(totals["total_tokens"] / chapters, 1) if chapters else None
+            result["chapters_per_minute"] = round(chapters * 60 / elapsed, 2) if elapsed > 0 else None
+        return result
+
+
+@contextmanager
+def track_usage(tracker: Optional[UsageTracker] = None) -> Iterator[UsageTracker]:
+    """在 with 块内 (含其中创建的 asyncio 任务) 把 LLM 调用记录到 tracker"""
+    tracker = tracker or UsageTracker()
+    token = _active_trackers.set(_active_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _active_trackers.reset(token)
+
+
+def record_call(model: str, prompt_tokens: int, completion_tokens: int, latency: float,
+                error: Optional[BaseException] = None, estimated: bool = False):
+    for tracker in _active_trackers.get():
+        tracker.record_call(model, prompt_tokens, completion_tokens, latency, error, estimated)
+
+
+def record_retry(model: str):
+    for tracker in _active_trackers.get():
+        tracker.record_retry(model)
@@ -20,6 +20,25 @@ def calculate_file_hash(file_path: str, algorithm: str = 'md5') -> str:
     except FileNotFoundError:
         return "unknown_hash"
 
+def calculate_content_hash(content: str) -> str:
+    """
+    计算文本内容的哈希值 (MD5，UTF-8 编码)。
+    与 CacheManager 对章节内容的哈希方式一致，可作为章节正文的内容地址。
+    """
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 Token 数 (不依赖具体分词器)。
+    中日韩字符及全角标点按 1 字 1 Token 计，其余字符按 4 字符 1 Token 计。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
 def extract_line_by_match(match, content, match_type):
     """
     根据正则匹配结果提取整行内容，并将中文数字转换为阿拉伯数字。
@@ -37,6 +37,7 @@ class Chapter(BaseModel):
     volume_title: Optional[str] = Field(None, description="所属分卷标题 (可选)")
     content: str = Field(..., description="章节完整文本")
     word_count: int = Field(..., description="字数")
+    content_hash: Optional[str] = Field(None, description="正文 MD5 (分割时计算一次，用作缓存键与去重标识)")
 
 class BookStructure(BaseModel):
     """整书结构模型"""
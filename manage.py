@@ -17,6 +17,49 @@ def clean_cache():
     else:
         print("Cache directory does not exist.")
 
+def migrate_cache(delete: bool = False):
+    """把旧格式的 .cache/*.json 导入 SQLite 缓存"""
+    from core.cache_manager import migrate_json_cache
+    cache_dir = settings.OUTPUT_DIR / ".cache"
+    if not cache_dir.exists():
+        print("Cache directory does not exist.")
+        return
+    count = migrate_json_cache(str(cache_dir), delete=delete)
+    print(f"Done. Imported {count} entries.")
+
+def cache_stats():
+    """查看 LLM 缓存统计"""
+    from datetime import datetime
+    from core.cache_manager import CacheManager
+    cache = CacheManager(str(settings.OUTPUT_DIR / ".cache"))
+    stats = cache.stats()
+    cache.close()
+
+    def fmt(ts):
+        return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "-"
+
+    print("=== Cache Stats ===")
+    print(f"Backend: {stats['backend']}")
+    print(f"Entries: {stats['entries']} ({stats['total_bytes'] / 1e6:.1f} MB)")
+    print(f"Total Hits: {stats['total_hits']}")
+    print(f"Oldest Access: {fmt(stats['oldest_access'])}")
+    print(f"Newest Access: {fmt(stats['newest_access'])}")
+    print(f"Active Runs: {stats['active_leases']} (protecting {stats['leased_keys']} entries)")
+    budget = f"{settings.CACHE_MAX_SIZE_MB} MB" if settings.CACHE_MAX_SIZE_MB else "unlimited"
+    age = f"{settings.CACHE_MAX_AGE_DAYS} days" if settings.CACHE_MAX_AGE_DAYS else "unlimited"
+    print(f"Budget: size {budget}, age {age}, policy {settings.CACHE_EVICTION_POLICY}")
+
+def cache_trim(max_size_mb=None, max_age_days=None, policy=None, dry_run=False):
+    """按体积 / 时间预算淘汰 LLM 缓存 (跳过正在运行的分析所用的条目)"""
+    from core.cache_manager import CacheManager
+    cache = CacheManager(str(settings.OUTPUT_DIR / ".cache"))
+    max_bytes = max_size_mb * 1024 * 1024 if max_size_mb is not None else None
+    max_age = max_age_days * 86400 if max_age_days is not None else None
+    evicted, freed = cache.trim(max_bytes, max_age, policy, dry_run=dry_run)
+    cache.close()
+    action = "Would evict" if dry_run else "Evicted"
+    print(f"{action} {evicted} entries ({freed / 1e6:.1f} MB).")
+
 def clean_outputs():
     """清理所有输出文件"""
     output_dir = settings.OUTPUT_DIR
@@ -126,6 +169,14 @@ def main():
     subparsers = parser.add_subparsers(dest='command', help='Commands')
     
     subparsers.add_parser('clean-cache', help='Clear the .cache directory')
+    migrate_parser = subparsers.add_parser('cache-migrate', help='Import legacy .cache/*.json files into the SQLite cache')
+    migrate_parser.add_argument('--delete', action='store_true', help='Delete JSON files after import')
+    subparsers.add_parser('cache-stats', help='Show LLM cache size, age and active runs')
+    trim_parser = subparsers.add_parser('cache-trim', help='Evict LLM cache entries over the size/age budget')
+    trim_parser.add_argument('--max-size-mb', type=int, help='Size budget (default: CACHE_MAX_SIZE_MB)')
+    trim_parser.add_argument('--max-age-days', type=float, help='Evict entries not accessed for N days (default: CACHE_MAX_AGE_DAYS)')
+    trim_parser.add_argument('--policy', choices=['lru', 'lfu'], help='Eviction policy (default: CACHE_EVICTION_POLICY)')
+    trim_parser.add_argument('--dry-run', action='store_true', help='Only report what would be evicted')
     subparsers.add_parser('clean-all', help='Clear ALL outputs')
     subparsers.add_parser('clean-groups', help='Clear Entity Group Summary cache only') # Added
     subparsers.add_parser('reset-db', help='Delete and recreate SQLite database')
@@ -138,6 +189,12 @@ def main():
     
     if args.command == 'clean-cache':
         clean_cache()
+    elif args.command == 'cache-migrate':
+        migrate_cache(args.delete)
+    elif args.command == 'cache-stats':
+        cache_stats()
+    elif args.command == 'cache-trim':
+        cache_trim(args.max_size_mb, args.max_age_days, args.policy, args.dry_run)
     elif args.command == 'clean-groups':
         clean_group_summaries()
     elif args.command == 'clean-all':
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from core.db.models import Novel, NovelVersion, AnalysisRun, Chapter, ChapterText
+from core.db.text_store import ChapterTextStore
+from core.db.compression import default_codec
+
+VOCABULARY = ["张三", "李四", "青云门", "长老", "师兄", "剑气", "山门", "灵石", "突破", "修炼", "大殿",
+              "缓缓", "说道", "忽然", "只见", "一道", "身影", "出现", "在", "了", "的", "，", "。", "！"]
+
+
+def synthetic_chapters(count: int, length: int):
+    """生成随机组合词汇的章节正文 (比重复文本更接近真实小说的压缩率)"""
+    rng = random.Random(42)
+    return [''.join(rng.choice(VOCABULARY) for _ in range(length // 2)) for _ in range(count)]
+
+
+def load_chapters(input_file: str):
+    from core.splitter.processor import Splitter
+    splitter = Splitter()
+    return [c.content for c in splitter.split_by_chapter(splitter.read_file(input_file))]
+
+
+def build_db(db_path: str, contents, runs: int, layout: str):
+    engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        novel = Novel(name="benchmark")
+        session.add(novel)
+        session.commit()
+        version = NovelVersion(novel_id=novel.id, hash="bench")
+        session.add(version)
+        session.commit()
+        for r in range(runs):
+            run = AnalysisRun(version_id=version.id, timestamp=f"2026010{r}_000000")
+            session.add(run)
+            session.commit()
+            for i, content in enumerate(contents, start=1):
+                if layout == "inline":
+                    chapter = Chapter(run_id=run.id, chapter_index=i, title=f"第{i}章", content=content)
+                elif layout == "blob":
+                    # 内容寻址但不压缩 (upgrade_db_v4 的格式)
+                    content_hash = ChapterTextStore.put(session, content)
+                    blob = session.get(ChapterText, content_hash)
+                    blob.content, blob.data, blob.codec, blob.word_count = content, None, None, None
+                    chapter = Chapter(run_id=run.id, chapter_index=i, title=f"第{i}章", content_hash=content_hash)
+                else:
+                    chapter = Chapter(run_id=run.id, chapter_index=i, title=f"第{i}章",
+                                      content_hash=ChapterTextStore.put(session, content), word_count=len(content))
+                session.add(chapter)
+            session.commit()
+    engine.dispose()
+
+
+def measure(db_path: str, rounds: int):
+    """返回 (列表接口耗时, 详情接口耗时)，均为单次平均秒数"""
+    engine = create_engine(f"sqlite:///{db_path}")
+    list_time = detail_time = 0.0
+    for _ in range(rounds):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            chapters = session.exec(select(Chapter)).all()
+            missing = [c.content_hash for c in chapters if c.word_count is None and not c.content]
+            lengths = ChapterTextStore.get_lengths(session, missing)
+            counts = [c.word_count if c.word_count is not None else (len(c.content) if c.content else lengths.get(c.content_hash, 0))
+                      for c in chapters]
+            list_time += time.perf_counter() - start
+            assert all(counts)
+
+        with Session(engine) as session:
+            ids = [c.id for c in chapters]
+            sample = random.Random(0).sample(ids, min(100, len(ids)))
+            start = time.perf_counter()
+            for chapter_id in sample:
+                chapter = session.get(Chapter, chapter_id)
+                assert ChapterTextStore.get_content(session, chapter)
+            detail_time += (time.perf_counter() - start) / len(sample)
+    engine.dispose()
+    return list_time / rounds, detail_time / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="章节正文存储格式 体积 / 延迟 基准测试")
+    parser.add_argument('-i', '--input', help='使用真实小说 TXT (默认生成随机文本)')
+    parser.add_argument('--chapters', type=int, default=2000, help='合成章节数')
+    parser.add_argument('--length', type=int, default=4000, help='合成章节字数')
+    parser.add_argument('--runs', type=int, default=3, help='同一本书的运行次数')
+    parser.add_argument('--rounds', type=int, default=3, help='延迟测量轮数')
+    args = parser.parse_args()
+
+    contents = load_chapters(args.input) if args.input else synthetic_chapters(args.chapters, args.length)
+    print(f"章节数: {len(contents)}, 运行次数: {args.runs}, 压缩格式: {default_codec()}\n")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        layouts = [("inline", "Chapter.content (原格式)"), ("blob", "ChapterText 未压缩"), ("compressed", "ChapterText 压缩 + word_count")]
+        print(f"{'存储格式':<30}{'数据库体积':>12}{'列表 (ms)':>12}{'详情 (ms)':>12}")
+        for layout, label in layouts:
+            db_path = os.path.join(tmp_dir, f"{layout}.db")
+            build_db(db_path, contents, args.runs, layout)
+            list_time, detail_time = measure(db_path, args.rounds)
+            size_mb = os.path.getsize(db_path) / 1e6
+            print(f"{label:<30}{size_mb:>10.1f}MB{list_time * 1000:>12.1f}{detail_time * 1000:>12.3f}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
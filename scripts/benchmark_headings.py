@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.splitter.headings import HeadingEngine, BUILTIN_RULES, EXTRA_RULES
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "tests", "regression", "data", "heading_corpus.json")
+
+
+def load_corpus(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["cases"]
+
+
+def classify(match):
+    if not match:
+        return None, None
+    return ("volume" if match.group(1) else "chapter"), (match.group(1) or match.group(2))
+
+
+def measure_accuracy(engine: HeadingEngine, cases, extended: bool):
+    """返回 (正确数, 总数, 错误列表)"""
+    errors = []
+    for case in cases:
+        expected = (None, None) if case["extra"] and not extended else (case["expect"], case["title"])
+        actual = classify(engine.pattern.match(case["line"] + "\n"))
+        if actual != expected:
+            errors.append((case["line"], expected, actual))
+    return len(cases) - len(errors), len(cases), errors
+
+
+def build_text(cases, repeat: int) -> str:
+    """把语料中的每一行嵌入正文段落，生成用于吞吐量测试的文本"""
+    paragraph = "　　张三离开了家乡，踏上了旅程。他回头看了一眼青云山，山上云雾缭绕，宛如仙境。\n" * 20
+    block = "".join(case["line"] + "\n" + paragraph for case in cases)
+    return block * repeat
+
+
+def measure_throughput(engine: HeadingEngine, text: str, data: bytes, encoding: str, rounds: int):
+    """返回 (str 扫描 MB/s, 字节扫描 MB/s, 匹配数)"""
+    pattern = engine.pattern
+    head, body = engine.byte_patterns(encoding)
+    size_mb = len(data) / 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        count = sum(1 for _ in pattern.finditer(text))
+    str_speed = size_mb * rounds / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        byte_count = (1 if head.match(data) else 0) + sum(1 for _ in body.finditer(data))
+    byte_speed = size_mb * rounds / (time.perf_counter() - start)
+
+    if count != byte_count:
+        print(f"  ⚠️ str / 字节扫描匹配数不一致: {count} vs {byte_count}")
+    return str_speed, byte_speed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标题规则准确率 / 吞吐量基准测试")
+    parser.add_argument('--corpus', default=CORPUS_PATH, help='标题语料 JSON')
+    parser.add_argument('--repeat', type=int, default=500, help='吞吐量测试文本的重复次数')
+    parser.add_argument('--rounds', type=int, default=3, help='每项测量的轮数')
+    parser.add_argument('--encoding', default='utf-8', help='字节扫描使用的编码')
+    args = parser.parse_args()
+
+    cases = load_corpus(args.corpus)
+    text = build_text(cases, args.repeat)
+    data = text.encode(args.encoding, errors="ignore")
+    print(f"语料: {len(cases)} 条, 吞吐量测试文本: {len(data) / 1e6:.1f} MB ({args.encoding})\n")
+
+    configs = [("默认规则", HeadingEngine(BUILTIN_RULES), False),
+               ("默认 + 全部可选规则", HeadingEngine(BUILTIN_RULES + list(EXTRA_RULES.values())), True)]
+
+    print(f"{'规则集':<20}{'准确率':>10}{'str MB/s':>12}{'bytes MB/s':>12}{'匹配数':>10}")
+    failed = False
+    for label, engine, extended in configs:
+        correct, total, errors = measure_accuracy(engine, cases, extended)
+        str_speed, byte_speed, count = measure_throughput(engine, text, data, args.encoding, args.rounds)
+        print(f"{label:<20}{correct / total:>10.1%}{str_speed:>12.1f}{byte_speed:>12.1f}{count:>10}")
+        for line, expected, actual in errors:
+            failed = True
+            print(f"  ❌ {line!r}: 期望 {expected}, 实际 {actual}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
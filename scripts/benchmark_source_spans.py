@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jieba
+from core.summarizer import keyword_matcher
+from core.summarizer.generator import SummaryGenerator, STOPWORDS
+from core.summarizer.keyword_matcher import KeywordMatcher
+
+NAMES = ["张三", "李四", "王五", "赵灵儿", "青云门", "玄天宗", "林师兄", "苏长老"]
+ACTIONS = ["来到了", "拜访了", "击败了", "离开了", "遇见了", "想起了"]
+PLACES = ["青云山", "藏经阁", "后山禁地", "山门", "天机城", "落霞峰"]
+
+
+def build_chapter(chars: int, rng: random.Random) -> str:
+    """合成长章节：人物 / 地点高频重复，接近真实小说的关键词分布"""
+    sentences, size = [], 0
+    while size < chars:
+        s = f"{rng.choice(NAMES)}{rng.choice(ACTIONS)}{rng.choice(PLACES)}，{rng.choice(NAMES)}在一旁默默看着。"
+        sentences.append(s + ("\n" if rng.random() < 0.2 else ""))
+        size += len(s)
+    return "".join(sentences)
+
+
+def build_summaries(count: int, rng: random.Random) -> List[str]:
+    return [f"{rng.choice(NAMES)}在{rng.choice(PLACES)}{rng.choice(ACTIONS)}{rng.choice(NAMES)}" for _ in range(count)]
+
+
+def legacy_positions(keywords: List[str], content: str) -> Dict[str, List[int]]:
+    """原实现：每句的每个关键词用 str.find 循环扫描一遍正文"""
+    positions = {}
+    for w in keywords:
+        found, start = [], 0
+        while True:
+            idx = content.find(w, start)
+            if idx == -1:
+                break
+            found.append(idx)
+            start = idx + 1
+        positions[w] = found
+    return positions
+
+
+def legacy_find_source_spans(generator: SummaryGenerator, summaries: List[str], content: str):
+    """原实现：逐句分词、逐关键词扫描 (评分部分与现实现相同)"""
+    results = []
+    for summary in summaries:
+        keywords = [w for w in jieba.lcut(summary) if w not in STOPWORDS and len(w) > 1]
+        results.append(generator._best_span(summary, content, keywords, legacy_positions(keywords, content)))
+    return results
+
+
+def timed(func, rounds: int) -> float:
+    """返回单轮平均耗时 (毫秒)"""
+    func()  # 预热 (jieba 词典加载)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="溯源匹配 (整章单次关键词匹配 vs 逐句逐关键词 str.find) 基准测试")
+    parser.add_argument('-i', '--input', help='使用真实章节正文 (UTF-8 文本文件)，默认合成文本')
+    parser.add_argument('--chars', type=int, nargs='+', default=[5000, 20000, 80000], help='合成章节的字数')
+    parser.add_argument('--sentences', type=int, default=20, help='每章总结句数')
+    parser.add_argument('--rounds', type=int, default=5, help='每项测量的轮数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    generator = SummaryGenerator(None)
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            chapters = [("输入文件", f.read())]
+    else:
+        chapters = [(f"{n} 字", build_chapter(n, rng)) for n in args.chars]
+    summaries = build_summaries(args.sentences, rng)
+    keywords_list = [[w for w in jieba.lcut(s) if w not in STOPWORDS and len(w) > 1] for s in summaries]
+    all_keywords = [w for keywords in keywords_list for w in keywords]
+
+    backend = "pyahocorasick 自动机" if keyword_matcher.ahocorasick is not None else "str.find (未安装 pyahocorasick)"
+    print(f"KeywordMatcher: {backend}，每章 {len(summaries)} 句总结，{len(set(all_keywords))} 个不同关键词\n")
+    print(f"{'章节':<12}{'定位:逐句':>14}{'定位:整章':>12}{'加速':>8}{'整体:原实现':>13}{'整体:现实现':>13}{'加速':>8}")
+
+    failed = False
+    for label, content in chapters:
+        locate_legacy = timed(lambda: [legacy_positions(k, content) for k in keywords_list], args.rounds)
+        locate_once = timed(lambda: KeywordMatcher(all_keywords).find_all(content), args.rounds)
+        total_legacy = timed(lambda: legacy_find_source_spans(generator, summaries, content), args.rounds)
+        total_new = timed(lambda: generator._find_all_source_spans(summaries, content), args.rounds)
+        print(f"{label:<12}{locate_legacy:>12.2f}ms{locate_once:>10.2f}ms{locate_legacy / locate_once:>7.1f}x"
+              f"{total_legacy:>11.2f}ms{total_new:>11.2f}ms{total_legacy / total_new:>7.1f}x")
+
+        if legacy_find_source_spans(generator, summaries, content) != generator._find_all_source_spans(summaries, content):
+            failed = True
+            print(f"  ❌ {label}: 溯源结果与原实现不一致")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.splitter.processor import Splitter
+
+CN_DIGITS = '零一二三四五六七八九'
+
+
+def to_cn(n: int) -> str:
+    """简单的阿拉伯数字转中文数字 (逐位转换，仅用于生成测试数据)"""
+    return ''.join(CN_DIGITS[int(d)] for d in str(n))
+
+
+def build_synthetic_novel(volumes: int, chapters_per_volume: int, paragraphs: int) -> str:
+    """生成包含大量分卷的合集文本"""
+    paragraph = "　　张三离开了家乡，踏上了旅程。他回头看了一眼青云山，山上云雾缭绕，宛如仙境。\n"
+    lines = ["书名：基准测试合集\n"]
+    for v in range(1, volumes + 1):
+        lines.append(f"第{to_cn(v)}卷 合集第{v}部\n")
+        for c in range(1, chapters_per_volume + 1):
+            lines.append(f"第{c}章 标题{v}-{c}\n")
+            lines.append(paragraph * paragraphs)
+    return ''.join(lines)
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed:8.3f}s  ({len(result)} 章)")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="split_by_volume 顺序 / 进程池并行 基准测试")
+    parser.add_argument('--volumes', type=int, default=1000, help='分卷数量')
+    parser.add_argument('--chapters', type=int, default=20, help='每卷章节数')
+    parser.add_argument('--paragraphs', type=int, default=30, help='每章段落数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='并行进程数')
+    args = parser.parse_args()
+
+    content = build_synthetic_novel(args.volumes, args.chapters, args.paragraphs)
+    print(f"合成文本: {args.volumes} 卷, {len(content) / 1e6:.1f}M 字符, CPU: {os.cpu_count()}")
+
+    splitter = Splitter()
+    sequential, t_seq = timed("sequential", lambda: splitter.split_by_volume(content))
+    parallel, t_par = timed(f"process pool (x{args.workers})",
+                            lambda: splitter.split_by_volume(content, workers=args.workers))
+
+    if [c.model_dump() for c in sequential] != [c.model_dump() for c in parallel]:
+        print("❌ 并行结果与顺序结果不一致！")
+        sys.exit(1)
+    print(f"✅ 结果一致，加速比: {t_seq / t_par:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
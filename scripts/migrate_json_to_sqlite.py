@@ -12,6 +12,8 @@ from core.db.engine import engine, create_db_and_tables
 from core.db.models import Novel, NovelVersion, AnalysisRun, Chapter, Summary, Entity, StoryRelationship
 
 from core.identifiers import IdentifierGenerator
+from core.splitter.archive import ChapterArchive
+from core.db.text_store import ChapterTextStore
 
 def extract_chapter_index(title: str, id_str: str, loop_index: int) -> int:
     # 0. 优先尝试从 ID 中解析 ch_XX (使用统一的 IdentifierGenerator)
@@ -45,7 +47,8 @@ def migrate():
     with Session(engine) as session:
         # Novel level
         for novel_dir in output_dir.iterdir():
-            if not novel_dir.is_dir():
+            # 跳过 .cache / .index 等内部目录
+            if not novel_dir.is_dir() or novel_dir.name.startswith('.'):
                 continue
             novel_name = novel_dir.name
             print(f"Processing novel: {novel_name}")
@@ -125,10 +128,15 @@ def migrate():
                         continue
 
                     print(f"  Importing {len(data)} chapters for {timestamp}...")
+
+                    # 打包格式 (chapters.pack) 一次性顺序读取全部正文，按偏移切片
+                    archive = ChapterArchive.load(run_dir)
+                    archive_contents = archive.read_all() if archive else {}
                     
                     for i, chapter_data in enumerate(data):
                         chapter_title = chapter_data.get('chapter_title') or chapter_data.get('title') or f"Chapter {i+1}"
-                        chapter_id_str = str(chapter_data.get('id', ''))
+                        # 总结记录 (ChapterSummary) 中的字段为 chapter_id，旧格式为 id
+                        chapter_id_str = str(chapter_data.get('chapter_id') or chapter_data.get('id') or '')
                         
                         # Priority: Explicit Index > Title > ID > Loop
                         idx = chapter_data.get('chapter_index')
@@ -157,6 +165,12 @@ def migrate():
 
                         # Try to load content from text file
                         content = chapter_data.get('content')
+                        content_hash = None
+                        if not content and archive:
+                            entry = archive.find(chapter_id_str, chapter_title, chapter_data.get('volume_title'))
+                            if entry:
+                                content = archive_contents.get(entry.id)
+                                content_hash = entry.content_hash
                         if not content:
                             # Strategy 1: Try exact title match (e.g. "第1章孫杰克.txt")
                             txt_path_title = run_dir / f"{chapter_title}.txt"
@@ -183,7 +197,9 @@ def migrate():
                             title=chapter_title,
                             volume_title=chapter_data.get('volume_title'),
                             headline=chapter_data.get('headline'),
-                            content=content
+                            # 正文按内容哈希去重存储，多次运行同一本书不会重复保存
+                            content_hash=ChapterTextStore.put(session, content, content_hash) if content else None,
+                            word_count=len(content) if content else None
                         )
                         session.add(chapter)
                         session.commit()
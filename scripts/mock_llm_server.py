@@ -0,0 +1,289 @@
+"""
+离线 Mock LLM 服务 (OpenAI 兼容的 /v1/chat/completions)，用于在不消耗 Token 的情况下压测总结流程。
+
+- 从 output/.cache 回放已缓存的章节 / 分块 / 打包总结结果，未命中时返回根据正文合成的占位结果
+- 可配置延迟分布、按比例注入 429 (带 Retry-After) 与格式错误的 JSON
+- 支持 "stream": true (SSE 分片输出，延迟均摊到各分片)，注入的格式错误表现为 finish_reason=length 的截断输出
+- 每个请求的随机结果由 (seed, 请求内容, 第几次收到该请求) 决定，与并发顺序无关，便于复现
+
+用法:
+    python scripts/mock_llm_server.py --port 8765 --latency lognormal:0.8:0.6 --rate-limit 0.05 --malformed 0.02
+    python app/main.py -i novel.txt -m chapter --summarize --llm-replay http://127.0.0.1:8765/v1
+
+GET /stats 返回命中 / 注入统计。
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_manager import CacheManager
+from core.summarizer.prompts import Prompts
+from core.utils import estimate_tokens
+from data_protocol.models import ChapterSummary
+
+_CHUNK_TITLE_RE = re.compile(r'\(第 \d+/\d+ 部分\)$')
+_PACKED_SECTION_RE = re.compile(r'### 第 (\d+) 章\n标题：(.*)\n内容：\n')
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布 (秒):
+      0 / fixed:0.5 / uniform:0.2:1.5 / normal:1.0:0.3 / lognormal:中位数:sigma (长尾)
+    """
+    name, _, params = spec.partition(":")
+    args = [float(x) for x in params.split(":") if x]
+    if name in ("0", "none", ""):
+        return lambda rng: 0.0
+    if name == "fixed":
+        return lambda rng: args[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if name == "normal":
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if name == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+    raise ValueError(f"不支持的延迟分布: {spec}")
+
+
+def _template_parts(template: str, field: str) -> Tuple[str, str]:
+    """把 Prompt 模板在某个占位符处切开，返回 (前缀, 后缀) 的字面文本"""
+    head, tail = template.split("{" + field + "}")
+    unescape = lambda s: s.replace("{{", "{").replace("}}", "}")
+    return unescape(head), unescape(tail)
+
+
+def summary_payload(summary: ChapterSummary) -> Dict:
+    """把缓存中的 ChapterSummary 还原为模型输出的 JSON 结构"""
+    return {
+        "headline": summary.headline,
+        "summary_sentences": [s.summary_text for s in summary.summary_sentences],
+        "entities": [{"name": e.name, "type": e.type, "description": e.description} for e in summary.entities],
+        "relationships": [{"source": r.source, "relation": r.relation, "target": r.target,
+                           "description": r.description} for r in summary.relationships],
+    }
+
+
+def placeholder_payload(content: str) -> Dict:
+    """缓存未命中时的占位结果 (取正文第一句)"""
+    first = re.split(r'[。！？!?\n]', content.strip(), maxsplit=1)[0][:50] or "(空章节)"
+    return {"headline": first, "summary_sentences": [first], "entities": [], "relationships": []}
+
+
+class ReplayResponder:
+    """根据请求内容生成回放响应 (与 HTTP 层分离，便于测试)"""
+
+    def __init__(self, cache_dir: Optional[str] = None, provider: str = "openrouter", base_url: Optional[str] = None,
+                 latency: str = "0", rate_limit: float = 0.0, retry_after: float = 1.0,
+                 malformed: float = 0.0, seed: int = 0):
+        from core.paths import PathManager
+        self.cache = CacheManager(str(cache_dir or PathManager.get_cache_dir()))
+        self.provider = provider
+        self.base_url = base_url
+        self.prompt_hash = Prompts.get_prompt_hash()
+        self.latency = parse_latency(latency)
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.malformed = malformed
+        self.seed = seed
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "rate_limited": 0, "malformed": 0, "other": 0}
+        self._single = _template_parts(Prompts.USER_PROMPT_TEMPLATE, "content")
+        self._packed = _template_parts(Prompts.PACKED_USER_PROMPT_TEMPLATE, "chapters")
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats[name] += n
+
+    def _rng(self, body: Dict) -> random.Random:
+        digest = hashlib.md5(json.dumps(body.get("messages"), ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._seen.get(digest, 0)
+            self._seen[digest] = attempt + 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def _lookup(self, title: str, content: str, model: str) -> Dict:
+        model_config = {"provider": self.provider, "model": model, "base_url": self.base_url}
+        if _CHUNK_TITLE_RE.search(title):
+            summary = self.cache.get_cached_chunk(content, self.prompt_hash, model_config)
+        else:
+            summary = self.cache.get_cached_summary(content, self.prompt_hash, model_config)
+        self._count("hits" if summary is not None else "misses")
+        return summary_payload(summary) if summary is not None else placeholder_payload(content)
+
+    def _answer(self, user: str, model: str) -> object:
+        """解析 Prompt 中的章节正文并查找对应的缓存结果"""
+        _, tail = self._single
+        marker = "内容：\n"
+        if user.endswith(tail) and marker in user:
+            body = user[:-len(tail)]
+            title = body[body.find("标题：") + 3:body.find("\n" + marker)]
+            return self._lookup(title, body.split(marker, 1)[1], model)
+
+        _, tail = self._packed
+        if user.endswith(tail):
+            body = user[:-len(tail)]
+            matches = list(_PACKED_SECTION_RE.finditer(body))
+            items = []
+            for i, m in enumerate(matches):
+                # 每节模板以换行结尾，节之间再以换行连接
+                end = matches[i + 1].start() - 2 if i + 1 < len(matches) else len(body) - 1
+                items.append({"chapter_index": int(m.group(1)), **self._lookup(m.group(2), body[m.end():end], model)})
+            return items
+
+        # 段落 / 剧情弧 / 概念 / 关系等其他分析请求
+        self._count("other")
+        return {"title": "回放", "synopsis": "(离线回放的占位结果)", "headline": "回放",
+                "summary_sentences": [], "entities": [], "relationships": []}
+
+    def respond(self, body: Dict) -> Tuple[int, Dict[str, str], Dict, float]:
+        """Returns: (状态码, 额外响应头, JSON 响应体, 延迟秒数)"""
+        self._count("requests")
+        rng = self._rng(body)
+        delay = self.latency(rng)
+        if rng.random() < self.rate_limit:
+            self._count("rate_limited")
+            error = {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_exceeded", "code": 429}}
+            return 429, {"retry-after": str(self.retry_after)}, error, delay
+
+        messages = body.get("messages") or []
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        model = body.get("model", "")
+        content = json.dumps(self._answer(user, model), ensure_ascii=False)
+        finish_reason = "stop"
+        if rng.random() < self.malformed:
+            self._count("malformed")
+            content = content[:len(content) // 2]
+            finish_reason = "length"
+
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        return 200, {}, {
+            "id": f"chatcmpl-mock-{rng.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }, delay
+
+
+def stream_chunks(payload: Dict, piece: int = 16) -> List[Dict]:
+    """把完整响应拆成 chat.completion.chunk 序列 (最后一个分片携带 finish_reason 与 usage)"""
+    choice = payload["choices"][0]
+    content = choice["message"]["content"]
+    base = {"id": payload["id"], "object": "chat.completion.chunk", "created": payload["created"], "model": payload["model"]}
+    chunks = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}]
+    for i in range(0, len(content), piece):
+        chunks.append({**base, "choices": [{"index": 0, "delta": {"content": content[i:i + piece]}, "finish_reason": None}]})
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": choice["finish_reason"]}]})
+    chunks.append({**base, "choices": [], "usage": payload["usage"]})
+    return chunks
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    responder: ReplayResponder = None
+
+    def _send_json(self, status: int, payload: Dict, headers: Dict[str, str] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.responder.stats)
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, headers, payload, delay = self.responder.respond(body)
+        if status != 200 or not body.get("stream"):
+            if delay > 0:
+                time.sleep(delay)
+            self._send_json(status, payload, headers)
+            return
+
+        chunks = stream_chunks(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for chunk in chunks:
+            if delay > 0:
+                time.sleep(delay / len(chunks))
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # 压测时逐请求打印会成为瓶颈
+        pass
+
+
+def start_server(responder: ReplayResponder, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """在后台线程启动服务，返回 (server, base_url)。port=0 时自动选择空闲端口"""
+    handler = type("BoundMockLLMHandler", (MockLLMHandler,), {"responder": responder})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    from core.config import settings
+    parser = argparse.ArgumentParser(description="离线 Mock LLM 服务 (回放 .cache 中的总结结果)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-dir', help='缓存目录 (默认 output/.cache)')
+    parser.add_argument('--provider', default='openrouter', help='录制时使用的 Provider (参与缓存键计算)')
+    parser.add_argument('--base-url', help='录制时使用的 --base-url (local 默认取 LOCAL_LLM_BASE_URL)')
+    parser.add_argument('--latency', default='0', help='延迟分布: 0 / fixed:S / uniform:A:B / normal:MEAN:STD / lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='返回 429 的概率')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='429 响应的 Retry-After 秒数')
+    parser.add_argument('--malformed', type=float, default=0.0, help='返回截断 JSON 的概率')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if args.provider == 'local' and not base_url:
+        base_url = settings.LOCAL_LLM_BASE_URL
+    responder = ReplayResponder(args.cache_dir, args.provider, base_url, args.latency,
+                                args.rate_limit, args.retry_after, args.malformed, args.seed)
+    server, url = start_server(responder, args.host, args.port)
+    print(f"Mock LLM 服务已启动: {url} (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n统计: {json.dumps(responder.stats, ensure_ascii=False)}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
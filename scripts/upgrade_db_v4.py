@@ -0,0 +1,80 @@
+import sqlite3
+import hashlib
+import os
+
+def upgrade_database():
+    db_path = "storytrace.db"
+
+    if not os.path.exists(db_path):
+        print(f"数据库文件 {db_path} 不存在，新创建的数据库将自动包含新表。")
+        return
+
+    print(f"正在检查数据库 {db_path} ...")
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        # 1. 创建按内容寻址的正文表
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chaptertext'")
+        if not cursor.fetchone():
+            print("正在创建 ChapterText 表...")
+            cursor.execute("""
+            CREATE TABLE chaptertext (
+                hash VARCHAR NOT NULL,
+                content TEXT,
+                PRIMARY KEY (hash)
+            )
+            """)
+            print("✅ ChapterText 表创建成功。")
+        else:
+            print("ChapterText 表已存在，跳过。")
+
+        # 2. Chapter 表添加 content_hash 字段
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chapter'")
+        if not cursor.fetchone():
+            print("Chapter 表不存在，跳过。")
+            conn.commit()
+            return
+
+        cursor.execute("PRAGMA table_info(chapter)")
+        columns = [info[1] for info in cursor.fetchall()]
+        if 'content_hash' not in columns:
+            print("检测到缺失字段 'content_hash'，正在添加...")
+            cursor.execute("ALTER TABLE chapter ADD COLUMN content_hash VARCHAR")
+            cursor.execute("CREATE INDEX ix_chapter_content_hash ON chapter (content_hash)")
+            print("✅ 'content_hash' 字段添加成功。")
+        else:
+            print("字段 'content_hash' 已存在。")
+
+        # 3. 把旧数据中的正文迁移到 ChapterText (相同正文只保留一份)
+        cursor.execute("SELECT id, content FROM chapter WHERE content IS NOT NULL AND content != ''")
+        rows = cursor.fetchall()
+        if rows:
+            print(f"正在迁移 {len(rows)} 个章节的正文...")
+            unique = set()
+            for chapter_id, content in rows:
+                content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
+                if content_hash not in unique:
+                    cursor.execute("INSERT OR IGNORE INTO chaptertext (hash, content) VALUES (?, ?)", (content_hash, content))
+                    unique.add(content_hash)
+                cursor.execute("UPDATE chapter SET content_hash = ?, content = NULL WHERE id = ?", (content_hash, chapter_id))
+            print(f"✅ 正文迁移完成: {len(rows)} 章 -> {len(unique)} 份唯一正文。")
+        else:
+            print("没有需要迁移的正文。")
+
+        conn.commit()
+
+        if rows:
+            print("正在压缩数据库文件 (VACUUM)...")
+            conn.execute("VACUUM")
+        print("数据库结构升级完成！您可以直接运行程序而无需重新导入小说。")
+
+    except Exception as e:
+        print(f"升级失败: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    upgrade_database()
@@ -0,0 +1,86 @@
+import sqlite3
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.db.compression import compress_text
+
+def add_column(cursor, table: str, column: str, column_type: str):
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [info[1] for info in cursor.fetchall()]
+    if column not in columns:
+        print(f"检测到缺失字段 '{table}.{column}'，正在添加...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        print(f"✅ '{table}.{column}' 字段添加成功。")
+    else:
+        print(f"字段 '{table}.{column}' 已存在。")
+
+def upgrade_database():
+    db_path = "storytrace.db"
+
+    if not os.path.exists(db_path):
+        print(f"数据库文件 {db_path} 不存在，新创建的数据库将自动包含新字段。")
+        return
+
+    print(f"正在检查数据库 {db_path} ...")
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chaptertext'")
+        if not cursor.fetchone():
+            print("ChapterText 表不存在，请先运行 scripts/upgrade_db_v4.py。")
+            return
+
+        # 1. 添加字段
+        add_column(cursor, "chaptertext", "data", "BLOB")
+        add_column(cursor, "chaptertext", "codec", "VARCHAR")
+        add_column(cursor, "chaptertext", "word_count", "INTEGER")
+        add_column(cursor, "chapter", "word_count", "INTEGER")
+
+        # 2. 压缩未压缩的正文
+        cursor.execute("SELECT hash, content FROM chaptertext WHERE data IS NULL AND content IS NOT NULL")
+        rows = cursor.fetchall()
+        if rows:
+            print(f"正在压缩 {len(rows)} 份正文...")
+            raw_size = packed_size = 0
+            for content_hash, content in rows:
+                codec, data = compress_text(content)
+                cursor.execute(
+                    "UPDATE chaptertext SET data = ?, codec = ?, word_count = ?, content = NULL WHERE hash = ?",
+                    (data, codec, len(content), content_hash)
+                )
+                raw_size += len(content.encode('utf-8'))
+                packed_size += len(data)
+            print(f"✅ 压缩完成 ({codec}): {raw_size / 1e6:.1f} MB -> {packed_size / 1e6:.1f} MB")
+        else:
+            print("没有需要压缩的正文。")
+
+        # 3. 回填章节字数
+        cursor.execute("""
+            UPDATE chapter SET word_count = (
+                SELECT chaptertext.word_count FROM chaptertext WHERE chaptertext.hash = chapter.content_hash
+            )
+            WHERE word_count IS NULL AND content_hash IS NOT NULL
+        """)
+        cursor.execute("UPDATE chapter SET word_count = length(content) WHERE word_count IS NULL AND content IS NOT NULL")
+        print("✅ 章节字数回填完成。")
+
+        conn.commit()
+
+        if rows:
+            print("正在压缩数据库文件 (VACUUM)...")
+            conn.execute("VACUUM")
+        print("数据库结构升级完成！您可以直接运行程序而无需重新导入小说。")
+
+    except Exception as e:
+        print(f"升级失败: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    upgrade_database()
@@ -0,0 +1,236 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_manager import (CacheManager, CacheEntry, JsonFileBackend, SqliteBackend, LRUCache,
+                                 migrate_json_cache, select_evictions)
+from core.utils import estimate_tokens
+import hashlib
+from data_protocol.models import Chapter, ChapterSummary
+
+MODEL_CONFIG = {"provider": "openrouter", "model": "test-model", "base_url": None}
+
+
+def make_summary(title: str) -> ChapterSummary:
+    return ChapterSummary(chapter_id="ch_1", chapter_title=title, headline=f"{title}的概要",
+                          summary_sentences=[], entities=[], relationships=[])
+
+
+class TestCacheManager(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_backends_round_trip(self):
+        for backend in ("sqlite", "json"):
+            with self.subTest(backend=backend):
+                cache = CacheManager(os.path.join(self.cache_dir, backend), backend=backend)
+                self.assertIsNone(cache.get_cached_summary("正文", "p1", MODEL_CONFIG))
+                cache.save_summary("正文", "p1", MODEL_CONFIG, make_summary("第一章"))
+                self.assertEqual(cache.get_cached_summary("正文", "p1", MODEL_CONFIG).chapter_title, "第一章")
+                # prompt 变化时不命中
+                self.assertIsNone(cache.get_cached_summary("正文", "p2", MODEL_CONFIG))
+                cache.close()
+
+    def test_key_from_chapter_hash(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        content = "第一章的正文。"
+        # 旧的计算方式: md5(md5(正文)_prompt_md5(配置))
+        legacy_key = hashlib.md5(
+            f"{hashlib.md5(content.encode('utf-8')).hexdigest()}_p_"
+            f"{hashlib.md5(json.dumps(MODEL_CONFIG, sort_keys=True).encode('utf-8')).hexdigest()}".encode('utf-8')
+        ).hexdigest()
+        chapter = Chapter(id="ch_1", title="第一章", content=content, word_count=len(content),
+                          content_hash=hashlib.md5(content.encode('utf-8')).hexdigest())
+        self.assertEqual(cache._calculate_key(content, "p", MODEL_CONFIG), legacy_key)
+        self.assertEqual(cache._calculate_key(chapter, "p", MODEL_CONFIG), legacy_key)
+        # 哈希已知时不再读取正文
+        self.assertEqual(cache._calculate_key(chapter.model_copy(update={"content": ""}), "p", MODEL_CONFIG), legacy_key)
+        # 配置键顺序不影响结果 (记忆的配置哈希同样与顺序无关)
+        reordered = dict(reversed(list(MODEL_CONFIG.items())))
+        self.assertEqual(cache._calculate_key(content, "p", reordered), legacy_key)
+
+        cache.save_summary(chapter, "p", MODEL_CONFIG, make_summary("一"))
+        self.assertEqual(cache.get_cached_summary(content, "p", MODEL_CONFIG).chapter_title, "一")
+        cache.close()
+
+    def test_batch_get_and_put(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        cache.save_summaries([("正文一", make_summary("一")), ("正文三", make_summary("三"))], "p", MODEL_CONFIG)
+        results = cache.get_cached_summaries(["正文一", "正文二", "正文三", "正文一"], "p", MODEL_CONFIG)
+        self.assertEqual([r.chapter_title if r else None for r in results], ["一", None, "三", "一"])
+        self.assertEqual(cache.backend.count(), 2)
+        self.assertFalse([n for n in os.listdir(self.cache_dir) if n.endswith('.json')])
+        cache.close()
+
+    def test_legacy_json_read_through(self):
+        legacy = CacheManager(self.cache_dir, backend="json")
+        legacy.save_summary("旧正文", "p", MODEL_CONFIG, make_summary("旧"))
+        key = legacy._calculate_key("旧正文", "p", MODEL_CONFIG)
+
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        self.assertEqual(cache.get_cached_summary("旧正文", "p", MODEL_CONFIG).chapter_title, "旧")
+        # 命中后已写入 SQLite
+        self.assertIsNotNone(cache.backend.get(key))
+        cache.close()
+
+    def test_migrate_json_cache(self):
+        backend = JsonFileBackend(self.cache_dir)
+        for i in range(5):
+            backend.put(f"key{i}", make_summary(str(i)).model_dump())
+        # 损坏的文件会被跳过
+        with open(os.path.join(self.cache_dir, "broken.json"), 'w', encoding='utf-8') as f:
+            f.write("{")
+
+        self.assertEqual(migrate_json_cache(self.cache_dir, batch_size=2, delete=True), 5)
+        self.assertEqual([n for n in os.listdir(self.cache_dir) if n.endswith('.json')], ["broken.json"])
+
+        target = SqliteBackend(os.path.join(self.cache_dir, SqliteBackend.DB_NAME))
+        self.assertEqual(target.count(), 5)
+        self.assertEqual(target.get("key3")["chapter_title"], "3")
+        target.close()
+
+    def test_json_backend_write_is_atomic(self):
+        backend = JsonFileBackend(self.cache_dir)
+        backend.put("k", {"a": 1})
+        backend.put("k", {"a": 2})
+        self.assertEqual(os.listdir(self.cache_dir), ["k.json"])
+        with open(os.path.join(self.cache_dir, "k.json"), encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {"a": 2})
+
+
+class TestEviction(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_select_evictions_policies(self):
+        entries = [
+            CacheEntry("old_popular", size=100, last_access=10, hits=9),
+            CacheEntry("new_rare", size=100, last_access=30, hits=0),
+            CacheEntry("mid", size=100, last_access=20, hits=3),
+        ]
+        self.assertEqual(select_evictions(entries, max_bytes=200, policy='lru'), ["old_popular"])
+        self.assertEqual(select_evictions(entries, max_bytes=200, policy='lfu'), ["new_rare"])
+        self.assertEqual(select_evictions(entries, max_age_seconds=15, now=30), ["old_popular"])
+        # 受保护的条目计入体积但不被淘汰
+        self.assertEqual(select_evictions(entries, max_bytes=100, protected={"old_popular"}), ["mid", "new_rare"])
+        self.assertEqual(select_evictions(entries), [])
+
+    def test_lru_memory_tier(self):
+        lru = LRUCache(2)
+        lru.put("a", 1)
+        lru.put("b", 2)
+        lru.get("a")
+        lru.put("c", 3)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual((lru.get("a"), lru.get("c")), (1, 3))
+
+        cache = CacheManager(self.cache_dir, backend="sqlite", memory_items=10)
+        cache.save_summary("正文", "p", MODEL_CONFIG, make_summary("一"))
+        cache.backend.delete_many([cache._calculate_key("正文", "p", MODEL_CONFIG)])
+        # 磁盘已删除，内存层仍命中；返回副本，修改不影响缓存
+        first = cache.get_cached_summary("正文", "p", MODEL_CONFIG)
+        first.chapter_id = "changed"
+        self.assertEqual(cache.get_cached_summary("正文", "p", MODEL_CONFIG).chapter_id, "ch_1")
+        cache.close()
+
+    def test_trim_skips_active_leases(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite", memory_items=0)
+        contents = [f"第{i}章正文" for i in range(6)]
+        cache.save_summaries([(c, make_summary(c)) for c in contents], "p", MODEL_CONFIG)
+        entry_size = cache.backend.entries()[0].size
+
+        with cache.lease(contents[:3], "p", MODEL_CONFIG):
+            self.assertEqual(cache.stats()["leased_keys"], 3)
+            evicted, freed = cache.trim(max_bytes=1, max_age_seconds=0, policy='lru')
+            self.assertEqual(evicted, 3)
+            self.assertEqual(freed, 3 * entry_size)
+            remaining = cache.get_cached_summaries(contents, "p", MODEL_CONFIG)
+            self.assertEqual([r is not None for r in remaining], [True] * 3 + [False] * 3)
+
+        self.assertEqual(cache.stats()["active_leases"], 0)
+        self.assertEqual(cache.trim(max_bytes=1, max_age_seconds=0)[0], 3)
+        self.assertEqual(cache.stats()["entries"], 0)
+        cache.close()
+
+    def test_lease_extended_while_streaming(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite", memory_items=0)
+        contents = [f"第{i}章正文" for i in range(4)]
+        cache.save_summaries([(c, make_summary(c)) for c in contents], "p", MODEL_CONFIG)
+
+        with cache.lease([], "p", MODEL_CONFIG) as lease_id:
+            cache.extend_lease(lease_id, contents[:1], "p", MODEL_CONFIG)
+            cache.extend_lease(lease_id, contents[1:2], "p", MODEL_CONFIG)
+            self.assertEqual(cache.stats()["leased_keys"], 2)
+            self.assertEqual(cache.trim(max_bytes=1, max_age_seconds=0)[0], 2)
+        self.assertEqual(os.listdir(cache.leases.lease_dir), [])
+        cache.close()
+
+    def test_stale_lease_is_ignored(self):
+        cache = CacheManager(self.cache_dir, backend="json", memory_items=0)
+        cache.save_summary("正文", "p", MODEL_CONFIG, make_summary("一"))
+        lease_id = cache.leases.acquire([cache._calculate_key("正文", "p", MODEL_CONFIG)])
+        cache.leases.ttl_seconds = -1
+        self.assertEqual(cache.trim(max_bytes=1, max_age_seconds=0)[0], 1)
+        self.assertIsNone(cache.get_cached_summary("正文", "p", MODEL_CONFIG))
+        self.assertFalse(os.path.exists(os.path.join(cache.leases.lease_dir, f"{lease_id}.json")))
+
+
+class TestCacheStats(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_run_stats(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        cache.save_summaries([("正文一", make_summary("一")), ("正文二", make_summary("二"))], "p", MODEL_CONFIG)
+        cache.get_cached_summaries(["正文一", "正文二", "正文三"], "p", MODEL_CONFIG)
+        cache.get_cached_summary("正文一", "p2", MODEL_CONFIG)
+
+        stats = cache.run_stats.to_dict()
+        self.assertEqual((stats["hits"], stats["misses"], stats["writes"], stats["reads"]), (2, 2, 2, 2))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        # 写入时已放入内存层
+        self.assertEqual(stats["memory_hits"], 2)
+        self.assertGreaterEqual(stats["tokens_saved"], estimate_tokens("正文一正文二一的概要二的概要"))
+        cache.close()
+
+    def test_cache_stats_endpoint(self):
+        from sqlmodel import SQLModel, Session, create_engine
+        from core.db.models import Novel, NovelVersion, AnalysisRun
+        from backend.routers.novels import list_cache_stats
+
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            novel = Novel(name="测试小说")
+            session.add(novel)
+            session.commit()
+            version = NovelVersion(novel_id=novel.id, hash="abcd1234")
+            session.add(version)
+            session.commit()
+            cache = {"hits": 90, "misses": 10, "hit_rate": 0.9, "tokens_saved": 1000, "prompt_hash": "p1"}
+            session.add(AnalysisRun(version_id=version.id, timestamp="20260102_000000",
+                                    config_snapshot=json.dumps({"model": "m", "cache": cache})))
+            session.add(AnalysisRun(version_id=version.id, timestamp="20260101_000000", config_snapshot=json.dumps({"model": "m"})))
+            session.commit()
+
+            results = list_cache_stats("测试小说", "abcd1234", session)
+            self.assertEqual(len(results), 1)
+            self.assertEqual((results[0].timestamp, results[0].model, results[0].prompt_hash), ("20260102_000000", "m", "p1"))
+            self.assertEqual((results[0].hits, results[0].hit_rate, results[0].tokens_saved), (90, 0.9, 1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
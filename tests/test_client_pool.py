@@ -0,0 +1,52 @@
+import sys
+import os
+import asyncio
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.summarizer import llm_client
+from core.summarizer.limiter import AdaptiveLimiter
+from core.summarizer.llm_client import OpenAIClient
+
+BASE_URL = "http://localhost:1/v1"
+
+
+class TestClientPool(unittest.TestCase):
+    def test_sync_client_is_lazy_and_shared(self):
+        before = len(llm_client._sync_clients)
+        a = OpenAIClient(api_key="pool-test", base_url=BASE_URL, model="m1")
+        b = OpenAIClient(api_key="pool-test", base_url=BASE_URL, model="m2")
+        # 构造客户端不创建连接池
+        self.assertEqual(len(llm_client._sync_clients), before)
+        # 模型不同、endpoint 与 Key 相同的客户端共用连接池
+        self.assertIs(a.client, b.client)
+        self.assertIsNot(a.client, OpenAIClient(api_key="other-key", base_url=BASE_URL, model="m1").client)
+
+    def test_async_clients_are_per_event_loop(self):
+        a = OpenAIClient(api_key="pool-test", base_url=BASE_URL, model="m1")
+        b = OpenAIClient(api_key="pool-test", base_url=BASE_URL, model="m2")
+
+        async def clients():
+            return a.async_client, b.async_client
+
+        first, second = asyncio.run(clients()), asyncio.run(clients())
+        self.assertIs(first[0], first[1])
+        # 不同事件循环不共用 (连接绑定在创建它的循环上)
+        self.assertIsNot(first[0], second[0])
+
+    def test_limiter_copy_shares_http_pool(self):
+        a = OpenAIClient(api_key="pool-test", base_url=BASE_URL, model="m1")
+        b = OpenAIClient(api_key="pool-test", base_url=BASE_URL, model="m1")
+
+        async def clients():
+            b.attach_limiter(AdaptiveLimiter())
+            return a.async_client, b.async_client
+
+        plain, limited = asyncio.run(clients())
+        self.assertEqual(limited.max_retries, 0)
+        self.assertNotEqual(plain.max_retries, 0)
+        self.assertIs(plain._client, limited._client)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import sys
+import os
+import time
+import asyncio
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.summarizer.failover import CircuitBreaker, FailoverClient, LatencyTracker
+from core.summarizer.llm_client import LLMClient, ClientFactory, OpenAIClient
+
+
+class FakeClient(LLMClient):
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    def generate(self, prompt):
+        return self.chat_completion([{"role": "user", "content": prompt}])
+
+    def chat_completion(self, messages, temperature=0.7):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return self.name
+
+    async def chat_completion_async(self, messages, temperature=0.7):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return self.name
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_and_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        # 冷却结束后只放行一个试探请求
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_latency_percentile(self):
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.percentile(0.95))
+        for i in range(1, 101):
+            tracker.record(i / 100)
+        self.assertAlmostEqual(tracker.percentile(0.95), 0.96)
+
+
+class TestFailoverClient(unittest.TestCase):
+    def test_sync_failover_skips_open_breaker(self):
+        primary, backup = FakeClient("primary", fail=True), FakeClient("backup")
+        client = FailoverClient([("primary", primary), ("backup", backup)], failure_threshold=2, cooldown=60)
+        for _ in range(3):
+            self.assertEqual(client.chat_completion(MESSAGES), "backup")
+        # 连续失败 2 次后主 Provider 被熔断，第 3 次直接走备用
+        self.assertEqual(primary.calls, 2)
+        stats = client.stats()
+        self.assertEqual(stats["breakers"]["primary"], "open")
+        self.assertEqual((stats["served"]["backup"], stats["failovers"]), (3, 2))
+
+    def test_all_providers_fail(self):
+        client = FailoverClient([("a", FakeClient("a", fail=True)), ("b", FakeClient("b", fail=True))], failure_threshold=1)
+        with self.assertRaises(ConnectionError):
+            asyncio.run(client.chat_completion_async(MESSAGES))
+        with self.assertRaises(RuntimeError):
+            client.chat_completion(MESSAGES)
+
+    def test_async_failover(self):
+        primary, backup = FakeClient("primary", fail=True), FakeClient("backup")
+        client = FailoverClient([("primary", primary), ("backup", backup)])
+        self.assertEqual(asyncio.run(client.chat_completion_async(MESSAGES)), "backup")
+        self.assertEqual(client.stats()["failovers"], 1)
+
+    def test_hedge_after_p95(self):
+        primary, backup = FakeClient("primary", delay=0.01), FakeClient("backup", delay=0.01)
+        client = FailoverClient([("primary", primary), ("backup", backup)], hedge=True,
+                                hedge_min_delay=0.0, hedge_min_samples=5)
+
+        async def main():
+            for _ in range(5):
+                await client.chat_completion_async(MESSAGES)
+            # 主 Provider 变慢：超过 p95 后发出对冲请求，备用先返回，主请求被取消
+            primary.delay = 1.0
+            start = time.monotonic()
+            result = await client.chat_completion_async(MESSAGES)
+            return result, time.monotonic() - start
+
+        result, elapsed = asyncio.run(main())
+        self.assertEqual(result, "backup")
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(primary.cancelled, 1)
+        stats = client.stats()
+        self.assertEqual((stats["hedged"], stats["hedge_wins"]), (1, 1))
+        # 被取消的请求不计为失败
+        self.assertEqual(client.breakers["primary"].failures, 0)
+
+    def test_no_hedge_without_samples(self):
+        primary, backup = FakeClient("primary", delay=0.05), FakeClient("backup")
+        client = FailoverClient([("primary", primary), ("backup", backup)], hedge=True, hedge_min_delay=0.0)
+        self.assertEqual(asyncio.run(client.chat_completion_async(MESSAGES)), "primary")
+        self.assertEqual(backup.calls, 0)
+
+    def test_factory_builds_failover(self):
+        client = ClientFactory.create_with_failover("openrouter", fallbacks=["local"], api_key="test")
+        self.assertIsInstance(client, FailoverClient)
+        self.assertEqual([name for name, _ in client.clients], ["openrouter", "local"])
+        self.assertIsInstance(ClientFactory.create_with_failover("local", fallbacks=[]), OpenAIClient)
+
+
+if __name__ == "__main__":
+    unittest.main()
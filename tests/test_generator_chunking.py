@@ -0,0 +1,140 @@
+import sys
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_manager import CacheManager
+from core.summarizer.chunking import split_into_chunks
+from core.summarizer.generator import SummaryGenerator
+from core.summarizer.prompts import Prompts
+from core.summarizer.llm_client import LLMClient
+from data_protocol.models import Chapter
+
+MODEL_CONFIG = {"provider": "openrouter", "model": "test-model", "base_url": None}
+
+
+class ChunkEchoClient(LLMClient):
+    """按块里出现的人物返回实体与关系"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    def chat_completion(self, messages, temperature=0.7):
+        # 只看正文部分 (Prompt 模板的示例里也有人名)
+        content = messages[-1]["content"].split("内容：")[1].split("请输出")[0]
+        self.prompts.append(content)
+        names = [name for name in ("张三", "李四", "王五") if name in content]
+        return json.dumps({
+            "headline": f"{names[0]}登场",
+            "summary_sentences": [f"{names[0]}出发了"],
+            "entities": [{"name": n, "type": "Person", "description": f"{n}的描述{len(self.prompts)}"} for n in names],
+            "relationships": [{"source": names[0], "relation": "遇见", "target": n, "description": ""} for n in names[1:]],
+        }, ensure_ascii=False)
+
+    async def chat_completion_async(self, messages, temperature=0.7):
+        await asyncio.sleep(0)
+        return self.chat_completion(messages, temperature)
+
+
+def long_chapter(tail: str = "王五出发了。") -> Chapter:
+    paragraphs = ["张三出发了。" + "风" * 80, "李四和张三相遇。" + "雨" * 80, tail + "雪" * 80]
+    content = "\n".join(paragraphs)
+    return Chapter(id="ch_1", title="第一章", content=content, word_count=len(content))
+
+
+class TestChunking(unittest.TestCase):
+    def test_chunks_cover_content_on_paragraph_boundaries(self):
+        content = long_chapter().content
+        chunks = split_into_chunks(content, 100)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual("".join(text for _, text in chunks), content)
+        for start, text in chunks:
+            self.assertEqual(content[start:start + len(text)], text)
+        self.assertEqual(split_into_chunks("短章节", 100), [(0, "短章节")])
+
+    def test_oversized_paragraph_is_split(self):
+        content = "一句话。" * 100
+        chunks = split_into_chunks(content, 50)
+        self.assertEqual("".join(text for _, text in chunks), content)
+        self.assertTrue(all(len(text) <= 50 for _, text in chunks))
+
+
+class TestMapReduceSummary(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_long_chapter_is_not_truncated(self):
+        client = ChunkEchoClient()
+        generator = SummaryGenerator(client, chunk_tokens=100)
+        chapter = long_chapter()
+        summary = asyncio.run(generator.generate_summary_async(chapter))
+
+        self.assertEqual(len(client.prompts), 3)
+        self.assertEqual(summary.chapter_id, "ch_1")
+        # 实体按名称合并，描述拼接；关系去重
+        names = [e.name for e in summary.entities]
+        self.assertEqual(names, ["张三", "李四", "王五"])
+        self.assertIn("；", summary.entities[0].description)
+        self.assertEqual([(r.source, r.target) for r in summary.relationships], [("张三", "李四")])
+        # 溯源位置换算到整章正文
+        last = summary.summary_sentences[-1].source_spans[0]
+        self.assertEqual(chapter.content[last.start_index:last.end_index], last.text)
+        self.assertGreater(last.start_index, 150)
+        # 同步接口结果一致
+        self.assertEqual(generator.generate_summary(chapter).entities[2].name, "王五")
+
+    def test_chunk_results_are_cached(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        client = ChunkEchoClient()
+        generator = SummaryGenerator(client, chunk_tokens=100, cache_manager=cache,
+                                     prompt_hash="p", model_config=MODEL_CONFIG)
+        asyncio.run(generator.generate_summary_async(long_chapter()))
+        self.assertEqual(len(client.prompts), 3)
+
+        # 只修改最后一段，只有最后一块重新总结
+        edited = long_chapter(tail="王五和张三告别。")
+        summary = asyncio.run(generator.generate_summary_async(edited))
+        self.assertEqual(len(client.prompts), 4)
+        self.assertIn("王五和张三告别", client.prompts[-1])
+        self.assertEqual((cache.run_stats.chunk_hits, cache.run_stats.chunk_misses), (2, 4))
+        self.assertEqual(summary.relationships[-1].target, "王五")
+        cache.close()
+
+    def test_chunk_results_are_leased(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite", memory_items=0)
+        client = ChunkEchoClient()
+        generator = SummaryGenerator(client, chunk_tokens=100, cache_manager=cache,
+                                     prompt_hash="p", model_config=MODEL_CONFIG)
+        asyncio.run(generator.generate_summary_async(long_chapter()))
+
+        # 运行期间并发的 cache-trim 不淘汰本次将读回的分块结果
+        with cache.lease([], "p", MODEL_CONFIG) as lease_id:
+            generator.extend_lease(lease_id, [long_chapter()])
+            self.assertEqual(cache.trim(max_bytes=1, max_age_seconds=0)[0], 0)
+            asyncio.run(generator.generate_summary_async(long_chapter()))
+        self.assertEqual(len(client.prompts), 3)
+        self.assertEqual(cache.trim(max_bytes=1, max_age_seconds=0)[0], 3)
+        cache.close()
+
+    def test_prompt_hash_includes_summarizer_version(self):
+        # 截断时代的旧缓存 (同样的模板、旧版本号) 不再命中
+        current = Prompts.get_prompt_hash()
+        Prompts.SUMMARIZER_VERSION -= 1
+        try:
+            self.assertNotEqual(Prompts.get_prompt_hash(), current)
+        finally:
+            Prompts.SUMMARIZER_VERSION += 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import json
+import asyncio
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.summarizer.generator import SummaryGenerator
+from core.summarizer.llm_client import LLMClient
+from core.summarizer.prompts import Prompts
+from core.utils import estimate_tokens
+from data_protocol.models import Chapter
+
+
+def make_chapter(n: int, length: int = 300) -> Chapter:
+    content = f"第{n}章的正文。角色{n}登场。" + "山" * length
+    return Chapter(id=f"ch_{n}", title=f"第{n}章", content=content, word_count=len(content))
+
+
+class PackedClient(LLMClient):
+    """打包请求按 chapter_index 倒序返回 (验证按序号对应)，可指定漏掉的章节"""
+
+    def __init__(self, skip=()):
+        self.requests = []
+        self.skip = set(skip)
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    def chat_completion(self, messages, temperature=0.7):
+        user = messages[-1]["content"]
+        self.requests.append(messages)
+        if "chapter_index" not in user:
+            return json.dumps({"headline": "单章总结", "summary_sentences": [], "entities": []}, ensure_ascii=False)
+        count = user.count("### 第")
+        items = [{"chapter_index": i, "headline": f"第{i}个", "summary_sentences": [f"角色{i}登场"],
+                  "entities": [{"name": f"角色{i}", "type": "Person", "description": ""}], "relationships": []}
+                 for i in range(1, count + 1) if i not in self.skip]
+        return "以下是结果：\n" + json.dumps(items[::-1], ensure_ascii=False)
+
+    async def chat_completion_async(self, messages, temperature=0.7):
+        return self.chat_completion(messages, temperature)
+
+
+class TestPacking(unittest.TestCase):
+    def test_plan_packs(self):
+        generator = SummaryGenerator(PackedClient(), pack_tokens=1000, pack_max_chapters=3)
+        chapters = [make_chapter(1), make_chapter(2), make_chapter(3, length=2000), make_chapter(4),
+                    make_chapter(5), make_chapter(6), make_chapter(7), make_chapter(8)]
+        packs = [[ch.id for ch in pack] for pack in generator.plan_packs(chapters)]
+        # 长章节单独成组；每包不超过预算和章节数上限
+        self.assertEqual(packs, [["ch_1", "ch_2"], ["ch_3"], ["ch_4", "ch_5", "ch_6"], ["ch_7", "ch_8"]])
+        disabled = SummaryGenerator(PackedClient(), pack_tokens=0)
+        self.assertEqual(len(disabled.plan_packs(chapters)), len(chapters))
+
+    def test_packed_response_is_split_per_chapter(self):
+        client = PackedClient()
+        generator = SummaryGenerator(client, pack_tokens=2000)
+        chapters = [make_chapter(n) for n in range(1, 4)]
+        summaries = asyncio.run(generator.generate_packed_summaries_async(chapters))
+
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual([s.chapter_id for s in summaries], ["ch_1", "ch_2", "ch_3"])
+        self.assertEqual([s.headline for s in summaries], ["第1个", "第2个", "第3个"])
+        self.assertEqual(summaries[1].entities[0].name, "角色2")
+        # 溯源在各自章节的正文中进行
+        self.assertTrue(summaries[2].summary_sentences[0].source_spans)
+
+    def test_missing_chapter_falls_back_to_single_request(self):
+        client = PackedClient(skip={2})
+        generator = SummaryGenerator(client, pack_tokens=2000)
+        chapters = [make_chapter(n) for n in range(1, 4)]
+        summaries = asyncio.run(generator.generate_packed_summaries_async(chapters))
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual([s.headline for s in summaries], ["第1个", "单章总结", "第3个"])
+        self.assertEqual(generator.generate_packed_summaries(chapters)[1].headline, "单章总结")
+
+    def test_packing_reduces_prompt_tokens(self):
+        chapters = [make_chapter(n) for n in range(1, 6)]
+        single = sum(estimate_tokens(m["content"]) for ch in chapters
+                     for m in Prompts.get_summary_prompt(ch.title, ch.content))
+        packed = sum(estimate_tokens(m["content"])
+                     for m in Prompts.get_packed_summary_prompt([(ch.title, ch.content) for ch in chapters]))
+        self.assertLess(packed, single * 0.6)
+
+    def test_packed_template_changes_prompt_hash(self):
+        current = Prompts.get_prompt_hash()
+        original = Prompts.PACKED_USER_PROMPT_TEMPLATE
+        Prompts.PACKED_USER_PROMPT_TEMPLATE = original + "\n"
+        try:
+            self.assertNotEqual(Prompts.get_prompt_hash(), current)
+        finally:
+            Prompts.PACKED_USER_PROMPT_TEMPLATE = original
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.splitter.headings import HeadingEngine, HeadingRule, BUILTIN_RULES, EXTRA_RULES, CHAPTER
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression", "data", "heading_corpus.json")
+
+
+def load_corpus():
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)["cases"]
+
+
+def classify(match):
+    if not match:
+        return None, None
+    kind = "volume" if match.group(1) else "chapter"
+    return kind, (match.group(1) or match.group(2))
+
+
+class TestHeadingEngine(unittest.TestCase):
+    def setUp(self):
+        self.cases = load_corpus()
+        self.default = HeadingEngine(BUILTIN_RULES)
+        self.extended = HeadingEngine(BUILTIN_RULES + list(EXTRA_RULES.values()))
+
+    def _expected(self, case, extended: bool):
+        if case["extra"] and not extended:
+            return None, None
+        return case["expect"], case["title"]
+
+    def test_corpus_accuracy(self):
+        for engine, extended in ((self.default, False), (self.extended, True)):
+            for case in self.cases:
+                with self.subTest(line=case["line"], extended=extended):
+                    actual = classify(engine.pattern.match(case["line"] + "\n"))
+                    self.assertEqual(actual, self._expected(case, extended))
+
+    def test_byte_patterns_agree_with_str(self):
+        for encoding in ("utf-8", "gb18030", "big5"):
+            _, body = self.extended.byte_patterns(encoding)
+            for case in self.cases:
+                try:
+                    line = ("\n" + case["line"] + "\n").encode(encoding)
+                except UnicodeEncodeError:
+                    continue
+                with self.subTest(line=case["line"], encoding=encoding):
+                    kind, title = classify(body.match(line))
+                    expected = self._expected(case, True)
+                    self.assertEqual((kind, title.decode(encoding) if title else None), expected)
+
+    def test_register_custom_rule(self):
+        engine = HeadingEngine(BUILTIN_RULES)
+        signature = engine.signature()
+        self.assertIsNone(engine.pattern.match("Part 3\n"))
+
+        engine.register(HeadingRule("part_en", CHAPTER, r"Part\s+\d+"))
+        self.assertEqual(classify(engine.pattern.match("Part 3\n")), ("chapter", "Part 3"))
+        self.assertIsNotNone(engine.byte_patterns("utf-8")[1].match(b"\nPART 12\n"))
+        self.assertNotEqual(engine.signature(), signature)
+
+        engine.unregister("part_en")
+        self.assertIsNone(engine.pattern.match("Part 3\n"))
+        self.assertEqual(engine.signature(), signature)
+
+    def test_signature_covers_byte_pattern(self):
+        rule = HeadingRule("hui", CHAPTER, "(?!)", byte_pattern=lambda enc: "第1回".encode(enc))
+        changed = HeadingRule("hui", CHAPTER, "(?!)", byte_pattern=lambda enc: "第2回".encode(enc))
+        self.assertNotEqual(HeadingEngine([rule]).signature(), HeadingEngine([changed]).signature())
+        self.assertNotEqual(HeadingEngine([rule]).signature("utf-8"), HeadingEngine([rule]).signature("gb18030"))
+
+    def test_invalid_rules(self):
+        engine = HeadingEngine()
+        with self.assertRaises(ValueError):
+            engine.register(HeadingRule("grouped", CHAPTER, r"(Part)\s+\d+"))
+        with self.assertRaises(ValueError):
+            engine.register(HeadingRule("non_ascii", CHAPTER, r"幕\d+"))
+
+
+if __name__ == "__main__":
+    unittest.main()
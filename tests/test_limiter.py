@@ -0,0 +1,166 @@
+import sys
+import os
+import time
+import asyncio
+import unittest
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai
+
+from core.summarizer.limiter import AdaptiveLimiter, RateLimiter, TokenBucket, classify_error, parse_retry_after
+from core.summarizer.llm_client import OpenAIClient, ClientFactory, get_rate_limiter
+
+
+def rate_limit_error(retry_after: str = None) -> openai.RateLimitError:
+    # 只需要 status_code / headers / request 三个属性
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_retry_after_parsing(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertEqual(classify_error(rate_limit_error("2")), (True, 2.0))
+        self.assertEqual(classify_error(ValueError("bad json")), (False, None))
+
+    def test_additive_increase_multiplicative_decrease(self):
+        async def main():
+            limiter = AdaptiveLimiter(initial=4, max_limit=6)
+            for _ in range(20):
+                await limiter.release(await limiter.acquire(), "success")
+            self.assertEqual(limiter.limit, 6)
+
+            # 同一波并发请求同时遇到 429，只减半一次
+            starts = [await limiter.acquire() for _ in range(6)]
+            for started_at in starts:
+                await limiter.release(started_at, "congestion")
+            self.assertEqual(limiter.limit, 3)
+
+            # 减小之后发出的请求再次拥塞才继续减小
+            await limiter.release(await limiter.acquire(), "congestion")
+            self.assertEqual(limiter.limit, 1)
+            stats = limiter.stats()
+            self.assertEqual((stats["successes"], stats["congestions"], stats["peak_limit"]), (20, 7, 6))
+
+        asyncio.run(main())
+
+    def test_limit_caps_in_flight(self):
+        async def main():
+            limiter = AdaptiveLimiter(initial=2, max_limit=2)
+            peak = 0
+
+            async def task():
+                nonlocal peak
+                started_at = await limiter.acquire()
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+                await limiter.release(started_at)
+
+            await asyncio.gather(*[task() for _ in range(10)])
+            return peak
+
+        self.assertEqual(asyncio.run(main()), 2)
+
+    def test_retry_after_pauses_new_requests(self):
+        async def main():
+            limiter = AdaptiveLimiter(initial=4)
+            await limiter.release(await limiter.acquire(), "congestion", retry_after=0.2)
+            start = time.monotonic()
+            await limiter.acquire()
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(main()), 0.15)
+
+    def test_client_retries_congestion(self):
+        client = OpenAIClient(api_key="test", base_url="http://localhost:1/v1", model="m")
+        attempts = []
+
+        async def fake_request(messages, temperature):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise rate_limit_error("0.05")
+            return "ok"
+
+        async def main():
+            limiter = AdaptiveLimiter(initial=8)
+            client.attach_limiter(limiter, congestion_retries=5)
+            client._request_async = fake_request
+            result = await client.chat_completion_async([{"role": "user", "content": "hi"}])
+            return result, limiter
+
+        result, limiter = asyncio.run(main())
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(limiter.stats()["congestions"], 2)
+        self.assertLess(limiter.limit, 8)
+        self.assertEqual(client.async_client.max_retries, 0)
+
+    def test_rate_wait_does_not_hold_slot(self):
+        client = OpenAIClient(api_key="test", base_url="http://localhost:1/v1", model="m")
+        client.rate_limiter = RateLimiter(rpm=600)  # 每秒 10 个请求
+        for _ in range(600):
+            client.rate_limiter.acquire(0)
+        in_flight = []
+
+        async def fake_request(messages, temperature):
+            return "ok"
+
+        async def main():
+            limiter = AdaptiveLimiter(initial=1)
+            client.attach_limiter(limiter)
+            client._request_async = fake_request
+            task = asyncio.ensure_future(client.chat_completion_async([{"role": "user", "content": "hi"}]))
+            await asyncio.sleep(0.05)
+            # 速率预算耗尽，请求在等待中，但尚未占用并发槽位
+            in_flight.append(limiter.in_flight)
+            return await task
+
+        self.assertEqual(asyncio.run(main()), "ok")
+        self.assertEqual(in_flight, [0])
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket_reservations(self):
+        bucket = TokenBucket(per_minute=600)  # 每秒 10 个
+        self.assertEqual(bucket.reserve(600), 0.0)
+        # 桶已空，后续预留排队等待
+        self.assertAlmostEqual(bucket.reserve(10), 1.0, delta=0.05)
+        self.assertAlmostEqual(bucket.reserve(10), 2.0, delta=0.05)
+        bucket.adjust(20)
+        self.assertAlmostEqual(bucket.reserve(5), 0.5, delta=0.05)
+
+    def test_rpm_and_tpm_budgets(self):
+        limiter = RateLimiter(rpm=120, tpm=6000)  # 每秒 2 个请求 / 100 Token
+        self.assertEqual(limiter._reserve(1000), 0.0)
+        self.assertEqual(limiter._reserve(5000), 0.0)
+        # Token 预算耗尽，等待取两者中较长的
+        self.assertAlmostEqual(limiter._reserve(100), 1.0, delta=0.05)
+        # 实际用量少于预留时退还 (-100 + 200)，剩余额度足够下一个请求
+        limiter.settle(5000, 4800)
+        self.assertAlmostEqual(limiter._reserve(100), 0.0, delta=0.05)
+        self.assertEqual(RateLimiter()._reserve(10 ** 9), 0.0)
+
+    def test_sync_and_async_callers_share_budget(self):
+        limiter = RateLimiter(rpm=600)  # 每秒 10 个请求
+        for _ in range(600):
+            limiter.acquire(0)
+        start = time.monotonic()
+        limiter.acquire(0)
+        asyncio.run(limiter.acquire_async(0))
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_clients_share_provider_limiter(self):
+        first = ClientFactory.create_client("deepseek", api_key="test")
+        second = ClientFactory.create_client("deepseek", api_key="test", model="other")
+        self.assertIs(first.rate_limiter, second.rate_limiter)
+        self.assertIs(first.rate_limiter, get_rate_limiter("deepseek"))
+        self.assertIsNot(first.rate_limiter, get_rate_limiter("local"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import sys
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_manager import CacheManager
+from core.config import settings
+from core.summarizer.generator import SummaryGenerator
+from core.summarizer.limiter import AdaptiveLimiter
+from core.summarizer.llm_client import ClientFactory
+from core.summarizer.prompts import Prompts
+from data_protocol.models import Chapter, ChapterSummary, Entity
+from scripts.mock_llm_server import ReplayResponder, parse_latency, start_server
+
+MODEL_CONFIG = {"provider": "openrouter", "model": "replay-model", "base_url": None}
+
+
+def make_chapter(n: int) -> Chapter:
+    content = f"第{n}章正文。张三在第{n}天下山。"
+    return Chapter(id=f"ch_{n}", title=f"第{n}章", content=content, word_count=len(content))
+
+
+class TestMockLLMServer(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        for n in (1, 2):
+            ch = make_chapter(n)
+            cache.save_summary(ch, Prompts.get_prompt_hash(), MODEL_CONFIG, ChapterSummary(
+                chapter_id=ch.id, chapter_title=ch.title, headline=f"录制的第{n}章",
+                entities=[Entity(name="张三", type="Person", description="下山")]))
+        cache.close()
+        self.servers = []
+
+    def tearDown(self):
+        settings.LLM_REPLAY_URL = None
+        for server in self.servers:
+            server.shutdown()
+        shutil.rmtree(self.cache_dir)
+
+    def serve(self, **options) -> ReplayResponder:
+        responder = ReplayResponder(self.cache_dir, **options)
+        server, url = start_server(responder)
+        self.servers.append(server)
+        settings.LLM_REPLAY_URL = url
+        return responder
+
+    def test_replays_cached_summary_end_to_end(self):
+        responder = self.serve()
+        # 回放模式下不需要真实的 API Key
+        client = ClientFactory.create_client("openrouter", model="replay-model")
+        generator = SummaryGenerator(client)
+        self.assertEqual(generator.generate_summary(make_chapter(1)).headline, "录制的第1章")
+        # 未录制的章节返回占位结果
+        self.assertEqual(generator.generate_summary(make_chapter(3)).headline, "第3章正文")
+        self.assertEqual((responder.stats["hits"], responder.stats["misses"]), (1, 1))
+
+    def test_packed_prompt_is_replayed_per_chapter(self):
+        responder = ReplayResponder(self.cache_dir)
+        chapters = [make_chapter(1), make_chapter(2)]
+        prompt = Prompts.get_packed_summary_prompt([(ch.title, ch.content) for ch in chapters])
+        status, _, payload, _ = responder.respond({"model": "replay-model", "messages": prompt})
+        items = json.loads(payload["choices"][0]["message"]["content"])
+        self.assertEqual(status, 200)
+        self.assertEqual([(i["chapter_index"], i["headline"]) for i in items], [(1, "录制的第1章"), (2, "录制的第2章")])
+
+    def test_injected_429_drives_limiter(self):
+        self.serve(rate_limit=0.5, retry_after=0.01, seed=3)
+        client = ClientFactory.create_client("openrouter", model="replay-model")
+
+        async def main():
+            limiter = AdaptiveLimiter(initial=4)
+            client.attach_limiter(limiter, congestion_retries=20)
+            generator = SummaryGenerator(client)
+            summaries = await asyncio.gather(*[generator.generate_summary_async(make_chapter(n)) for n in range(1, 9)])
+            return summaries, limiter
+
+        summaries, limiter = asyncio.run(main())
+        self.assertEqual(summaries[1].headline, "录制的第2章")
+        self.assertGreater(limiter.stats()["congestions"], 0)
+
+    def test_malformed_json_and_determinism(self):
+        responder = ReplayResponder(self.cache_dir, malformed=1.0)
+        body = {"model": "replay-model", "messages": Prompts.get_summary_prompt("第1章", make_chapter(1).content)}
+        content = responder.respond(body)[2]["choices"][0]["message"]["content"]
+        with self.assertRaises(json.JSONDecodeError):
+            json.loads(content)
+
+        # 同一请求的第 N 次结果与并发顺序无关
+        first, second = ReplayResponder(self.cache_dir, rate_limit=0.5), ReplayResponder(self.cache_dir, rate_limit=0.5)
+        self.assertEqual([first.respond(body)[0] for _ in range(10)], [second.respond(body)[0] for _ in range(10)])
+        self.assertEqual(parse_latency("fixed:0.5")(None), 0.5)
+        with self.assertRaises(ValueError):
+            parse_latency("pareto:1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_protocol.models import Chapter
+from core.splitter.saver import save_chapters, iter_save_chapters
+from core.splitter.archive import ChapterArchive, ARCHIVE_NAME, ARCHIVE_INDEX_NAME
+
+
+def make_chapters():
+    chapters = []
+    for i in range(1, 41):
+        volume = "第一卷" if i <= 20 else "第二卷"
+        content = f"　　第{i}章的正文，包含一些中文内容。" * i
+        chapters.append(Chapter(id=f"ch_{i}", title=f"第{i}章", volume_title=volume,
+                                content=content, word_count=len(content), content_hash=f"hash{i}"))
+    chapters.append(Chapter(id="ch_41", title="尾声", content="没有分卷的章节", word_count=7))
+    return chapters
+
+
+class TestSaveChapters(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.chapters = make_chapters()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_sequential_and_concurrent_files(self):
+        # 默认 (SAVE_WORKERS=1) 顺序写入，线程池需显式开启
+        for workers in (None, 4):
+            with self.subTest(workers=workers):
+                output_dir = os.path.join(self.tmp_dir, str(workers))
+                self.assertEqual(save_chapters(self.chapters, output_dir, workers=workers), len(self.chapters))
+                for chapter in self.chapters:
+                    parts = [output_dir] + ([chapter.volume_title] if chapter.volume_title else []) + [f"{chapter.title}.txt"]
+                    with open(os.path.join(*parts), "r", encoding="utf-8") as f:
+                        self.assertEqual(f.read(), chapter.content)
+                self.assertFalse(ChapterArchive.exists(output_dir))
+
+    def test_bad_volume_path_only_skips_its_chapters(self):
+        # 与分卷同名的文件已存在，该卷目录无法创建
+        with open(os.path.join(self.tmp_dir, "坏卷"), "w", encoding="utf-8") as f:
+            f.write("")
+        bad = Chapter(id="vol_3_ch_1", title="第1章", volume_title="坏卷", content="无法保存", word_count=4)
+        for workers in (1, 4):
+            save_chapters(self.chapters + [bad], self.tmp_dir, workers=workers)
+            with open(os.path.join(self.tmp_dir, "第二卷", "第40章.txt"), "r", encoding="utf-8") as f:
+                self.assertEqual(f.read(), self.chapters[39].content)
+
+    def test_streaming_save_is_lazy(self):
+        for pack in (False, True):
+            with self.subTest(pack=pack):
+                output_dir = os.path.join(self.tmp_dir, "pack" if pack else "files")
+                read = []
+
+                def source():
+                    for chapter in self.chapters:
+                        read.append(chapter.id)
+                        yield chapter
+
+                saved = iter_save_chapters(source(), output_dir, workers=4, pack=pack)
+                first = next(saved)
+                # 交还第一章时只读取了第一章，打包的偏移表尚未写入
+                self.assertEqual((first.id, read), ("ch_1", ["ch_1"]))
+                self.assertFalse(os.path.exists(os.path.join(output_dir, ARCHIVE_INDEX_NAME)))
+                self.assertEqual(len(list(saved)), len(self.chapters) - 1)
+                self.assertEqual(ChapterArchive.exists(output_dir), pack)
+
+    def test_packed_archive(self):
+        save_chapters(self.chapters, self.tmp_dir, pack=True)
+        self.assertEqual(os.listdir(self.tmp_dir).count(ARCHIVE_NAME), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "第一卷")))
+
+        archive = ChapterArchive.load(self.tmp_dir)
+        self.assertEqual(len(archive.entries), len(self.chapters))
+        self.assertEqual(archive.read_content("ch_7"), self.chapters[6].content)
+        self.assertEqual(archive.read_content(title="尾声"), "没有分卷的章节")
+        self.assertIsNone(archive.read_content("ch_99"))
+
+        self.assertEqual(archive.find("ch_7").content_hash, self.chapters[6].content_hash)
+
+        contents = archive.read_all()
+        self.assertEqual([contents[c.id] for c in self.chapters], [c.content for c in self.chapters])
+
+    def test_archive_title_lookup_within_volume(self):
+        chapters = [Chapter(id=f"vol_{v}_ch_1", title="第1章", volume_title=f"第{v}卷", content=f"第{v}卷正文",
+                            word_count=4) for v in (1, 2)]
+        archive = ChapterArchive.write(chapters, self.tmp_dir)
+        self.assertEqual(archive.read_content(None, "第1章", "第2卷"), "第2卷正文")
+        self.assertIsNone(archive.read_content(None, "第1章", "第3卷"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import sys
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.singleflight import SingleFlight
+from core.cache_manager import CacheManager
+from core.summarizer.llm_client import OpenAIClient
+from data_protocol.models import Chapter, ChapterSummary
+
+MODEL_CONFIG = {"provider": "openrouter", "model": "test-model", "base_url": None}
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_async_calls_are_shared(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def main():
+            return await asyncio.gather(*[flight.do_async("k", work) for _ in range(5)], flight.do_async("other", work))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([r[0] for r in results], ["result"] * 6)
+        self.assertEqual(sorted(r[1] for r in results[:5]), [False, True, True, True, True])
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_async_errors_propagate_and_release_key(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def main():
+            return await asyncio.gather(flight.do_async("k", fail), flight.do_async("k", fail), return_exceptions=True)
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        # 失败后 key 已释放，下一次调用重新执行
+        async def ok():
+            return "ok"
+        self.assertEqual(asyncio.run(flight.do_async("k", ok)), ("ok", False))
+
+    def test_follower_takes_over_cancelled_leader(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("k", work))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async("k", work)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return leader, await asyncio.gather(*followers)
+
+        leader, results = asyncio.run(main())
+        self.assertTrue(leader.cancelled())
+        # 一个等待者接手重新执行，其余共享它的结果
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sorted(r[1] for r in results), [False, True, True])
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_threads_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Barrier(4)
+        results = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return 42
+
+        def worker():
+            started.wait()
+            results.append(flight.do("k", work))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [(42, False), (42, True), (42, True), (42, True)])
+
+
+class TestDuplicateChapters(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_generate_once_per_cache_key(self):
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        notice = "请假条：今天停更一天。"
+        chapters = [Chapter(id=f"ch_{i}", title=f"第{i}章", content=notice, word_count=len(notice)) for i in range(1, 4)]
+        calls = []
+
+        def make_generate(ch):
+            async def generate():
+                calls.append(ch.id)
+                await asyncio.sleep(0.05)
+                summary = ChapterSummary(chapter_id=ch.id, chapter_title=ch.title, headline="请假")
+                cache.save_summary(ch, "p", MODEL_CONFIG, summary)
+                return summary
+            return generate
+
+        async def main():
+            return await asyncio.gather(*[cache.generate_once(ch, "p", MODEL_CONFIG, make_generate(ch)) for ch in chapters])
+
+        results = asyncio.run(main())
+        self.assertEqual(calls, ["ch_1"])
+        self.assertEqual([shared for _, shared in results], [False, True, True])
+
+        # 已完成的结果留在内存层，之后的重复章节直接复用；修复模式强制重新生成
+        later = Chapter(id="ch_9", title="第9章", content=notice, word_count=len(notice))
+        self.assertTrue(asyncio.run(cache.generate_once(later, "p", MODEL_CONFIG, make_generate(later)))[1])
+        self.assertFalse(asyncio.run(cache.generate_once(later, "p", MODEL_CONFIG, make_generate(later), force=True))[1])
+        self.assertEqual(calls, ["ch_1", "ch_9"])
+        cache.close()
+
+
+class TestClientDeduplication(unittest.TestCase):
+    def test_identical_requests_share_response(self):
+        client = OpenAIClient(api_key="test", base_url="http://localhost:1/v1", model="m")
+        calls = []
+
+        async def fake_completion(messages, temperature):
+            calls.append(messages[0]["content"])
+            await asyncio.sleep(0.05)
+            return f"reply to {messages[0]['content']}"
+
+        client._chat_completion_async = fake_completion
+
+        async def main():
+            same = [{"role": "user", "content": "同一个问题"}]
+            other = [{"role": "user", "content": "另一个问题"}]
+            return await asyncio.gather(client.chat_completion_async(same), client.chat_completion_async(same),
+                                        client.chat_completion_async(other))
+
+        results = asyncio.run(main())
+        self.assertEqual(results, ["reply to 同一个问题", "reply to 同一个问题", "reply to 另一个问题"])
+        self.assertEqual(sorted(calls), ["另一个问题", "同一个问题"])
+
+    def test_different_api_keys_are_not_merged(self):
+        clients = [OpenAIClient(api_key=key, base_url="http://localhost:1/v1", model="m") for key in ("key-a", "key-b")]
+        calls = []
+
+        async def fake_completion(messages, temperature):
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "reply"
+
+        for client in clients:
+            client._chat_completion_async = fake_completion
+
+        async def main():
+            messages = [{"role": "user", "content": "同一个问题"}]
+            return await asyncio.gather(*[client.chat_completion_async(messages) for client in clients])
+
+        self.assertEqual(asyncio.run(main()), ["reply", "reply"])
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
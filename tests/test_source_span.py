@@ -3,7 +3,9 @@ import os
 import unittest
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core.summarizer import keyword_matcher
 from core.summarizer.generator import SummaryGenerator
+from core.summarizer.keyword_matcher import KeywordMatcher
 from data_protocol.models import TextSpan
 
 class TestSourceSpan(unittest.TestCase):
@@ -66,5 +68,33 @@ class TestSourceSpan(unittest.TestCase):
         spans = self.generator._find_source_spans(summary, self.long_content)
         self.assertFalse(spans, "不应找到匹配")
 
+    def test_batch_matches_single_sentence(self):
+        """整章批量溯源 (单次扫描) 与逐句溯源结果一致"""
+        summaries = ["李云跳下悬崖", "老者说玉佩是祸根", "哈利波特骑着扫帚飞走了", "李云握住玉佩"]
+        batch = self.generator._find_all_source_spans(summaries, self.long_content)
+        self.assertEqual(batch, [self.generator._find_source_spans(s, self.long_content) for s in summaries])
+
+class TestKeywordMatcher(unittest.TestCase):
+    def test_overlapping_keywords(self):
+        text = "哈哈哈，张三丰和张三在三丰山。"
+        keywords = ["哈哈", "张三", "张三丰", "三丰", "三丰山", "李四", ""]
+        expected = {}
+        for w in filter(None, keywords):
+            expected[w], start = [], 0
+            while (idx := text.find(w, start)) != -1:
+                expected[w].append(idx)
+                start = idx + 1
+        self.assertEqual(KeywordMatcher(keywords).find_all(text), expected)
+
+    def test_find_fallback(self):
+        original = keyword_matcher.ahocorasick
+        keyword_matcher.ahocorasick = None
+        try:
+            matcher = KeywordMatcher(["abcd", "bc", "c", "bcde"])
+            self.assertEqual(matcher.find_all("xabcdex"), {"abcd": [1], "bc": [2], "c": [3], "bcde": [2]})
+            self.assertEqual(KeywordMatcher([]).find_all("abc"), {})
+        finally:
+            keyword_matcher.ahocorasick = original
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,263 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import settings
+from core.splitter.processor import Splitter
+from core.splitter.index import ChapterIndex
+from core.splitter.encoding import detect_encoding
+from core.splitter.headings import EXTRA_RULES, register_heading_rule, unregister_heading_rule
+
+SAMPLE_TEXT = (
+    "书名：测试小说\n"
+    "简介：这是一本用于测试的小说。\n"
+    "第一卷 初入江湖\n"
+    "第一章 离家\n"
+    "　　张三离开了家乡，踏上了旅程。\n"
+    "　　他回头看了一眼青云山。\n"
+    "第二章 相遇\n"
+    "　　在山脚下，他遇到了李四。\n"
+    "第二卷 风起云涌\n"
+    "第３章 全角数字\n"
+    "　　两人结伴同行，来到了青云门。\n"
+    "Chapter 4 English Heading\n"
+    "　　A short English paragraph.\n"
+    "第五回 终局\n"
+    "　　故事暂告一段落。\n"
+)
+
+
+class TestStreamingSplitter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, text: str, encoding: str, newline: str = "\n") -> str:
+        path = os.path.join(self.tmp_dir, f"novel_{encoding}.txt")
+        with open(path, "wb") as f:
+            f.write(text.replace("\n", newline).encode(encoding))
+        return path
+
+    def _assert_same_chapters(self, path: str, chapter_range=None, encoding: str = "utf-8"):
+        splitter = Splitter(encoding=encoding)
+        expected = splitter.split_by_chapter(splitter.read_file(path), chapter_range=chapter_range)
+        actual = list(Splitter(encoding=encoding).iter_chapters(path, chapter_range=chapter_range))
+
+        self.assertTrue(expected)
+        self.assertEqual(
+            [c.model_dump() for c in actual],
+            [c.model_dump() for c in expected]
+        )
+
+    def test_utf8_matches_split_by_chapter(self):
+        self._assert_same_chapters(self._write(SAMPLE_TEXT, "utf-8"))
+
+    def test_gbk_matches_split_by_chapter(self):
+        self._assert_same_chapters(self._write(SAMPLE_TEXT, "gbk"))
+
+    def test_crlf_and_bom(self):
+        text = SAMPLE_TEXT.split("\n", 2)[2]  # 首行即为分卷标题
+        self._assert_same_chapters(self._write(text, "utf-8-sig", newline="\r\n"), encoding="utf-8-sig")
+
+    def test_chapter_range_keeps_global_ids(self):
+        path = self._write(SAMPLE_TEXT, "utf-8")
+        self._assert_same_chapters(path, chapter_range=(2, 3))
+
+        chapters = list(Splitter().iter_chapters(path, chapter_range=(2, 3)))
+        self.assertEqual([c.id for c in chapters], ["ch_2", "ch_3"])
+        self.assertEqual(chapters[1].volume_title, "第二卷")
+
+    def test_extra_heading_rules(self):
+        text = "楔子\n　　很久以前。\n" + SAMPLE_TEXT.split("\n", 2)[2] + "番外一 后日谈\n　　完。\n"
+        path = self._write(text, "gbk")
+        self.assertEqual(len(list(Splitter().iter_chapters(path))), 5)
+
+        for name in ("prologue_cn", "extra_cn"):
+            register_heading_rule(EXTRA_RULES[name])
+        try:
+            self._assert_same_chapters(path)
+            chapters = list(Splitter().iter_chapters(path))
+            self.assertEqual([c.title for c in chapters][::6], ["楔子", "番外一"])
+        finally:
+            for name in ("prologue_cn", "extra_cn"):
+                unregister_heading_rule(name)
+
+    def test_empty_file(self):
+        path = self._write("", "utf-8")
+        self.assertEqual(list(Splitter().iter_chapters(path)), [])
+
+
+class TestSplitByChapter(unittest.TestCase):
+    def test_range_uses_global_index(self):
+        content = "".join(f"第{n}章 标题{n}\n　　正文{n}。\n" for n in range(1, 101))
+        chapters = Splitter().split_by_chapter(content, chapter_range=(95, 120))
+        self.assertEqual([c.id for c in chapters], [f"ch_{n}" for n in range(95, 101)])
+        self.assertEqual(chapters[0].content, "正文95。")
+        self.assertEqual(Splitter().split_by_chapter(content, chapter_range=(101, 110)), [])
+
+    def test_duplicate_chapters_get_distinct_ids(self):
+        # 内容完全相同的章节也必须按位置编号
+        content = "第一章 重复\n　　同样的内容。\n" * 3
+        chapters = Splitter().split_by_chapter(content)
+        self.assertEqual([c.id for c in chapters], ["ch_1", "ch_2", "ch_3"])
+
+    def test_content_hash(self):
+        # 分割时计算正文哈希，可直接用作缓存键 / 去重标识
+        from core.utils import calculate_content_hash
+        for chapter in Splitter().split_by_chapter(SAMPLE_TEXT) + Splitter().split_by_volume(SAMPLE_TEXT):
+            self.assertEqual(chapter.content_hash, calculate_content_hash(chapter.content))
+
+
+class TestVolumeSplit(unittest.TestCase):
+    def test_process_pool_matches_sequential(self):
+        volumes = "".join(
+            f"第{n}卷 卷{n}\n第一章 开始\n　　正文{n}。\n第二章 继续\n　　更多正文。\n" for n in range(1, 9)
+        )
+        content = volumes + "第九卷 序\n　　只有内容的分卷。\n第十卷 终\n　　尾声。\n"
+        splitter = Splitter()
+
+        sequential = splitter.split_by_volume(content)
+        parallel = splitter.split_by_volume(content, workers=2)
+        self.assertEqual([c.model_dump() for c in parallel], [c.model_dump() for c in sequential])
+        self.assertEqual(sequential[0].id, "vol_1_ch_1")
+        self.assertEqual(sequential[-1].id, "vol_9_vol_9_content")
+        self.assertEqual(len(sequential), 17)
+
+
+class TestEncodingDetection(unittest.TestCase):
+    CANDIDATES = ['utf-8', 'utf-8-sig', 'gb18030', 'gbk', 'big5']
+
+    def test_sampled_windows(self):
+        data = (SAMPLE_TEXT * 2000).encode("gbk")
+        guess = detect_encoding(data, self.CANDIDATES, sample_size=4096)
+        self.assertEqual(guess.encoding, "gb18030")
+        self.assertLess(guess.sampled_bytes, len(data))
+        self.assertGreater(guess.confidence, 0.9)
+
+        guess = detect_encoding((SAMPLE_TEXT * 2000).encode("utf-8"), self.CANDIDATES, sample_size=4096)
+        self.assertEqual(guess.encoding, "utf-8")
+
+    def test_bom_and_small_file(self):
+        guess = detect_encoding(SAMPLE_TEXT.encode("utf-8-sig"), self.CANDIDATES)
+        self.assertEqual((guess.encoding, guess.confidence), ("utf-8-sig", 1.0))
+
+        guess = detect_encoding(SAMPLE_TEXT.encode("big5", errors="ignore"), ["utf-8", "big5"])
+        self.assertEqual((guess.encoding, guess.confidence), ("big5", 1.0))
+
+    def test_read_file_falls_back_when_samples_miss(self):
+        # 采样窗口之外出现非 UTF-8 字节时，read_file 仍需得到与逐个尝试相同的结果
+        filler = "Chapter 1\n" + "plain ascii line\n" * 50000
+        data = filler.encode("utf-8") + "第二章 结尾\n".encode("gbk") + filler.encode("utf-8")
+        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+            f.write(data)
+        try:
+            splitter = Splitter()
+            self.assertEqual(splitter.read_file(f.name), data.decode("gb18030"))
+            self.assertEqual(splitter.encoding, "gb18030")
+        finally:
+            os.remove(f.name)
+
+
+class TestChapterIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_patch = patch.object(settings, "OUTPUT_DIR", Path(self.tmp_dir) / "output")
+        self.output_patch.start()
+
+        self.path = os.path.join(self.tmp_dir, "novel.txt")
+        with open(self.path, "wb") as f:
+            f.write(SAMPLE_TEXT.replace("\n", "\r\n").encode("gbk"))
+
+        splitter = Splitter()
+        self.content = splitter.read_file(self.path)
+        self.expected = [c.model_dump() for c in splitter.split_by_chapter(self.content)]
+
+    def tearDown(self):
+        self.output_patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_build_and_reload(self):
+        index = ChapterIndex.load_or_build(self.path, file_hash="abcd1234")
+        self.assertEqual(index.encoding, "gb18030")
+        self.assertEqual(index.total, 5)
+        self.assertTrue(ChapterIndex.get_index_path("abcd1234").exists())
+
+        reloaded = ChapterIndex.load("abcd1234", file_size=os.path.getsize(self.path))
+        self.assertIsNotNone(reloaded)
+        self.assertEqual(reloaded.chapters, index.chapters)
+        self.assertIsNone(ChapterIndex.load("abcd1234", file_size=1))
+
+    def test_offsets_match_split_by_chapter(self):
+        index = ChapterIndex.load_or_build(self.path, file_hash="abcd1234")
+
+        by_seek = [c.model_dump() for c in index.iter_chapters(self.path)]
+        by_chars = [c.model_dump() for c in index.chapters_from_content(self.content)]
+        self.assertEqual(by_seek, self.expected)
+        self.assertEqual(by_chars, self.expected)
+
+        _, titles, _ = Splitter().scan_chapters(self.content)
+        self.assertEqual(index.headings, titles)
+
+    def test_random_access(self):
+        index = ChapterIndex.load_or_build(self.path, file_hash="abcd1234")
+        chapter = index.read_chapter(self.path, 4)
+        self.assertEqual(chapter.model_dump(), self.expected[3])
+        self.assertIsNone(index.read_chapter(self.path, 6))
+
+
+class TestAppendDetection(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_patch = patch.object(settings, "OUTPUT_DIR", Path(self.tmp_dir) / "output")
+        self.output_patch.start()
+
+        head, tail = SAMPLE_TEXT.split("Chapter 4", 1)
+        self.old_text = head
+        self.new_text = head + "Chapter 4" + tail
+        self.base = ChapterIndex.load_or_build(self._write("old.txt", self.old_text), file_hash="base0001",
+                                               novel_name="测试小说")
+
+    def tearDown(self):
+        self.output_patch.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name: str, text: str) -> str:
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "wb") as f:
+            f.write(text.encode("utf-8"))
+        return path
+
+    def test_appended_chapters(self):
+        path = self._write("new.txt", self.new_text)
+        index = ChapterIndex.load_or_build(path, file_hash="new00001", novel_name="测试小说")
+        base, first_new = index.find_append_base(path)
+        self.assertEqual(base.file_hash, "base0001")
+        self.assertEqual(first_new, 4)
+        self.assertEqual(index.chapters[:3], self.base.chapters)
+
+    def test_last_chapter_extended(self):
+        path = self._write("new.txt", self.old_text + "　　第三章的续写内容。\n第四章 新章\n　　新内容。\n")
+        index = ChapterIndex.load_or_build(path, file_hash="new00001", novel_name="测试小说")
+        base, first_new = index.find_append_base(path)
+        self.assertEqual(base.file_hash, "base0001")
+        self.assertEqual(first_new, 3)
+
+    def test_edited_file_is_not_append(self):
+        path = self._write("new.txt", self.new_text.replace("李四", "王五"))
+        index = ChapterIndex.load_or_build(path, file_hash="new00001", novel_name="测试小说")
+        self.assertIsNone(index.find_append_base(path))
+
+        other = ChapterIndex.load_or_build(self._write("other.txt", self.new_text), file_hash="other001",
+                                           novel_name="另一本书")
+        self.assertIsNone(other.find_append_base(os.path.join(self.tmp_dir, "other.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import sys
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_manager import CacheManager
+from core.config import settings
+from core.summarizer.generator import SummaryGenerator
+from core.summarizer.llm_client import ClientFactory
+from core.summarizer.prompts import Prompts
+from core.summarizer.streaming import (IncrementalJSONParser, MalformedStreamError, ThinkStripper,
+                                       TruncatedResponseError)
+from data_protocol.models import Chapter, ChapterSummary, Entity
+from scripts.mock_llm_server import ReplayResponder, start_server
+
+MODEL_CONFIG = {"provider": "openrouter", "model": "replay-model", "base_url": None}
+
+PAYLOAD = {"headline": "张三下山", "summary_sentences": ["张三下山"],
+           "entities": [{"name": "张三", "type": "Person", "description": "主角"},
+                        {"name": "李四", "type": "Person", "description": "师兄 \"}]\""}],
+           "relationships": []}
+
+
+def feed_in_pieces(parser: IncrementalJSONParser, text: str, size: int = 3):
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+
+
+class TestThinkStripper(unittest.TestCase):
+    def test_tags_split_across_chunks(self):
+        stripper = ThinkStripper()
+        out = "".join(stripper.feed(piece) for piece in ["<thi", "nk>推理 {过程}</th", "ink>\n{\"a\": 1}<"])
+        out += stripper.flush()
+        self.assertEqual(out, "\n{\"a\": 1}<")
+
+
+class TestIncrementalJSONParser(unittest.TestCase):
+    def test_fields_and_items_arrive_before_end(self):
+        events = []
+        parser = IncrementalJSONParser(lambda kind, key, value: events.append((kind, key, value)))
+        text = "```json\n" + json.dumps(PAYLOAD, ensure_ascii=False) + "\n```"
+        feed_in_pieces(parser, text[:text.index('"relationships"')])
+
+        # 尚未结束时 headline 与两个实体已经可用 (字符串中的括号 / 引号不影响解析)
+        self.assertFalse(parser.done)
+        self.assertIn(("field", "headline", "张三下山"), events)
+        self.assertEqual([v["name"] for kind, key, v in events if kind == "item" and key == "entities"], ["张三", "李四"])
+
+        feed_in_pieces(parser, text[text.index('"relationships"'):])
+        self.assertEqual(parser.finish(), PAYLOAD)
+        self.assertEqual(events[-1], ("done", None, PAYLOAD))
+
+    def test_top_level_array_items(self):
+        items = []
+        parser = IncrementalJSONParser(lambda kind, key, value: kind == "item" and items.append((key, value)))
+        feed_in_pieces(parser, '以下是结果：[{"chapter_index": 1}, {"chapter_index": 2}] 完毕')
+        self.assertEqual(items, [(None, {"chapter_index": 1}), (None, {"chapter_index": 2})])
+        self.assertEqual(len(parser.finish()), 2)
+
+    def test_truncated_and_malformed(self):
+        parser = IncrementalJSONParser()
+        feed_in_pieces(parser, json.dumps(PAYLOAD, ensure_ascii=False)[:40])
+        with self.assertRaises(TruncatedResponseError):
+            parser.finish()
+
+        # 结构错误在出现时立即发现，而不是等到响应结束
+        with self.assertRaises(MalformedStreamError):
+            IncrementalJSONParser().feed('{"headline": "x", "entities": [1, 2}')
+        with self.assertRaises(MalformedStreamError):
+            IncrementalJSONParser().feed('{"headline": 张三, ')
+        with self.assertRaises(MalformedStreamError):
+            IncrementalJSONParser().finish()
+
+
+def make_chapter(n: int) -> Chapter:
+    content = f"第{n}章正文。张三在第{n}天下山。"
+    return Chapter(id=f"ch_{n}", title=f"第{n}章", content=content, word_count=len(content))
+
+
+class TestStreamingEndToEnd(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        cache = CacheManager(self.cache_dir, backend="sqlite")
+        ch = make_chapter(1)
+        cache.save_summary(ch, Prompts.get_prompt_hash(), MODEL_CONFIG, ChapterSummary(
+            chapter_id=ch.id, chapter_title=ch.title, headline="录制的第1章",
+            entities=[Entity(name="张三", type="Person", description="下山")]))
+        cache.close()
+        self.servers = []
+
+    def tearDown(self):
+        settings.LLM_REPLAY_URL = None
+        for server in self.servers:
+            server.shutdown()
+        shutil.rmtree(self.cache_dir)
+
+    def serve(self, **options):
+        server, url = start_server(ReplayResponder(self.cache_dir, **options))
+        self.servers.append(server)
+        settings.LLM_REPLAY_URL = url
+
+    def test_stream_through_mock_server(self):
+        self.serve()
+        partial = []
+        generator = SummaryGenerator(ClientFactory.create_client("openrouter", model="replay-model"), stream=True,
+                                     on_partial=lambda ch, kind, key, value: partial.append((ch.id, kind, key)))
+        summary = asyncio.run(generator.generate_summary_async(make_chapter(1)))
+        self.assertEqual(summary.headline, "录制的第1章")
+        self.assertEqual(summary.entities[0].name, "张三")
+        self.assertLess(partial.index(("ch_1", "field", "headline")), partial.index(("ch_1", "done", None)))
+        self.assertIn(("ch_1", "item", "entities"), partial)
+
+    def test_truncated_stream_raises_for_retry(self):
+        self.serve(malformed=1.0)
+        generator = SummaryGenerator(ClientFactory.create_client("openrouter", model="replay-model"), stream=True)
+        with self.assertRaises(TruncatedResponseError):
+            asyncio.run(generator.generate_summary_async(make_chapter(1)))
+        self.assertEqual(generator.stream_stats["truncated"], 1)
+
+        # 非流式时同样的响应仍走原来的降级解析
+        fallback = SummaryGenerator(ClientFactory.create_client("openrouter", model="replay-model"), stream=False)
+        self.assertIsNotNone(asyncio.run(fallback.generate_summary_async(make_chapter(1))))
+
+
+if __name__ == "__main__":
+    unittest.main()
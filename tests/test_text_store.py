@@ -0,0 +1,74 @@
+import sys
+import os
+import unittest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from core.db.models import Novel, NovelVersion, AnalysisRun, Chapter, ChapterText
+from core.db.text_store import ChapterTextStore
+from core.db.compression import decompress_text
+from core.utils import calculate_content_hash
+
+
+class TestChapterTextStore(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+
+        novel = Novel(name="测试小说")
+        self.session.add(novel)
+        self.session.commit()
+        version = NovelVersion(novel_id=novel.id, hash="abcd1234")
+        self.session.add(version)
+        self.session.commit()
+        self.version_id = version.id
+
+    def tearDown(self):
+        self.session.close()
+
+    def _add_run(self, timestamp: str, contents):
+        run = AnalysisRun(version_id=self.version_id, timestamp=timestamp)
+        self.session.add(run)
+        self.session.commit()
+        for i, content in enumerate(contents, start=1):
+            self.session.add(Chapter(run_id=run.id, chapter_index=i, title=f"第{i}章",
+                                     content_hash=ChapterTextStore.put(self.session, content)))
+        self.session.commit()
+        return run
+
+    def test_runs_share_blobs(self):
+        contents = ["第一章的正文。", "第二章的正文。", "第一章的正文。"]
+        for timestamp in ("20260101_000000", "20260102_000000", "20260103_000000"):
+            self._add_run(timestamp, contents)
+
+        self.assertEqual(len(self.session.exec(select(Chapter)).all()), 9)
+        self.assertEqual(len(self.session.exec(select(ChapterText)).all()), 2)
+
+        chapter = self.session.exec(select(Chapter).where(Chapter.chapter_index == 2)).first()
+        self.assertIsNone(chapter.content)
+        self.assertEqual(chapter.content_hash, calculate_content_hash("第二章的正文。"))
+        self.assertEqual(ChapterTextStore.get_content(self.session, chapter), "第二章的正文。")
+
+        blob = self.session.get(ChapterText, chapter.content_hash)
+        self.assertIsNone(blob.content)
+        self.assertEqual(decompress_text(blob.codec, blob.data), "第二章的正文。")
+        self.assertEqual(blob.word_count, 7)
+
+    def test_lengths_and_legacy_content(self):
+        run = self._add_run("20260101_000000", ["四个汉字"])
+        legacy = Chapter(run_id=run.id, chapter_index=2, title="旧数据", content="旧的正文")
+        # upgrade_db_v4 产生的未压缩正文
+        self.session.add(ChapterText(hash="legacy", content="未压缩的旧正文"))
+        self.session.add(legacy)
+        self.session.commit()
+        self.assertEqual(ChapterTextStore.get(self.session, "legacy"), "未压缩的旧正文")
+
+        self.assertEqual(ChapterTextStore.get_content(self.session, legacy), "旧的正文")
+        lengths = ChapterTextStore.get_lengths(self.session, [calculate_content_hash("四个汉字"), "legacy", None])
+        self.assertEqual(lengths, {calculate_content_hash("四个汉字"): 4, "legacy": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import sys
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_manager import CacheManager
+from core.config import settings
+from core.summarizer.generator import SummaryGenerator
+from core.summarizer.llm_client import ClientFactory
+from core.summarizer.usage import UsageTracker, parse_pricing, record_call, track_usage
+from data_protocol.models import Chapter
+from scripts.mock_llm_server import ReplayResponder, start_server
+
+
+def make_chapter(n: int) -> Chapter:
+    content = f"第{n}章正文。张三在第{n}天下山。"
+    return Chapter(id=f"ch_{n}", title=f"第{n}章", content=content, word_count=len(content))
+
+
+class TestUsageTracker(unittest.TestCase):
+    def test_summary_and_cost(self):
+        tracker = UsageTracker(pricing=parse_pricing("m1=1:2, bad=x"))
+        with track_usage(tracker):
+            record_call("m1", 1000, 500, 0.5)
+            record_call("m1", 0, 0, 1.5, error=TimeoutError())
+            record_call("m2", 200, 100, 1.0, estimated=True)
+        record_call("m1", 1000, 1000, 1.0)  # 作用范围之外，不记录
+
+        summary = tracker.summary(chapters=2)
+        self.assertEqual((summary["calls"], summary["errors"], summary["total_tokens"]), (3, 1, 1800))
+        self.assertEqual(summary["tokens_per_chapter"], 900)
+        self.assertEqual(summary["errors_by_type"], {"TimeoutError": 1})
+        self.assertEqual(summary["by_model"]["m2"]["estimated_calls"], 1)
+        # 只有配置了单价的模型计入费用
+        self.assertAlmostEqual(summary["cost_usd"], (1000 * 1 + 500 * 2) / 1e6)
+        self.assertIsNone(summary["by_model"]["m2"]["cost_usd"])
+
+    def test_nested_scopes_and_threads(self):
+        outer, inner = UsageTracker(pricing={}), UsageTracker(pricing={})
+        with track_usage(outer):
+            with track_usage(inner):
+                record_call("m", 10, 10, 0.1)
+            # 线程池需复制上下文才能记到当前任务
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                executor.submit(contextvars.copy_context().run, record_call, "m", 1, 1, 0.1).result()
+                executor.submit(record_call, "m", 1, 1, 0.1).result()
+        self.assertEqual((outer.summary()["calls"], inner.summary()["calls"]), (2, 1))
+
+
+class TestClientUsage(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        CacheManager(self.cache_dir, backend="sqlite").close()
+        self.server, settings.LLM_REPLAY_URL = start_server(ReplayResponder(self.cache_dir, rate_limit=0.5, retry_after=0.01))
+
+    def tearDown(self):
+        settings.LLM_REPLAY_URL = None
+        self.server.shutdown()
+        shutil.rmtree(self.cache_dir)
+
+    def test_calls_record_usage_and_retries(self):
+        from core.summarizer.limiter import AdaptiveLimiter
+        client = ClientFactory.create_client("openrouter", model="usage-model")
+
+        async def main():
+            client.attach_limiter(AdaptiveLimiter(initial=4), congestion_retries=20)
+            generator = SummaryGenerator(client)
+            await asyncio.gather(*[generator.generate_summary_async(make_chapter(n)) for n in range(1, 7)])
+
+        with track_usage(UsageTracker(pricing={})) as usage:
+            asyncio.run(main())
+            # 同步接口同样被记录
+            client.chat_completion([{"role": "user", "content": "你好"}])
+
+        summary = usage.summary(chapters=6)
+        model = summary["by_model"]["usage-model"]
+        # 每次 429 记为一次失败调用和一次重试，成功调用的 Token 来自服务端 usage
+        self.assertEqual(summary["calls"] - summary["errors"], 7)
+        self.assertEqual(summary["retries"], summary["errors"])
+        self.assertGreater(model["prompt_tokens"], 0)
+        self.assertEqual(model["estimated_calls"], 0)
+
+
+class TestUsageEndpoint(unittest.TestCase):
+    def test_usage_stats_endpoint(self):
+        from sqlmodel import SQLModel, Session, create_engine
+        from core.db.models import Novel, NovelVersion, AnalysisRun
+        from backend.routers.novels import append_run_usage, list_usage_stats
+
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            novel = Novel(name="测试小说")
+            session.add(novel)
+            session.commit()
+            version = NovelVersion(novel_id=novel.id, hash="abcd1234")
+            session.add(version)
+            session.commit()
+            usage = {"calls": 12, "total_tokens": 24000, "tokens_per_chapter": 2000.0, "chapters": 12, "prompt_hash": "p1"}
+            run = AnalysisRun(version_id=version.id, timestamp="20260102_000000",
+                              config_snapshot=json.dumps({"model": "m", "usage": usage}))
+            session.add(run)
+            session.add(AnalysisRun(version_id=version.id, timestamp="20260101_000000", config_snapshot=json.dumps({"model": "m"})))
+            session.commit()
+
+            tracker = UsageTracker(pricing={})
+            with track_usage(tracker):
+                record_call("m", 100, 50, 0.2)
+            append_run_usage(session, run, "segments", tracker)
+
+            results = list_usage_stats("测试小说", "abcd1234", session)
+            self.assertEqual(len(results), 1)
+            self.assertEqual((results[0].prompt_hash, results[0].total_tokens, results[0].tokens_per_chapter), ("p1", 24000, 2000.0))
+            self.assertEqual([(u["endpoint"], u["total_tokens"]) for u in results[0].backend_usage], [("segments", 150)])
+
+
+if __name__ == "__main__":
+    unittest.main()